@@ -1,20 +1,62 @@
+import os
+import re
 import socket
+import tempfile
+
+from backend.log_levels import DEBUG, INFO, WARN, level_value
+from utils.send_file import send_file, TransferAborted
+from utils.receive_file import receive_file, IncompleteTransfer
+
+RECV_BUFSIZE = 65536
+FILE_CHUNK = 256 * 1024
+
+_PASV_RE = re.compile(r"(\d+),(\d+),(\d+),(\d+),(\d+),(\d+)")
+
+
+class TransferCancelled(TransferAborted):
+    """Raised when a transfer is cancelled; the connection is closed."""
+
+
+class FTPError(Exception):
+    """The server answered a command with an error reply."""
+
+    def __init__(self, reply: str):
+        super().__init__(reply)
+        self.reply = reply
 
 
 class ClientSocket:
-    def __init__(self, host="127.0.0.1", port=9000, timeout=10.0, logger=None):
+    def __init__(self, host="127.0.0.1", port=9000, timeout=10.0, logger=None, print_level=INFO,
+                 tls=None, passive=False):
         self.host = host
         self.port = port
         self.timeout = timeout
+        self.tls = tls             # backend.tls.ClientTLS, or None for plain TCP
+        self.passive = passive     # RETR/STOR over a separate (PASV) data connection
         self.sock: socket.socket = None
         self.logger = logger   # ← NEW: shared logger instance
+        self.print_level = level_value(print_level)   # console echo threshold
+        self._rbuf = bytearray()   # bytes read from the socket but not yet consumed
+        self._xfer_buf = None      # reusable receive buffer for file downloads
 
     # ----------------------------------------------------
-    def log(self, text: str):
-        """Send message to logger if available"""
-        if self.logger:
-            self.logger.append_log(f"[Client] {text}")
-        print(text)
+    def log(self, text: str, level: str = INFO, *args):
+        """
+        Send message to logger if available (and echo it to the console).
+        `text % args` is only formatted when some sink wants the level, so
+        per-line DEBUG messages cost a couple of comparisons when disabled.
+        """
+        to_logger = self.logger is not None and self.logger.is_enabled(level, "client")
+        to_console = level_value(level) >= self.print_level
+        if not (to_logger or to_console):
+            return
+
+        if args:
+            text = text % args
+        if to_logger:
+            self.logger.log(f"[Client] {text}", level, "client")
+        if to_console:
+            print(text)
 
     # ----------------------------------------------------
     # SET HOST + PORT (from config window)
@@ -33,15 +75,23 @@ class ClientSocket:
                 (self.host, self.port),
                 timeout=self.timeout
             )
+            self._rbuf.clear()
+            if self.tls is not None:
+                self.sock = self.tls.wrap(self.sock, self.host, self.port)
 
             banner = self.receive()  # read welcome banner
             self.log(f"Connected to server at {self.host}:{self.port}")
             self.log(f"Server banner: {banner}")
+            if self.tls is not None:
+                # TLS 1.3 tickets arrive after the handshake, with the banner
+                self.tls.remember(self.sock, self.host, self.port)
+                self.log("TLS %s, session %s.", DEBUG, self.sock.version(),
+                         "resumed" if self.sock.session_reused else "new")
 
             return True
 
         except Exception as e:
-            self.log(f"Connection failed: {e}")
+            self.log(f"Connection failed: {e}", WARN)
             return False
 
     # ----------------------------------------------------
@@ -53,7 +103,39 @@ class ClientSocket:
 
         full_msg = msg + "\r\n"
         self.sock.sendall(full_msg.encode())
-        self.log(f"Sent: {msg}")
+        if msg.startswith("PASS "):
+            self.log("Sent: PASS ****", DEBUG)
+        else:
+            self.log("Sent: %s", DEBUG, msg)
+
+    # ----------------------------------------------------
+    # BUFFERED READS
+    # ----------------------------------------------------
+    def _fill(self) -> bool:
+        """Read one block into the buffer; False on EOF."""
+        chunk = self.sock.recv(RECV_BUFSIZE)
+        if not chunk:
+            return False
+        self._rbuf += chunk
+        return True
+
+    def _read_line(self) -> bytes:
+        buf = self._rbuf
+        start = 0
+        while True:
+            idx = buf.find(b"\r\n", start)
+            if idx >= 0:
+                line = bytes(buf[:idx])
+                del buf[:idx + 2]
+                return line
+            # the terminator may straddle two blocks
+            start = max(0, len(buf) - 1)
+            if not self._fill():
+                if not buf:
+                    raise ConnectionError("Connection closed by server.")
+                line = bytes(buf)
+                buf.clear()
+                return line
 
     # ----------------------------------------------------
     # RECEIVE ONE LINE
@@ -62,17 +144,8 @@ class ClientSocket:
         if not self.sock:
             raise Exception("Socket is not connected.")
 
-        buffer = b""
-        while True:
-            ch = self.sock.recv(1)
-            if not ch:
-                break
-            buffer += ch
-            if buffer.endswith(b"\r\n"):
-                break
-
-        text = buffer.decode().strip()
-        self.log(f"Received: {text}")
+        text = self._read_line().decode().strip()
+        self.log("Received: %s", DEBUG, text)
         return text
 
     # ----------------------------------------------------
@@ -85,12 +158,12 @@ class ClientSocket:
             line = self.receive()
             lines.append(line)
 
-            # LIST format ends with "226 Transfer complete"
-            if line.startswith("226") or line.startswith("500"):
+            # LIST ends with "226 Done."; stop on any error reply as well
+            if _is_final_reply(line):
                 break
 
         result = "\n".join(lines)
-        self.log("Received multiline LIST response.")
+        self.log("Received multiline LIST response (%d lines).", DEBUG, len(lines))
         return result
 
     # ----------------------------------------------------
@@ -101,40 +174,322 @@ class ClientSocket:
             raise Exception("Socket is not connected.")
 
         self.sock.sendall(data)
-        self.log(f"Sent {len(data)} bytes.")
+        self.log("Sent %d bytes.", DEBUG, len(data))
+
+    # ----------------------------------------------------
+    # STREAM UPLOAD FROM DISK
+    # ----------------------------------------------------
+    def send_file(self, path: str, progress=None, cancel=None, data=None) -> int:
+        """
+        Stream a file to the socket without loading it into memory.
+
+        Uses utils.send_file (sendfile where available, chunked memoryview
+        sends otherwise).  progress(sent, total) is called per chunk; if
+        `cancel` (a threading.Event) gets set TransferCancelled is raised.
+        Inline transfers have to close the connection, since the server
+        expects the exact size announced in STOR; with a `data` connection
+        the transfer is ABORted and the control connection stays usable.
+        """
+        if not self.sock:
+            raise Exception("Socket is not connected.")
+
+        total = os.path.getsize(path)
+        try:
+            sent = send_file(data or self.sock, path, count=total, progress=progress,
+                             cancel=cancel)
+        except TransferAborted as e:
+            self._abort_transfer(e, data)
+
+        self.log(f"Sent {sent} / {total} bytes from {path}.")
+        return sent
+
+    def _abort_transfer(self, reason, data=None):
+        self.log(f"Transfer cancelled: {reason}", WARN)
+        if data is None:
+            self.close()
+        else:
+            data.close()
+            self.abort()
+        raise TransferCancelled(str(reason)) from None
 
     # ----------------------------------------------------
     # BYTES RECEIVE (DOWNLOAD)
     # ----------------------------------------------------
+    def _take_buffered(self, limit: int) -> bytes:
+        """Hand over bytes already read past the last reply line."""
+        n = min(limit, len(self._rbuf))
+        data = bytes(self._rbuf[:n])
+        del self._rbuf[:n]
+        return data
+
     def receive_bytes(self, size: int = None) -> bytes:
         if not self.sock:
             raise Exception("Socket is not connected.")
 
         if size is None:
             # receive until end
-            chunks = []
+            chunks = [self._take_buffered(len(self._rbuf))]
             while True:
-                chunk = self.sock.recv(4096)
+                chunk = self.sock.recv(RECV_BUFSIZE)
                 if not chunk:
                     break
                 chunks.append(chunk)
             data = b"".join(chunks)
-            self.log(f"Received {len(data)} bytes (unknown size).")
+            self.log("Received %d bytes (unknown size).", DEBUG, len(data))
             return data
 
-        # receive fixed size
-        data = b""
-        remaining = size
+        # receive fixed size straight into a preallocated buffer
+        data = bytearray(size)
+        view = memoryview(data)
+        head = self._take_buffered(size)
+        got = len(head)
+        view[:got] = head
 
-        while remaining > 0:
-            chunk = self.sock.recv(min(4096, remaining))
-            if not chunk:
+        while got < size:
+            n = self.sock.recv_into(view[got:], min(RECV_BUFSIZE, size - got))
+            if not n:
                 break
-            data += chunk
-            remaining -= len(chunk)
+            got += n
 
-        self.log(f"Received {len(data)} / {size} bytes.")
-        return data
+        view.release()
+        if got < size:
+            del data[got:]
+
+        self.log("Received %d / %d bytes.", DEBUG, got, size)
+        return bytes(data)
+
+    # ----------------------------------------------------
+    # STREAM DOWNLOAD STRAIGHT TO DISK
+    # ----------------------------------------------------
+    def receive_to_file(self, size: int, path: str, progress=None, cancel=None,
+                        data=None) -> int:
+        """
+        Receive exactly `size` bytes into `path` with constant memory.
+
+        Data lands in a temporary file next to `path` which is fsynced and
+        renamed over it once complete; on failure the temp file is removed.
+        progress(received, size) is called after every chunk; setting the
+        `cancel` event raises TransferCancelled (see send_file for what
+        happens to the connection).  `data` is a PASV data connection.
+        """
+        if not self.sock:
+            raise Exception("Socket is not connected.")
+
+        if self._xfer_buf is None:
+            self._xfer_buf = bytearray(FILE_CHUNK)
+
+        folder = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(
+            prefix="." + os.path.basename(path) + ".", suffix=".part", dir=folder
+        )
+        try:
+            with os.fdopen(fd, "wb") as f:
+                try:
+                    if data is None:
+                        got = receive_file(self.sock, f, size, progress=progress, cancel=cancel,
+                                           prefix=self._take_buffered(size), buf=self._xfer_buf)
+                    else:
+                        got = receive_file(data, f, size, progress=progress, cancel=cancel,
+                                           buf=self._xfer_buf)
+                except TransferAborted as e:
+                    self._abort_transfer(e, data)
+                except IncompleteTransfer as e:
+                    raise ConnectionError(str(e)) from None
+                os.fsync(f.fileno())
+
+            os.replace(tmp_path, path)
+            _fsync_dir(folder)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+        self.log(f"Received {got} / {size} bytes into {path}.")
+        return got
+
+    # ----------------------------------------------------
+    # FTP OPERATIONS (one command round-trip each)
+    # ----------------------------------------------------
+    def login(self, username: str, password: str) -> dict:
+        """USER/PASS; returns the permission flags from the PERMS line."""
+        self.send(f"USER {username}")
+        response = self.receive()
+        if not response.startswith("331"):
+            raise FTPError(response)
+
+        self.send(f"PASS {password}")
+        response = self.receive()
+        if not response.startswith("230"):
+            raise FTPError(response)
+
+        perms = {"read": False, "write": False, "delete": False}
+        line = self.receive()
+        if line.startswith("PERMS"):
+            for token in line.split()[1:]:
+                if "=" in token:
+                    k, v = token.split("=", 1)
+                    perms[k] = bool(int(v))
+        return perms
+
+    def noop(self) -> bool:
+        """Cheap liveness check; False if the session is no longer usable."""
+        try:
+            self.send("NOOP")
+            return self.receive().startswith("200")
+        except Exception:
+            return False
+
+    def list_dir(self) -> list:
+        """LIST the current directory as [(kind, size, mtime, name), ...]."""
+        return self.list_dir_tagged()[0]
+
+    def list_dir_tagged(self, if_none_match: str = None):
+        """
+        Conditional LIST.  Returns (entries, tag); entries is None when the
+        server reports the directory unchanged since `if_none_match`.
+        """
+        self.send(f"LIST -l IF-NONE-MATCH {if_none_match}" if if_none_match else "LIST -l")
+        lines = self.receive_multiline().split("\n")
+        last = lines[-1]
+        tag = last.split(" TAG ", 1)[1] if " TAG " in last else None
+
+        if last.startswith("250") and if_none_match:
+            return None, tag
+        if not last.startswith("226"):
+            raise FTPError(last)
+
+        entries = []
+        for line in lines:
+            if line.startswith("FILE") or line.startswith("DIR"):
+                parts = line.split(" ", 3)
+                if len(parts) == 4:
+                    kind, size, mtime, name = parts
+                    entries.append((kind, int(size), int(mtime), name))
+        return entries, tag
+
+    def find(self, pattern: str) -> list:
+        """
+        SITE FIND: search the whole home by glob or substring.  Returns
+        [(kind, size, mtime, path), ...] with paths from the home root.
+        """
+        self.send(f"SITE FIND {pattern}")
+        lines = self.receive_multiline().split("\n")
+        if not lines[-1].startswith("226"):
+            raise FTPError(lines[-1])
+
+        results = []
+        for line in lines[1:-1]:
+            parts = line.split(" ", 3)
+            if len(parts) == 4:
+                kind, size, mtime, path = parts
+                results.append((kind, int(size), int(mtime), path))
+        return results
+
+    def upload(self, path: str, remote_name: str = None, progress=None, cancel=None) -> str:
+        remote_name = remote_name or os.path.basename(path)
+        size = os.path.getsize(path)
+
+        data = self.open_data_connection() if self.passive else None
+        try:
+            self.send(f"STOR {remote_name} {size}")
+            response = self.receive()
+            if not response.startswith("150"):
+                raise FTPError(response)
+
+            self.send_file(path, progress=progress, cancel=cancel, data=data)
+            if data is not None:
+                _drain_data(data)
+        finally:
+            if data is not None:
+                data.close()
+
+        done = self.receive()
+        if not done.startswith("226"):
+            raise FTPError(done)
+        return done
+
+    def download(self, remote_name: str, save_path: str, progress=None, cancel=None) -> str:
+        data = self.open_data_connection() if self.passive else None
+        try:
+            self.send(f"RETR {remote_name}")
+            response = self.receive()
+            if not response.startswith("150"):
+                raise FTPError(response)
+
+            size = int(response.split()[1])
+            self.receive_to_file(size, save_path, progress=progress, cancel=cancel, data=data)
+        finally:
+            if data is not None:
+                data.close()
+
+        done = self.receive()
+        if not done:
+            # server terminates the payload with an empty line
+            done = self.receive()
+        if not done.startswith("226"):
+            raise FTPError(done)
+        return done
+
+    def open_data_connection(self) -> socket.socket:
+        """
+        PASV: connect the data connection for the next RETR/STOR.  Over TLS
+        it resumes the control connection's session; the handshake happens
+        on first use, once the server has the command and accepts.
+        """
+        self.send("PASV")
+        response = self.receive()
+        match = _PASV_RE.search(response) if response.startswith("227") else None
+        if not match:
+            raise FTPError(response)
+        port = int(match.group(5)) << 8 | int(match.group(6))
+
+        # connect to the control host rather than the advertised address,
+        # which is the server's own view (wrong behind NAT)
+        sock = socket.create_connection((self.host, port), timeout=self.timeout)
+        if self.tls is not None:
+            sock = self.tls.wrap(sock, self.host, self.port, handshake=False)
+        return sock
+
+    def abort(self) -> str:
+        """
+        ABOR the running data-connection transfer.  The server may first
+        answer the transfer itself (426, or 226 if it had just finished);
+        the ABOR reply is 225 (nothing running) or '226 Abort successful'.
+        """
+        self.send("ABOR")
+        while True:
+            line = self.receive()
+            if line.startswith("225") or line.startswith("226 Abort"):
+                return line
+
+    def delete(self, remote_name: str) -> str:
+        self.send(f"DELE {remote_name}")
+        response = self.receive()
+        if not response.startswith("250"):
+            raise FTPError(response)
+        return response
+
+    def rename(self, remote_name: str, new_name: str) -> str:
+        """RNFR/RNTO: move a file or directory on the server."""
+        self.send(f"RNFR {remote_name}")
+        response = self.receive()
+        if not response.startswith("350"):
+            raise FTPError(response)
+        self.send(f"RNTO {new_name}")
+        response = self.receive()
+        if not response.startswith("250"):
+            raise FTPError(response)
+        return response
+
+    def copy(self, remote_name: str, new_name: str) -> str:
+        """SITE COPY: duplicate a file on the server; no data crosses the network."""
+        self.send(f"SITE COPY {remote_name} {new_name}")
+        response = self.receive()
+        if not response.startswith("250"):
+            raise FTPError(response)
+        return response
 
     # ----------------------------------------------------
     # CLOSE CONNECTION
@@ -142,9 +497,46 @@ class ClientSocket:
     def close(self):
         if self.sock:
             try:
+                if self.tls is not None:
+                    self.tls.remember(self.sock, self.host, self.port)
                 self.sock.close()
                 self.log("Connection closed.")
             except Exception as e:
                 self.log(f"Error closing socket: {e}")
 
             self.sock = None
+            self._rbuf.clear()
+
+
+def _drain_data(data):
+    """
+    Half-close an upload's data connection and wait for the server to
+    close its side.  Closing outright while unread bytes (e.g. TLS session
+    tickets) sit in our receive buffer would send an RST that can destroy
+    the tail of the payload before the server has read it.
+    """
+    try:
+        data.shutdown(socket.SHUT_WR)
+        while data.recv(RECV_BUFSIZE):
+            pass
+    except OSError:
+        pass
+
+
+def _is_final_reply(line: str) -> bool:
+    """A 2xx-5xx reply code ends a multi-line response (1xx is preliminary)."""
+    return len(line) >= 3 and line[:3].isdigit() and line[0] in "2345"
+
+
+def _fsync_dir(folder: str):
+    """Persist a rename; not supported on every platform (e.g. Windows)."""
+    try:
+        fd = os.open(folder, os.O_RDONLY | getattr(os, "O_DIRECTORY", 0))
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
@@ -0,0 +1,193 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from backend.client_socket import ClientSocket
+
+
+class PoolExhausted(Exception):
+    """No connection became available within the lease timeout."""
+
+
+class _PooledConnection:
+    def __init__(self, client):
+        self.client = client
+        self.last_used = time.monotonic()
+        self.last_checked = self.last_used
+
+
+class ConnectionPool:
+    """
+    Keeps up to `max_size` authenticated ClientSocket control connections
+    and leases them to concurrent operations:
+
+        with pool.lease() as client:
+            client.list_dir()
+
+    Idle connections are health-checked with NOOP before reuse (when they
+    have been idle longer than `check_after`), re-authenticated when the
+    check fails, and closed by a background reaper after `idle_timeout`.
+    """
+
+    def __init__(self, host, port, username, password, max_size=4,
+                 idle_timeout=120.0, check_after=15.0, lease_timeout=30.0,
+                 timeout=10.0, logger=None, seed=None, tls=None):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.check_after = check_after
+        self.lease_timeout = lease_timeout
+        self.timeout = timeout
+        self.logger = logger
+        # new connections speak TLS like the seed (and resume its session)
+        # and use its transfer mode
+        self.tls = tls if tls is not None else getattr(seed, "tls", None)
+        self.passive = getattr(seed, "passive", False)
+
+        self._idle = []                      # LIFO: warmest connection first
+        self._cond = threading.Condition()
+        self._open = 0                       # idle + leased
+        self._closed = False
+
+        if seed is not None and seed.sock:
+            # adopt the session the login window already authenticated
+            self._idle.append(_PooledConnection(seed))
+            self._open = 1
+
+        self._reaper = threading.Thread(target=self._reap_loop, name="pool-reaper", daemon=True)
+        self._reaper.start()
+
+    # ----------------------------------------------------
+    def log(self, text):
+        if self.logger:
+            self.logger.log(f"[Pool] {text}", component="pool")
+
+    # ----------------------------------------------------
+    # LEASE / RELEASE
+    # ----------------------------------------------------
+    @contextmanager
+    def lease(self):
+        conn = self.acquire()
+        broken = False
+        try:
+            yield conn.client
+        except (OSError, ConnectionError):
+            broken = True
+            raise
+        finally:
+            self.release(conn, broken=broken)
+
+    def acquire(self):
+        deadline = time.monotonic() + self.lease_timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise ConnectionError("Connection pool is closed.")
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if self._open < self.max_size:
+                    self._open += 1
+                    conn = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolExhausted(f"No connection available after {self.lease_timeout}s.")
+                self._cond.wait(remaining)
+
+        # network work happens outside the lock
+        try:
+            if conn is None:
+                conn = _PooledConnection(self._new_client())
+            elif time.monotonic() - conn.last_checked > self.check_after:
+                if not conn.client.noop():
+                    self.log("Stale connection, re-authenticating.")
+                    conn.client.close()
+                    conn.client = self._new_client()
+                conn.last_checked = time.monotonic()
+        except BaseException:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+
+        return conn
+
+    def release(self, conn, broken=False):
+        now = time.monotonic()
+        conn.last_used = now
+        if broken or not conn.client.sock or self._closed:
+            # cancelled transfers close their socket; never hand those out again
+            conn.client.close()
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            return
+
+        # a successful operation is as good as a health check
+        conn.last_checked = now
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def open_dedicated(self):
+        """A fresh authenticated connection outside the pool (e.g. for WATCH)."""
+        return self._new_client()
+
+    def _new_client(self):
+        client = ClientSocket(self.host, self.port, timeout=self.timeout, logger=self.logger,
+                              tls=self.tls, passive=self.passive)
+        if not client.connect():
+            raise ConnectionError(f"Could not connect to {self.host}:{self.port}.")
+        try:
+            client.login(self.username, self.password)
+        except Exception:
+            client.close()
+            raise
+        self.log(f"Opened connection ({self._open}/{self.max_size}).")
+        return client
+
+    # ----------------------------------------------------
+    # IDLE EVICTION
+    # ----------------------------------------------------
+    def _reap_loop(self):
+        interval = max(1.0, min(self.idle_timeout / 4, 30.0))
+        while True:
+            time.sleep(interval)
+            with self._cond:
+                if self._closed:
+                    return
+                now = time.monotonic()
+                expired = [c for c in self._idle if now - c.last_used > self.idle_timeout]
+                for c in expired:
+                    self._idle.remove(c)
+                    self._open -= 1
+                if expired:
+                    self._cond.notify_all()
+            for c in expired:
+                self._quit(c.client)
+            if expired:
+                self.log(f"Evicted {len(expired)} idle connection(s).")
+
+    def _quit(self, client):
+        try:
+            client.send("QUIT")
+        except Exception:
+            pass
+        client.close()
+
+    def stats(self):
+        with self._cond:
+            return {"open": self._open, "idle": len(self._idle), "max": self.max_size}
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+            self._cond.notify_all()
+        for c in idle:
+            self._quit(c.client)
@@ -0,0 +1,41 @@
+import threading
+
+
+class ListingCache:
+    """
+    Per-directory LIST cache keyed by the server's directory version tag.
+
+    fetch() sends `LIST IF-NONE-MATCH <tag>` when a listing is cached, so an
+    unchanged directory costs one short reply instead of a full listing.
+    """
+
+    def __init__(self):
+        self._entries = {}       # directory -> (tag, entries)
+        self._lock = threading.Lock()
+
+    def get(self, directory="/"):
+        with self._lock:
+            return self._entries.get(directory, (None, None))
+
+    def fetch(self, client, directory="/"):
+        """Returns (entries, changed) for `directory` (the client's cwd)."""
+        tag, cached = self.get(directory)
+        entries, new_tag = client.list_dir_tagged(if_none_match=tag)
+
+        if entries is None:
+            return cached, False
+
+        with self._lock:
+            if new_tag:
+                self._entries[directory] = (new_tag, entries)
+            else:
+                # server without tags: nothing to validate against later
+                self._entries.pop(directory, None)
+        return entries, cached is None or entries != cached
+
+    def invalidate(self, directory=None):
+        with self._lock:
+            if directory is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(directory, None)
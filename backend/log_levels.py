@@ -0,0 +1,31 @@
+# backend/log_levels.py
+"""Log level names shared by the Qt Logger and the Qt-free ClientSocket."""
+
+DEBUG, INFO, WARN, ERROR = "DEBUG", "INFO", "WARN", "ERROR"
+
+LEVELS = {DEBUG: 10, INFO: 20, WARN: 30, ERROR: 40}
+
+
+def level_value(level) -> int:
+    """Numeric value of a level name (unknown names count as INFO)."""
+    if isinstance(level, int):
+        return level
+    return LEVELS.get(str(level).upper(), LEVELS[INFO])
+
+
+def parse_levels(spec: str) -> dict:
+    """
+    Parse "INFO,client=DEBUG,pool=WARN" into {None: 20, "client": 10, ...};
+    the bare entry (key None) is the default for every other component.
+    """
+    levels = {}
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        if "=" in item:
+            component, level = item.split("=", 1)
+            levels[component.strip()] = level_value(level.strip())
+        else:
+            levels[None] = level_value(item)
+    return levels
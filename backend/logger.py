@@ -1,24 +1,72 @@
 # backend/logger.py
 from PyQt5.QtCore import QObject, pyqtSignal
+from collections import deque
 import threading
 import datetime
+import tempfile
+import atexit
+import shutil
+import time
+import gzip
 import os
 
+from backend.log_levels import INFO, level_value, parse_levels
+
+RING_CAPACITY = 5000          # lines kept in memory
+SPILL_BATCH = 500             # evicted lines written to disk per batch
+SEGMENT_LINES = 50000         # lines per compressed segment file
+MAX_SEGMENTS = 20             # oldest segments beyond this are deleted
+
+
 class Logger(QObject):
     """
     Thread-safe singleton logger that emits a Qt signal on new log lines.
     Use Logger.instance().log(...) from anywhere (threadsafe).
+
+    Memory is bounded: the newest RING_CAPACITY lines live in a ring
+    buffer, older lines spill in batches to rotating gzip segment files
+    (at most MAX_SEGMENTS of them), compressed by a background writer
+    thread so log() never waits for gzip.  iter_lines() / save_to_file()
+    stream the segments followed by the ring without building one big
+    string.  The spill directory is removed by close() (also at exit).
+
+    Levels are configurable per component (set_level / configure); a
+    disabled message is dropped before it is formatted, and `message` may
+    be a callable so expensive text is only built when it will be used.
     """
     new_log = pyqtSignal(str)
 
     _instance = None
     _lock = threading.Lock()
 
-    def __init__(self):
+    def __init__(self, capacity=RING_CAPACITY, spill_dir=None,
+                 segment_lines=SEGMENT_LINES, max_segments=MAX_SEGMENTS):
         super().__init__()
-        self._lines = []
+        self._lines = deque()
+        self._capacity = capacity
         self._lines_lock = threading.Lock()
 
+        self._spill = []                  # evicted lines not yet handed to the writer
+        self._pending = deque()           # full batches waiting for the writer
+        self._spill_dir = spill_dir       # created lazily on first spill
+        self._own_spill_dir = spill_dir is None
+        self._segments = []               # closed + current segment paths, oldest first
+        self._segment_counts = {}         # path -> lines written to it
+        self._segment_lines = segment_lines
+        self._max_segments = max_segments
+        self._seq = 0
+        self.dropped = 0                  # lines lost to segment rotation
+
+        # lock order: _disk_lock before _lines_lock
+        self._disk_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._writer = None
+        self._closed = False
+
+        self._levels = {None: level_value(INFO)}   # component -> threshold
+        self._ts_second = None
+        self._ts_text = ""
+
     @classmethod
     def instance(cls):
         with cls._lock:
@@ -27,43 +75,207 @@ class Logger(QObject):
             return cls._instance
 
     def _timestamp(self):
-        return datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        # strftime once per second, not once per line
+        now = int(time.time())
+        if now != self._ts_second:
+            self._ts_text = datetime.datetime.fromtimestamp(now).strftime("%Y-%m-%d %H:%M:%S")
+            self._ts_second = now
+        return self._ts_text
+
+    # ----------------------------------------------------
+    # LEVELS
+    # ----------------------------------------------------
+    def set_level(self, level, component=None):
+        """Threshold for `component` (None = default for all components)."""
+        self._levels = {**self._levels, component: level_value(level)}
+
+    def configure(self, spec: str):
+        """Apply a spec such as "INFO,client=DEBUG" (see log_levels.parse_levels)."""
+        self._levels = {**self._levels, **parse_levels(spec)}
+
+    def is_enabled(self, level="INFO", component=None) -> bool:
+        levels = self._levels
+        threshold = levels.get(component, levels[None]) if component else levels[None]
+        return level_value(level) >= threshold
 
-    def log(self, message: str, level: str = "INFO"):
+    def log(self, message, level: str = "INFO", component: str = None):
         """
         Append a message with timestamp and emit signal.
         level: INFO, WARN, ERROR, DEBUG
+        message may be a zero-argument callable, evaluated only if enabled.
         """
+        if not self.is_enabled(level, component):
+            return
+        if callable(message):
+            message = message()
         ts = self._timestamp()
         line = f"[{ts}] [{level}] {message}"
         with self._lines_lock:
             self._lines.append(line)
+            if len(self._lines) > self._capacity:
+                self._spill.append(self._lines.popleft())
+                if len(self._spill) >= SPILL_BATCH:
+                    self._hand_off_spill()
         # emit signal for UI (Qt signal; safe to emit from main thread; if called from other threads it still works)
-        try:
-            self.new_log.emit(line)
-        except Exception:
-            # signal may not be connected — that's fine
-            pass
+        # skipped entirely while no window is listening
+        if self.receivers(self.new_log) > 0:
+            try:
+                self.new_log.emit(line)
+            except Exception:
+                pass
 
+    # ----------------------------------------------------
+    # SEGMENT SPILL
+    # ----------------------------------------------------
+    def _hand_off_spill(self):
+        """Queue the spill batch for the writer thread (_lines_lock held)."""
+        if self._closed:
+            self.dropped += len(self._spill)
+        else:
+            self._pending.append(self._spill)
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop,
+                                                name="log-spill", daemon=True)
+                self._writer.start()
+            self._wake.set()
+        self._spill = []
+
+    def _write_loop(self):
+        while not self._closed:
+            self._wake.wait()
+            self._wake.clear()
+            while not self._closed and self._write_batch():
+                pass
+
+    def _write_batch(self):
+        """Append the oldest pending batch to the current segment."""
+        with self._disk_lock:
+            with self._lines_lock:
+                if not self._pending:
+                    return False
+                batch = self._pending[0]
+                if self._spill_dir is None:
+                    self._spill_dir = tempfile.mkdtemp(prefix="lockbox-log-")
+                    atexit.register(self.close)
+                rotated = []
+                if not self._segments or \
+                        self._segment_counts[self._segments[-1]] >= self._segment_lines:
+                    rotated = self._new_segment()
+                segment = self._segments[-1]
+
+            for path in rotated:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            # every batch is appended as its own gzip member; the lock is
+            # not held, so logging threads never wait for the compression
+            try:
+                os.makedirs(self._spill_dir, exist_ok=True)
+                with gzip.open(segment, "at", encoding="utf-8") as f:
+                    f.write("\n".join(batch))
+                    f.write("\n")
+                written = len(batch)
+            except OSError:
+                written = 0             # disk full etc.: lose the batch, not the logger
+
+            with self._lines_lock:
+                self._pending.popleft()
+                if segment in self._segment_counts:
+                    self._segment_counts[segment] += written
+                self.dropped += len(batch) - written
+        return True
+
+    def _new_segment(self):
+        """Start a segment (_lines_lock held); returns rotated-out paths to delete."""
+        self._seq += 1
+        path = os.path.join(self._spill_dir, f"segment-{self._seq:06d}.log.gz")
+        self._segments.append(path)
+        self._segment_counts[path] = 0
+        rotated = []
+        while len(self._segments) > self._max_segments:
+            oldest = self._segments.pop(0)
+            self.dropped += self._segment_counts.pop(oldest, 0)
+            rotated.append(oldest)
+        return rotated
+
+    # ----------------------------------------------------
+    # READING
+    # ----------------------------------------------------
     def get_all(self):
+        """The most recent lines (the in-memory ring only)."""
         with self._lines_lock:
             return list(self._lines)
 
-    def clear(self):
+    def iter_lines(self):
+        """Every retained line, oldest first, streamed from disk then memory."""
         with self._lines_lock:
+            # a batch is either counted in its segment or still pending;
+            # reading each segment only up to its count ignores batches
+            # the writer appends after this snapshot
+            segments = [(seg, self._segment_counts[seg]) for seg in self._segments]
+            pending = [line for batch in self._pending for line in batch]
+            recent = self._spill + list(self._lines)
+
+        for seg, count in segments:
+            if not count:
+                continue
+            try:
+                with gzip.open(seg, "rt", encoding="utf-8") as f:
+                    for _, line in zip(range(count), f):
+                        yield line.rstrip("\n")
+            except (FileNotFoundError, EOFError):
+                # rotated away while we were reading older segments
+                continue
+        yield from pending
+        yield from recent
+
+    def clear(self):
+        with self._disk_lock, self._lines_lock:
             self._lines.clear()
+            self._spill = []
+            self._pending.clear()
+            for seg in self._segments:
+                try:
+                    os.unlink(seg)
+                except OSError:
+                    pass
+            self._segments.clear()
+            self._segment_counts.clear()
         # inform UI
         try:
             self.new_log.emit("[LOGGER] CLEARED")
         except Exception:
             pass
 
-    def save_to_file(self, path: str):
+    def close(self):
+        """Stop the spill writer and delete the spilled segments."""
         with self._lines_lock:
-            data = "\n".join(self._lines)
+            if self._closed:
+                return
+            self._closed = True
+        self._wake.set()
+        if self._writer is not None:
+            self._writer.join()
+        with self._disk_lock, self._lines_lock:
+            self._pending.clear()
+            if self._own_spill_dir and self._spill_dir is not None:
+                shutil.rmtree(self._spill_dir, ignore_errors=True)
+            else:
+                for seg in self._segments:
+                    try:
+                        os.unlink(seg)
+                    except OSError:
+                        pass
+            self._segments.clear()
+            self._segment_counts.clear()
+
+    def save_to_file(self, path: str):
         folder = os.path.dirname(path)
         if folder and not os.path.exists(folder):
             os.makedirs(folder, exist_ok=True)
         with open(path, "w", encoding="utf-8") as f:
-            f.write(data)
+            for line in self.iter_lines():
+                f.write(line)
+                f.write("\n")
         self.log(f"Saved logs to {path}", level="INFO")
@@ -0,0 +1,57 @@
+import os
+import ssl
+import threading
+
+
+class ClientTLS:
+    """
+    Client-side TLS settings shared by every connection of a session.
+
+    Besides the SSLContext it keeps the last resumable session per server,
+    so reconnects (pool growth, re-authentication, the WATCH connection,
+    a GUI reconnect) resume with a ticket instead of a full handshake.
+    """
+
+    def __init__(self, cafile=None, verify=True):
+        ctx = ssl.create_default_context(cafile=cafile)
+        ctx.minimum_version = ssl.TLSVersion.TLSv1_2
+        if not verify:
+            ctx.check_hostname = False
+            ctx.verify_mode = ssl.CERT_NONE
+        self.context = ctx
+        self._sessions = {}              # (host, port) -> ssl.SSLSession
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, environ=os.environ):
+        """
+        LOCKBOX_TLS unset/empty -> None (plain TCP); "1" -> system CAs;
+        anything else is a CA bundle path (e.g. a self-signed cert).
+        """
+        value = environ.get("LOCKBOX_TLS", "")
+        if not value:
+            return None
+        if value.lower() in ("1", "on", "yes", "system"):
+            return cls()
+        return cls(cafile=value)
+
+    def wrap(self, sock, host, port, handshake=True):
+        """
+        Wrap `sock`, resuming the session remembered for (host, port).  With
+        handshake=False the handshake runs on the first read or write.
+        """
+        with self._lock:
+            session = self._sessions.get((host, port))
+        return self.context.wrap_socket(sock, server_hostname=host, session=session,
+                                        do_handshake_on_connect=handshake)
+
+    def remember(self, sock, host, port):
+        """Keep the connection's session if the server issued a ticket."""
+        session = getattr(sock, "session", None)
+        if session is not None and session.has_ticket:
+            with self._lock:
+                self._sessions[(host, port)] = session
+
+    def forget(self, host, port):
+        with self._lock:
+            self._sessions.pop((host, port), None)
@@ -0,0 +1,90 @@
+import socket
+import threading
+
+
+class DirectoryWatcher:
+    """
+    Subscribes to server-push change events (WATCH) on a dedicated
+    connection and hands each one to `on_event(kind, size, mtime, name)`.
+
+    kind is "ADD", "MOD", "DEL" or "RESYNC" (events were dropped; do a
+    full LIST).  `connect` must return a logged-in ClientSocket; the
+    watcher reconnects with backoff if the connection drops, and reports a
+    RESYNC after every reconnect since events may have been missed.
+    """
+
+    def __init__(self, connect, on_event, directory="/", logger=None):
+        self.connect = connect
+        self.on_event = on_event
+        self.directory = directory
+        self.logger = logger
+        self._client = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="dir-watcher", daemon=True)
+
+    def log(self, text):
+        if self.logger:
+            self.logger.log(f"[Watcher] {text}", component="watcher")
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        client = self._client
+        if client:
+            try:
+                client.send("UNWATCH")
+            except Exception:
+                pass
+            client.close()
+
+    # ----------------------------------------------------
+    def _run(self):
+        backoff = 1.0
+        first = True
+        while not self._stop.is_set():
+            try:
+                self._client = self.connect()
+                self._client.send(f"WATCH {self.directory}")
+                reply = self._client.receive()
+                if not reply.startswith("150"):
+                    self.log(f"WATCH refused: {reply}")
+                    return
+
+                if not first:
+                    self.on_event("RESYNC", 0, 0, "")
+                first = False
+                backoff = 1.0
+                self._read_events()
+            except Exception as e:
+                if self._stop.is_set():
+                    return
+                self.log(f"Watch connection lost ({e}); retrying in {backoff:.0f}s.")
+            finally:
+                if self._client:
+                    self._client.close()
+                    self._client = None
+
+            if self._stop.wait(backoff):
+                return
+            backoff = min(backoff * 2, 30.0)
+
+    def _read_events(self):
+        while not self._stop.is_set():
+            try:
+                line = self._client.receive()
+            except socket.timeout:
+                continue   # idle directory; keep waiting
+
+            if not line.startswith("EVENT "):
+                if line.startswith("226"):
+                    return
+                continue
+
+            parts = line.split(" ", 4)
+            kind = parts[1]
+            size = int(parts[2]) if len(parts) > 2 else 0
+            mtime = int(parts[3]) if len(parts) > 3 else 0
+            name = parts[4] if len(parts) > 4 else ""
+            self.on_event(kind, size, mtime, name)
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Headless load generator for ThreadedFTPServer.
+
+Starts server.py on localhost inside a throwaway directory (fresh
+ftp_users.db + seeded homes), drives N concurrent clients through a
+weighted mix of commands and prints a JSON report:
+
+    python -m benchmarks.load_test --clients 16 --duration 20 \
+        --mix login=1,LIST=4,RETR=4,STOR=2,DELE=1 --output run.json
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SERVER_SCRIPT = REPO_ROOT / "server.py"
+
+USERNAME = "admin"       # the only sample user with delete permission
+PASSWORD = "adminpwd"
+SEED_FILE = "seed.bin"
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+# ==========================================================
+# MINIMAL PROTOCOL CLIENT (no logging on the hot path)
+# ==========================================================
+
+
+class BenchClient:
+    def __init__(self, host, port):
+        self.sock = socket.create_connection((host, port), timeout=30)
+        self.rfile = self.sock.makefile("rb")
+        self.line()  # banner
+
+    def cmd(self, text):
+        self.sock.sendall((text + "\r\n").encode())
+        return self.line()
+
+    def line(self):
+        line = self.rfile.readline()
+        if not line:
+            raise ConnectionError("server closed connection")
+        return line.decode().strip()
+
+    def login(self):
+        self.cmd(f"USER {USERNAME}")
+        resp = self.cmd(f"PASS {PASSWORD}")
+        if not resp.startswith("230"):
+            raise RuntimeError(resp)
+        self.line()  # PERMS
+
+    def list(self):
+        resp = self.cmd("LIST")
+        if not resp.startswith("150"):
+            return resp
+        while True:
+            line = self.line()
+            if line[:3].isdigit() and line[0] in "2345":
+                return line
+
+    def retr(self, name):
+        resp = self.cmd(f"RETR {name}")
+        if not resp.startswith("150"):
+            return resp
+        remain = int(resp.split()[1])
+        while remain > 0:
+            chunk = self.rfile.read(min(65536, remain))
+            if not chunk:
+                raise ConnectionError("short read")
+            remain -= len(chunk)
+        self.line()  # blank separator
+        return self.line()
+
+    def stor(self, name, payload):
+        resp = self.cmd(f"STOR {name} {len(payload)}")
+        if not resp.startswith("150"):
+            return resp
+        self.sock.sendall(payload)
+        return self.line()
+
+    def dele(self, name):
+        return self.cmd(f"DELE {name}")
+
+    def close(self):
+        try:
+            self.cmd("QUIT")
+        except Exception:
+            pass
+        self.rfile.close()
+        self.sock.close()
+
+
+# ==========================================================
+# SERVER PROCESS
+# ==========================================================
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(workdir, port, seed_size, extra_args=()):
+    subprocess.run([sys.executable, str(SERVER_SCRIPT), "--init"],
+                   cwd=workdir, check=True, stdout=subprocess.DEVNULL)
+
+    home = Path(workdir) / "ftp_homes" / USERNAME
+    home.mkdir(parents=True, exist_ok=True)
+    (home / SEED_FILE).write_bytes(os.urandom(seed_size))
+
+    proc = subprocess.Popen(
+        [sys.executable, str(SERVER_SCRIPT), "--host", "127.0.0.1",
+         "--port", str(port), *extra_args],
+        cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return proc
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError("server did not start")
+
+
+class ProcessSampler(threading.Thread):
+    """Samples server CPU time and RSS (psutil if installed, else /proc)."""
+
+    def __init__(self, pid, interval=0.2):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak_rss = 0
+        self._done = threading.Event()
+        self._proc = psutil.Process(pid) if psutil else None
+        self.cpu_start = self.cpu_seconds()
+
+    def cpu_seconds(self):
+        if self._proc:
+            t = self._proc.cpu_times()
+            return t.user + t.system
+        with open(f"/proc/{self.pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+    def rss(self):
+        if self._proc:
+            return self._proc.memory_info().rss
+        with open(f"/proc/{self.pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+        return 0
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            try:
+                self.peak_rss = max(self.peak_rss, self.rss())
+            except (OSError, ValueError):
+                return
+
+    def stop(self):
+        self._done.set()
+        self.join()
+        self.cpu_end = self.cpu_seconds()
+        self.end_rss = self.rss()
+
+
+# ==========================================================
+# WORKLOAD
+# ==========================================================
+
+
+def parse_mix(text):
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def client_worker(idx, host, port, mix, payload, deadline, max_ops, results, errors):
+    rng = random.Random(idx)
+    names, weights = zip(*mix.items())
+    stored = []
+    seq = 0
+    ops = 0
+
+    client = BenchClient(host, port)
+    client.login()
+    try:
+        while time.monotonic() < deadline and (not max_ops or ops < max_ops):
+            op = rng.choices(names, weights)[0]
+            if op == "DELE" and not stored:
+                op = "STOR"
+
+            t0 = time.perf_counter()
+            try:
+                if op == "login":
+                    extra = BenchClient(host, port)
+                    extra.login()
+                    extra.close()
+                    resp = "230"
+                elif op == "LIST":
+                    resp = client.list()
+                elif op == "RETR":
+                    resp = client.retr(SEED_FILE)
+                elif op == "STOR":
+                    name = f"c{idx}_{seq}.bin"
+                    seq += 1
+                    resp = client.stor(name, payload)
+                    stored.append(name)
+                elif op == "DELE":
+                    resp = client.dele(stored.pop(rng.randrange(len(stored))))
+                else:
+                    raise ValueError(f"unknown op {op}")
+            except Exception as e:
+                errors.append(f"{op}: {e}")
+                client = BenchClient(host, port)
+                client.login()
+                continue
+
+            results[op].append(time.perf_counter() - t0)
+            if not resp.startswith(("2", "3")):
+                errors.append(f"{op}: {resp}")
+            ops += 1
+    finally:
+        client.close()
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    k = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+def run(opts):
+    mix = parse_mix(opts.mix)
+    workdir = tempfile.mkdtemp(prefix="ftp-bench-")
+    port = opts.port or free_port()
+    proc = start_server(workdir, port, opts.seed_size, opts.server_arg)
+
+    try:
+        sampler = ProcessSampler(proc.pid)
+        sampler.start()
+
+        results = {op: [] for op in mix}
+        errors = []
+        payload = os.urandom(opts.file_size)
+        started = time.monotonic()
+        deadline = started + opts.duration
+
+        threads = [
+            threading.Thread(target=client_worker,
+                             args=(i, "127.0.0.1", port, mix, payload, deadline,
+                                   opts.ops, results, errors))
+            for i in range(opts.clients)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        elapsed = time.monotonic() - started
+        sampler.stop()
+    finally:
+        proc.terminate()
+        proc.wait(5)
+        if not opts.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    per_command = {}
+    total = 0
+    for op, samples in results.items():
+        samples.sort()
+        total += len(samples)
+        per_command[op] = {
+            "count": len(samples),
+            "ops_per_sec": len(samples) / elapsed if elapsed else 0,
+            "p50_ms": _ms(percentile(samples, 50)),
+            "p95_ms": _ms(percentile(samples, 95)),
+            "p99_ms": _ms(percentile(samples, 99)),
+        }
+
+    cpu = sampler.cpu_end - sampler.cpu_start
+    return {
+        "config": {
+            "clients": opts.clients,
+            "duration": opts.duration,
+            "ops_per_client": opts.ops,
+            "mix": mix,
+            "file_size": opts.file_size,
+            "seed_size": opts.seed_size,
+            "server_args": opts.server_arg,
+        },
+        "elapsed_sec": elapsed,
+        "total_ops": total,
+        "throughput_ops_per_sec": total / elapsed if elapsed else 0,
+        "commands": per_command,
+        "server": {
+            "cpu_sec": cpu,
+            "cpu_util": cpu / elapsed if elapsed else 0,
+            "peak_rss_bytes": max(sampler.peak_rss, sampler.end_rss),
+            "end_rss_bytes": sampler.end_rss,
+        },
+        "errors": len(errors),
+        "error_samples": errors[:10],
+    }
+
+
+def _ms(value):
+    return None if value is None else round(value * 1000, 3)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Load-test server.py")
+    ap.add_argument("--clients", type=int, default=8)
+    ap.add_argument("--duration", type=float, default=10.0, help="seconds")
+    ap.add_argument("--ops", type=int, default=0, help="max ops per client (0 = unlimited)")
+    ap.add_argument("--mix", default="login=1,LIST=4,RETR=4,STOR=2,DELE=1")
+    ap.add_argument("--file-size", type=int, default=64 * 1024, help="STOR payload bytes")
+    ap.add_argument("--seed-size", type=int, default=256 * 1024, help="RETR file bytes")
+    ap.add_argument("--port", type=int, default=0)
+    ap.add_argument("--server-arg", action="append", default=[],
+                    help="extra argument passed to server.py (repeatable)")
+    ap.add_argument("--keep", action="store_true", help="keep the temp server directory")
+    ap.add_argument("--output", help="write JSON here instead of stdout")
+    opts = ap.parse_args(argv)
+
+    report = run(opts)
+    text = json.dumps(report, indent=2)
+    if opts.output:
+        Path(opts.output).write_text(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the client/server hot paths.
+
+Every case runs in-process (socketpairs instead of real connections) and
+reports ops/sec plus the allocation profile of a single operation
+(tracemalloc peak bytes and number of live blocks allocated):
+
+    python -m benchmarks.micro                  # all cases
+    python -m benchmarks.micro -k receive       # cases whose name contains "receive"
+    python -m benchmarks.micro --json out.json
+
+Timing uses timeit (best of --repeat runs).
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import timeit
+import tracemalloc
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+import client as cli                               # noqa: E402
+from backend.client_socket import ClientSocket     # noqa: E402
+from server.storage import LocalStorage, make_storage  # noqa: E402
+
+BENCHMARKS = {}
+_SCRATCH_DIRS = []       # removed by measure() once the case is done
+
+
+def benchmark(name):
+    def deco(fn):
+        BENCHMARKS[name] = fn
+        return fn
+    return deco
+
+
+def scratch_dir():
+    """A fresh temporary directory that lives until the current case ends."""
+    path = Path(tempfile.mkdtemp(prefix="ftp-bench-"))
+    _SCRATCH_DIRS.append(path)
+    return path
+
+
+def load_server_module():
+    """Import server.py (shadowed by the server/ package) under another name."""
+    spec = importlib.util.spec_from_file_location("ftp_server_main", REPO_ROOT / "server.py")
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+# ==========================================================
+# SOCKETPAIR HELPERS
+# ==========================================================
+
+
+class Feeder:
+    """Writes a payload into one end of a socketpair from a helper thread."""
+
+    def __init__(self):
+        self.a, self.b = socket.socketpair()
+
+    def feed(self, payload):
+        t = threading.Thread(target=self.a.sendall, args=(payload,), daemon=True)
+        t.start()
+        return t
+
+    def close(self):
+        self.a.close()
+        self.b.close()
+
+
+def quiet_client(sock, **kwargs):
+    c = ClientSocket(**kwargs)
+    c.sock = sock
+    return c
+
+
+def qt_logger():
+    """A real backend.logger.Logger when PyQt5 is installed, else None."""
+    try:
+        from backend.logger import Logger
+    except ImportError:
+        return None
+    return Logger()
+
+
+@contextlib.contextmanager
+def silenced():
+    """ClientSocket.log may echo to stdout; keep the terminal out of the timing."""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+# ==========================================================
+# CASES
+# Each case returns (setup, op): setup() prepares one run, op() is timed.
+# ==========================================================
+
+
+@benchmark("clientsocket_receive_100_lines")
+def bench_clientsocket_receive():
+    payload = b"".join(b"FILE 12345 some_file_name_%05d.bin\r\n" % i for i in range(100))
+    state = {}
+
+    def setup():
+        f = Feeder()
+        state.update(f=f, c=quiet_client(f.b), t=f.feed(payload))
+
+    def op():
+        c = state["c"]
+        for _ in range(100):
+            c.receive()
+        state["t"].join()
+        state["f"].close()
+
+    return setup, op
+
+
+def _receive_lines_case(**client_kwargs):
+    payload = b"".join(b"FILE 12345 1700000000 some_file_name_%05d.bin\r\n" % i for i in range(1000))
+    state = {}
+
+    def setup():
+        f = Feeder()
+        state.update(f=f, c=quiet_client(f.b, **client_kwargs), t=f.feed(payload))
+
+    def op():
+        c = state["c"]
+        for _ in range(1000):
+            c.receive()
+        state["t"].join()
+        state["f"].close()
+
+    return setup, op
+
+
+@benchmark("log_overhead_receive_1000_debug_off")
+def bench_log_debug_off():
+    return _receive_lines_case()
+
+
+@benchmark("log_overhead_receive_1000_debug_print")
+def bench_log_debug_print():
+    return _receive_lines_case(print_level="DEBUG")
+
+
+@benchmark("log_overhead_receive_1000_logger_debug_off")
+def bench_log_logger_off():
+    logger = qt_logger()
+    if logger is None:
+        return None
+    return _receive_lines_case(logger=logger)
+
+
+@benchmark("log_overhead_receive_1000_logger_debug_on")
+def bench_log_logger_on():
+    logger = qt_logger()
+    if logger is None:
+        return None
+    logger.set_level("DEBUG", "client")
+    return _receive_lines_case(logger=logger)
+
+
+@benchmark("clientsocket_receive_multiline_10k")
+def bench_receive_multiline():
+    payload = b"".join(b"FILE 12345 some_file_name_%05d.bin\r\n" % i for i in range(10000))
+    payload += b"226 Done.\r\n"
+    state = {}
+
+    def setup():
+        f = Feeder()
+        state.update(f=f, c=quiet_client(f.b), t=f.feed(payload))
+
+    def op():
+        state["c"].receive_multiline()
+        state["t"].join()
+        state["f"].close()
+
+    return setup, op
+
+
+@benchmark("client_recv_line_100_lines")
+def bench_client_recv_line():
+    payload = b"".join(b"FILE 12345 some_file_name_%05d.bin\n" % i for i in range(100))
+    state = {}
+
+    def setup():
+        f = Feeder()
+        state.update(f=f, t=f.feed(payload))
+
+    def op():
+        sock = state["f"].b
+        for _ in range(100):
+            cli.recv_line(sock)
+        state["t"].join()
+        state["f"].close()
+
+    return setup, op
+
+
+@benchmark("clientsocket_receive_bytes_4mb")
+def bench_receive_bytes():
+    payload = os.urandom(4 * 1024 * 1024)
+    state = {}
+
+    def setup():
+        f = Feeder()
+        state.update(f=f, c=quiet_client(f.b), t=f.feed(payload))
+
+    def op():
+        state["c"].receive_bytes(len(payload))
+        state["t"].join()
+        state["f"].close()
+
+    return setup, op
+
+
+@benchmark("client_download_4mb")
+def bench_client_download():
+    payload = os.urandom(4 * 1024 * 1024)
+    state = {}
+
+    def setup():
+        f = Feeder()
+        state.update(f=f, t=f.feed(payload))
+
+    def op():
+        cli.recv_exact(state["f"].b, len(payload))
+        state["t"].join()
+        state["f"].close()
+
+    return setup, op
+
+
+@benchmark("session_paths_resolve")
+def bench_session_paths_resolve():
+    from server.paths import SessionPaths
+    base = scratch_dir()
+    (base / "docs" / "2024").mkdir(parents=True)
+    paths = SessionPaths(base)
+
+    def op():
+        for _ in range(100):
+            with paths.resolve("docs/2024/report.pdf") as target:
+                target.lstat()
+
+    return None, op
+
+
+@benchmark("file_index_search_50k")
+def bench_file_index_search():
+    from server.file_index import FileIndex
+    tmp = scratch_dir()
+    index = FileIndex(tmp, tmp / "index.db")
+    index.ready.set()
+    with index._db:
+        for i in range(50000):
+            index._upsert(f"dir_{i % 500:03d}/file_{i:06d}.bin", False, i, 0)
+
+    def op():
+        index.search("file_0123")
+        index.search("dir_042/*.bin")
+
+    return None, op
+
+
+def _small_files_case(spec):
+    """Write then read back 200 4 KiB files through a storage backend."""
+    tmp = scratch_dir()
+    storage = make_storage(spec.replace("<tmp>", str(tmp / "packs")))
+    paths = storage.session(tmp / "home")
+    payload = b"x" * 4096
+    state = {"round": 0}
+
+    def op():
+        state["round"] += 1
+        for i in range(200):
+            with paths.resolve(f"r{state['round']}/f{i:03d}.bin", create_dirs=True) as target:
+                _, f = target.open_write()
+                with f:
+                    f.write(payload)
+                f, _ = target.open_read()
+                with f:
+                    f.read()
+
+    return None, op
+
+
+@benchmark("small_files_200_local")
+def bench_small_files_local():
+    return _small_files_case("local")
+
+
+@benchmark("small_files_200_memory")
+def bench_small_files_memory():
+    return _small_files_case("memory")
+
+
+@benchmark("small_files_200_pack")
+def bench_small_files_pack():
+    return _small_files_case("pack:<tmp>")
+
+
+@benchmark("verify_password")
+def bench_verify_password():
+    srv = load_server_module()
+    pw_hash, salt = srv.make_password_hash("alicepwd")
+
+    def op():
+        srv.verify_password(pw_hash, salt, "alicepwd")
+
+    return None, op
+
+
+@benchmark("list_format_1000_entries")
+def bench_list_format():
+    srv = load_server_module()
+    cwd = scratch_dir()
+    for i in range(1000):
+        (cwd / f"file_{i:05d}.bin").write_bytes(b"x" * (i % 97))
+    state = {}
+
+    handler = srv.FTPHandler.__new__(srv.FTPHandler)
+    handler.auth = True
+    handler.permissions = {"read": True, "write": True, "delete": True}
+    handler.home = cwd
+    handler.paths = LocalStorage().session(cwd)
+    handler.reply_lock = threading.RLock()
+    handler.session = srv.Session(handler)
+
+    def setup():
+        handler.wfile = io.BytesIO()
+        state["h"] = handler
+
+    def op():
+        state["h"].cmd_LIST()
+
+    return setup, op
+
+
+# ==========================================================
+# RUNNER
+# ==========================================================
+
+
+def measure(name, factory, repeat, number):
+    try:
+        return _measure(name, factory, repeat, number)
+    finally:
+        while _SCRATCH_DIRS:
+            shutil.rmtree(_SCRATCH_DIRS.pop(), ignore_errors=True)
+
+
+def _measure(name, factory, repeat, number):
+    case = factory()
+    if case is None:
+        return None   # optional dependency missing
+    setup, op = case
+
+    def timed():
+        total = 0.0
+        for _ in range(number):
+            if setup:
+                setup()
+            total += timeit.timeit(op, number=1)
+        return total
+
+    with silenced():
+        timed()  # warm-up
+        best = min(timed() for _ in range(repeat))
+
+        if setup:
+            setup()
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        op()
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    blocks = sum(max(s.count_diff, 0) for s in after.compare_to(before, "filename"))
+    per_op = best / number
+    return {
+        "name": name,
+        "ops_per_sec": 1.0 / per_op if per_op else float("inf"),
+        "usec_per_op": per_op * 1e6,
+        "alloc_peak_bytes": peak,
+        "alloc_blocks": blocks,
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Client/server micro-benchmarks")
+    ap.add_argument("-k", dest="filter", default="", help="only run cases containing this text")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--number", type=int, default=5, help="operations per timed run")
+    ap.add_argument("--json", help="also write results to this file")
+    opts = ap.parse_args(argv)
+
+    results = []
+    for name, factory in BENCHMARKS.items():
+        if opts.filter not in name:
+            continue
+        r = measure(name, factory, opts.repeat, opts.number)
+        if r is None:
+            print(f"{name:40s} skipped (PyQt5 not installed)")
+            continue
+        results.append(r)
+        print(f"{name:40s} {r['ops_per_sec']:12.1f} ops/s  {r['usec_per_op']:12.1f} us/op  "
+              f"peak {r['alloc_peak_bytes'] / 1024:10.1f} KiB  {r['alloc_blocks']:7d} blocks")
+
+    if opts.json:
+        Path(opts.json).write_text(json.dumps(results, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Plain TCP vs TLS: handshake latency and bulk throughput.
+
+Generates a throwaway self-signed certificate (openssl CLI), starts one
+plain and one TLS server.py and measures, through ClientSocket:
+
+    connect        connect + banner (TLS: full handshake, fresh session cache)
+    resume         connect + banner with the previous session ticket (TLS only)
+    retr / stor    one --size MB transfer each way
+
+    python -m benchmarks.tls_bench --connects 50 --size 64 --output tls.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from backend.client_socket import ClientSocket              # noqa: E402
+from backend.tls import ClientTLS                           # noqa: E402
+from benchmarks.load_test import (free_port, start_server,  # noqa: E402
+                                  USERNAME, PASSWORD, SEED_FILE)
+
+
+def make_self_signed(directory):
+    """Write cert.pem / key.pem (CN=localhost, SAN 127.0.0.1) into directory."""
+    if shutil.which("openssl") is None:
+        raise SystemExit("openssl CLI not found; needed to create a test certificate")
+    cert, key = Path(directory) / "cert.pem", Path(directory) / "key.pem"
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "ec", "-pkeyopt", "ec_paramgen_curve:prime256v1",
+         "-nodes", "-keyout", str(key), "-out", str(cert), "-days", "2",
+         "-subj", "/CN=localhost", "-addext", "subjectAltName=IP:127.0.0.1,DNS:localhost"],
+        check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    return cert, key
+
+
+def client(port, tls):
+    return ClientSocket("127.0.0.1", port, timeout=30, print_level="WARN", tls=tls)
+
+
+def time_connects(port, count, make_tls):
+    """Latency (ms) of connect + banner; make_tls() picks the session cache."""
+    samples, resumed = [], 0
+    for _ in range(count):
+        c = client(port, make_tls())
+        t0 = time.perf_counter()
+        if not c.connect():
+            raise RuntimeError("connect failed")
+        samples.append((time.perf_counter() - t0) * 1000)
+        if c.tls is not None and c.sock.session_reused:
+            resumed += 1
+        c.close()
+    samples.sort()
+    return {
+        "median_ms": statistics.median(samples),
+        "p95_ms": samples[int(len(samples) * 0.95) - 1],
+        "resumed": resumed,
+    }
+
+
+def time_transfers(port, tls, workdir, size):
+    c = client(port, tls)
+    c.connect()
+    c.login(USERNAME, PASSWORD)
+
+    src = Path(workdir) / "upload.bin"
+    src.write_bytes(os.urandom(size))
+    t0 = time.perf_counter()
+    c.upload(str(src), "upload.bin")
+    stor = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    c.download(SEED_FILE, str(Path(workdir) / "download.bin"))
+    retr = time.perf_counter() - t0
+    c.close()
+
+    mb = size / (1024 * 1024)
+    return {"stor_mb_s": mb / stor, "retr_mb_s": mb / retr}
+
+
+def run(opts):
+    workdir = tempfile.mkdtemp(prefix="ftp-tls-bench-")
+    size = opts.size * 1024 * 1024
+    procs = []
+    try:
+        cert, key = make_self_signed(workdir)
+        plain_dir, tls_dir = Path(workdir) / "plain", Path(workdir) / "tls"
+        plain_dir.mkdir()
+        tls_dir.mkdir()
+        plain_port, tls_port = free_port(), free_port()
+        procs.append(start_server(plain_dir, plain_port, size))
+        procs.append(start_server(tls_dir, tls_port, size,
+                                  ["--tls-cert", str(cert), "--tls-key", str(key)]))
+
+        shared = ClientTLS(cafile=str(cert))
+        shared_warm = client(tls_port, shared)      # obtain the first ticket
+        shared_warm.connect()
+        shared_warm.close()
+
+        return {
+            "size_mb": opts.size,
+            "connects": opts.connects,
+            "plain": {
+                "connect": time_connects(plain_port, opts.connects, lambda: None),
+                **time_transfers(plain_port, None, plain_dir, size),
+            },
+            "tls": {
+                "connect": time_connects(tls_port, opts.connects,
+                                         lambda: ClientTLS(cafile=str(cert))),
+                "resume": time_connects(tls_port, opts.connects, lambda: shared),
+                **time_transfers(tls_port, shared, tls_dir, size),
+            },
+        }
+    finally:
+        for p in procs:
+            p.terminate()
+            p.wait(timeout=10)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Compare plain TCP and TLS")
+    ap.add_argument("--connects", type=int, default=30, help="handshakes per mode")
+    ap.add_argument("--size", type=int, default=32, help="transfer size in MB")
+    ap.add_argument("--output", help="write JSON here instead of stdout")
+    opts = ap.parse_args(argv)
+
+    text = json.dumps(run(opts), indent=2)
+    if opts.output:
+        Path(opts.output).write_text(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
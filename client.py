@@ -16,6 +16,19 @@ def recv_line(sock):
             return data.decode().strip()
 
 
+def recv_exact(sock, size):
+    """Receives exactly size bytes, or None if the connection drops."""
+    data = b""
+    remain = size
+    while remain > 0:
+        chunk = sock.recv(8192)
+        if not chunk:
+            return None
+        data += chunk
+        remain -= len(chunk)
+    return data
+
+
 def recv_multiline(sock):
     """Receives lines until server sends END."""
     lines = []
@@ -96,11 +109,7 @@ def interactive(host="127.0.0.1", port=2121):
                 continue
 
             with open(local, "rb") as f:
-                while True:
-                    chunk = f.read(8192)
-                    if not chunk:
-                        break
-                    sock.sendall(chunk)
+                sock.sendfile(f)
 
             print(recv_line(sock))
             continue
@@ -123,15 +132,10 @@ def interactive(host="127.0.0.1", port=2121):
             _, size_s = resp.split()
             size = int(size_s)
 
-            data = b""
-            remain = size
-            while remain > 0:
-                chunk = sock.recv(8192)
-                if not chunk:
-                    print("Connection lost")
-                    return
-                data += chunk
-                remain -= len(chunk)
+            data = recv_exact(sock, size)
+            if data is None:
+                print("Connection lost")
+                return
 
             finish = recv_line(sock)
             print(finish)
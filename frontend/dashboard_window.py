@@ -1,17 +1,27 @@
 # frontend/dashboard_window.py
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QLabel, QPushButton, QFileDialog,
-    QListWidget, QHBoxLayout, QMessageBox, QFrame
+    QListWidget, QListWidgetItem, QHBoxLayout, QMessageBox, QFrame,
+    QTableView, QHeaderView, QAbstractItemView
 )
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
 from PyQt5.QtGui import QFont
 import os
 
 from frontend.log_window import LogWindow   # ✅ Log window
 from backend.logger import Logger            # ✅ Logger
+from frontend.transfer_manager import TransferManager, SharedConnection, Transfer
+from backend.listing_cache import ListingCache
+from backend.watcher import DirectoryWatcher
+from frontend.file_list_model import FileListModel, COL_NAME
+
+TRANSFER_ICONS = {"upload": "⬆", "download": "⬇", "delete": "🗑"}
 
 class DashboardWindow(QWidget):
-    def __init__(self, client_socket, username, permissions, logger):
+    # emitted from the watcher thread; delivered on the Qt main thread
+    remote_change = pyqtSignal(str, int, int, str)
+
+    def __init__(self, client_socket, username, permissions, logger, pool=None):
         super().__init__()
 
         self.client = client_socket
@@ -19,6 +29,20 @@ class DashboardWindow(QWidget):
         self.permissions = permissions
         self.logger = logger   # ✅ store logger instance
 
+        # every server operation runs on a worker thread, each on its own
+        # pooled connection (or taking turns on the session socket)
+        self.listing_cache = ListingCache()
+        if pool is not None:
+            self.transfers = TransferManager(lease=pool.lease, max_workers=pool.max_size,
+                                             listing_cache=self.listing_cache, parent=self)
+        else:
+            self.transfers = TransferManager(lease=SharedConnection(client_socket).lease,
+                                             listing_cache=self.listing_cache, parent=self)
+        self.transfers.changed.connect(self._on_transfer_changed)
+        self.transfers.finished.connect(self._on_transfer_finished)
+        self.transfers.failed.connect(self._on_transfer_failed)
+        self._transfer_items = {}
+
         self.setWindowTitle("LockBox FTP Dashboard")
         self.setGeometry(250, 80, 950, 620)
 
@@ -44,7 +68,7 @@ class DashboardWindow(QWidget):
             QPushButton:hover {
                 background-color: #6aa6ff;
             }
-            QListWidget {
+            QListWidget, QTableView {
                 background-color: white;
                 border: 2px solid #c9d4e7;
                 border-radius: 10px;
@@ -83,10 +107,36 @@ class DashboardWindow(QWidget):
         main.addWidget(card)
 
         # ---------------- FILE LIST ----------------
-        self.file_list = QListWidget()
-        self.file_list.setFixedHeight(300)
+        # model/view: rows are fetched lazily and updated by diffs
+        self.file_model = FileListModel(self)
+        self.file_list = QTableView()
+        self.file_list.setModel(self.file_model)
+        self.file_list.setSortingEnabled(True)
+        self.file_list.sortByColumn(COL_NAME, Qt.AscendingOrder)
+        self.file_list.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.file_list.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.file_list.setShowGrid(False)
+        self.file_list.verticalHeader().setVisible(False)
+        self.file_list.verticalHeader().setDefaultSectionSize(24)
+        self.file_list.horizontalHeader().setSectionResizeMode(COL_NAME, QHeaderView.Stretch)
+        self.file_list.setFixedHeight(240)
         main.addWidget(self.file_list)
 
+        # ---------------- TRANSFERS ----------------
+        self.transfer_list = QListWidget()
+        self.transfer_list.setFixedHeight(110)
+        main.addWidget(self.transfer_list)
+
+        xfer_row = QHBoxLayout()
+        self.btn_cancel = QPushButton("✖ Cancel Transfer")
+        self.btn_cancel.clicked.connect(self.cancel_transfer)
+        xfer_row.addWidget(self.btn_cancel)
+
+        self.btn_retry = QPushButton("↻ Retry Transfer")
+        self.btn_retry.clicked.connect(self.retry_transfer)
+        xfer_row.addWidget(self.btn_retry)
+        main.addLayout(xfer_row)
+
         # ---------------- BUTTON ROW ----------------
         btn_row = QHBoxLayout()
 
@@ -118,6 +168,20 @@ class DashboardWindow(QWidget):
 
         self.log("Logged in successfully.")  # ✅ fixed logger usage
 
+        # server-push change notifications instead of polling LIST: events
+        # are applied to the model directly, RESYNC triggers one LIST
+        self._refresh_timer = QTimer(self)
+        self._refresh_timer.setSingleShot(True)
+        self._refresh_timer.setInterval(200)
+        self._refresh_timer.timeout.connect(self.list_files)
+        self.remote_change.connect(self._on_remote_change)
+
+        self.watcher = None
+        if pool is not None:
+            self.watcher = DirectoryWatcher(pool.open_dedicated, self.remote_change.emit,
+                                            logger=self.logger)
+            self.watcher.start()
+
     # -----------------------------------------------------
     def log(self, text):
         """Send log to shared logger"""
@@ -135,29 +199,35 @@ class DashboardWindow(QWidget):
         self.log("User logged out.")
         self.close()
 
+    def closeEvent(self, event):
+        if self.watcher:
+            self.watcher.stop()
+        super().closeEvent(event)
+
+    def _on_remote_change(self, kind, size, mtime, name):
+        if kind == "RESYNC":
+            # events were dropped; reconcile with a (conditional) LIST
+            self.listing_cache.invalidate()
+            self._refresh_timer.start()
+        else:
+            self.file_model.apply_event(kind, size, mtime, name)
+
     # -----------------------------------------------------
     # LIST FILES
     # -----------------------------------------------------
     def list_files(self):
-        self.file_list.clear()
-        try:
-            self.client.send("LIST")
-            lines = self.client.receive_multiline().split("\n")
-
-            count = 0
-            for line in lines:
-                if line.startswith("FILE") or line.startswith("DIR"):
-                    parts = line.split(" ", 2)
-                    if len(parts) == 3:
-                        _, _, name = parts
-                        self.file_list.addItem(name)
-                        count += 1
-
-            self.log(f"Listed files ({count} items).")
-
-        except Exception as e:
-            self.log(f"Error listing files: {str(e)}")
-            QMessageBox.critical(self, "Error", str(e))
+        self.transfers.submit_list()
+
+    def _show_listing(self, entries, changed=True):
+        if not changed:
+            # server confirmed the cached listing is current
+            return
+        self.file_model.set_entries(entries)
+        self.log(f"Listed files ({len(entries)} items).")
+
+    def _selected_name(self):
+        rows = self.file_list.selectionModel().selectedRows()
+        return self.file_model.name_at(rows[0].row()) if rows else None
 
     # -----------------------------------------------------
     # UPLOAD FILE
@@ -172,29 +242,7 @@ class DashboardWindow(QWidget):
         if not path:
             return
 
-        filename = os.path.basename(path)
-        size = os.path.getsize(path)
-
-        try:
-            self.client.send(f"STOR {filename} {size}")
-            response = self.client.receive()
-
-            if not response.startswith("150"):
-                self.log(f"Upload failed: {response}")
-                QMessageBox.warning(self, "Error", response)
-                return
-
-            with open(path, "rb") as f:
-                self.client.send_bytes(f.read())
-
-            done = self.client.receive()
-            QMessageBox.information(self, "Upload Complete", done)
-            self.log(f"Uploaded file: {filename} ({size} bytes)")
-            self.list_files()
-
-        except Exception as e:
-            self.log(f"Upload Error: {str(e)}")
-            QMessageBox.critical(self, "Upload Error", str(e))
+        self.transfers.submit_upload(path, os.path.basename(path))
 
     # -----------------------------------------------------
     # DOWNLOAD FILE
@@ -205,39 +253,17 @@ class DashboardWindow(QWidget):
             self.log("Download blocked (no permission).")
             return
 
-        item = self.file_list.currentItem()
-        if not item:
+        filename = self._selected_name()
+        if not filename:
             QMessageBox.warning(self, "Select a File", "Select a file to download.")
             return
 
-        filename = item.text()
-
-        try:
-            self.client.send(f"RETR {filename}")
-            response = self.client.receive()
-
-            if not response.startswith("150"):
-                self.log(f"Download failed: {response}")
-                QMessageBox.warning(self, "Error", response)
-                return
-
-            size = int(response.split()[1])
-            save_path, _ = QFileDialog.getSaveFileName(self, "Save File As", filename)
-            if not save_path:
-                return
-
-            data = self.client.receive_bytes(size)
-
-            with open(save_path, "wb") as f:
-                f.write(data)
-
-            done = self.client.receive()
-            QMessageBox.information(self, "Download Complete", done)
-            self.log(f"Downloaded file: {filename} ({size} bytes)")
+        # ask before RETR so a cancelled dialog never leaves payload unread
+        save_path, _ = QFileDialog.getSaveFileName(self, "Save File As", filename)
+        if not save_path:
+            return
 
-        except Exception as e:
-            self.log(f"Download Error: {str(e)}")
-            QMessageBox.critical(self, "Download Error", str(e))
+        self.transfers.submit_download(filename, save_path)
 
     # -----------------------------------------------------
     # DELETE FILE
@@ -248,13 +274,11 @@ class DashboardWindow(QWidget):
             self.log("Delete blocked (no permission).")
             return
 
-        item = self.file_list.currentItem()
-        if not item:
+        filename = self._selected_name()
+        if not filename:
             QMessageBox.warning(self, "Select a File", "Select a file to delete.")
             return
 
-        filename = item.text()
-
         confirm = QMessageBox.question(
             self, "Confirm Delete",
             f"Are you sure you want to delete '{filename}'?",
@@ -264,14 +288,76 @@ class DashboardWindow(QWidget):
         if confirm != QMessageBox.Yes:
             return
 
-        try:
-            self.client.send(f"DELE {filename}")
-            response = self.client.receive()
-            QMessageBox.information(self, "Deleted", response)
+        self.transfers.submit_delete(filename)
 
-            self.log(f"Deleted file: {filename}")
+    # -----------------------------------------------------
+    # TRANSFER QUEUE
+    # -----------------------------------------------------
+    def cancel_transfer(self):
+        tid = self._selected_transfer()
+        if tid is not None:
+            self.transfers.cancel(tid)
+
+    def retry_transfer(self):
+        tid = self._selected_transfer()
+        if tid is not None:
+            self.transfers.retry(tid)
+
+    def _selected_transfer(self):
+        item = self.transfer_list.currentItem()
+        return item.data(Qt.UserRole) if item else None
+
+    def _on_transfer_changed(self, tid):
+        t = self.transfers.transfers[tid]
+        if t.kind == "list":
+            return
+
+        item = self._transfer_items.get(tid)
+        if item is None:
+            item = QListWidgetItem()
+            item.setData(Qt.UserRole, tid)
+            self.transfer_list.insertItem(0, item)
+            self._transfer_items[tid] = item
+
+        icon = TRANSFER_ICONS.get(t.kind, "")
+        if t.state == Transfer.RUNNING and t.total:
+            status = f"{t.percent}%  ({_format_rate(t.rate)})"
+        elif t.state == Transfer.FAILED:
+            status = f"failed: {t.error}"
+        else:
+            status = t.state
+        item.setText(f"{icon} {t.name} — {status}")
+
+    def _on_transfer_finished(self, tid, result):
+        t = self.transfers.transfers[tid]
+        if t.kind == "list":
+            self._show_listing(*result)
+            return
+
+        if t.kind == "upload":
+            self.log(f"Uploaded file: {t.name} ({t.total} bytes)")
+        elif t.kind == "download":
+            self.log(f"Downloaded file: {t.name} ({t.total} bytes)")
+        elif t.kind == "delete":
+            self.log(f"Deleted file: {t.name}")
+
+        if t.kind in ("upload", "delete") and self.watcher is None:
+            # with a watcher the change arrives as an event instead
             self.list_files()
 
-        except Exception as e:
-            self.log(f"Delete Error: {str(e)}")
-            QMessageBox.critical(self, "Delete Error", str(e))
+    def _on_transfer_failed(self, tid, error):
+        t = self.transfers.transfers[tid]
+        if t.state == Transfer.CANCELLED:
+            self.log(f"{t.kind.capitalize()} cancelled: {t.name}")
+            return
+
+        self.log(f"{t.kind.capitalize()} Error: {error}")
+        QMessageBox.critical(self, f"{t.kind.capitalize()} Error", error)
+
+
+def _format_rate(rate):
+    for unit in ("B/s", "KB/s", "MB/s"):
+        if rate < 1024:
+            return f"{rate:.1f} {unit}"
+        rate /= 1024
+    return f"{rate:.1f} GB/s"
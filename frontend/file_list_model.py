@@ -0,0 +1,215 @@
+# frontend/file_list_model.py
+import bisect
+import time
+
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex
+
+FETCH_BATCH = 1000            # rows materialised per fetchMore()
+RESET_RATIO = 0.5             # diff touching more than this fraction -> full reset
+
+COL_NAME, COL_SIZE, COL_MTIME = range(3)
+HEADERS = ("Name", "Size", "Modified")
+
+
+def _format_size(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+class FileListModel(QAbstractTableModel):
+    """
+    Lazily populated model for directory listings of any size.
+
+    Entries are (kind, size, mtime, name) tuples kept in one sorted list;
+    the view only materialises rows through canFetchMore()/fetchMore(), so
+    a 100k-entry directory costs one batch of rows until the user scrolls.
+    New listings and WATCH events are applied as diffs (insert / remove /
+    dataChanged) instead of rebuilding the model, and sorting by any
+    column happens locally without asking the server again.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []               # sorted entries
+        self._keys = []               # sort keys, parallel to _rows
+        self._index = {}              # name -> entry
+        self._loaded = 0              # rows exposed to the view
+        self._sort_col = COL_NAME
+        self._sort_order = Qt.AscendingOrder
+
+    # ----------------------------------------------------
+    # QAbstractItemModel API
+    # ----------------------------------------------------
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._loaded
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= self._loaded:
+            return None
+        kind, size, mtime, name = self._rows[index.row()]
+        col = index.column()
+
+        if role == Qt.DisplayRole:
+            if col == COL_NAME:
+                return f"📁 {name}" if kind == "DIR" else name
+            if col == COL_SIZE:
+                return "" if kind == "DIR" else _format_size(size)
+            if col == COL_MTIME:
+                return time.strftime("%Y-%m-%d %H:%M", time.localtime(mtime)) if mtime else ""
+        elif role == Qt.UserRole:
+            return name
+        elif role == Qt.TextAlignmentRole and col == COL_SIZE:
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._loaded < len(self._rows)
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        count = min(FETCH_BATCH, len(self._rows) - self._loaded)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self._loaded, self._loaded + count - 1)
+        self._loaded += count
+        self.endInsertRows()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self._sort_col = column
+        self._sort_order = order
+        self.layoutAboutToBeChanged.emit()
+        self._resort()
+        self.layoutChanged.emit()
+
+    # ----------------------------------------------------
+    # HELPERS
+    # ----------------------------------------------------
+    def name_at(self, row):
+        return self._rows[row][3] if 0 <= row < self._loaded else None
+
+    def entry_count(self):
+        return len(self._rows)
+
+    def _key(self, entry):
+        kind, size, mtime, name = entry
+        value = (name.lower(), size, mtime)[self._sort_col]
+        # directories stay grouped on top regardless of direction
+        if self._sort_order == Qt.DescendingOrder:
+            return (kind != "DIR", _Reversed(value))
+        return (kind != "DIR", value)
+
+    def _resort(self):
+        self._rows.sort(key=self._key)
+        self._keys = [self._key(e) for e in self._rows]
+
+    # ----------------------------------------------------
+    # UPDATES
+    # ----------------------------------------------------
+    def set_entries(self, entries):
+        """Replace the listing, applying the difference to the view."""
+        new = {e[3]: e for e in entries}
+        removed = [n for n in self._index if n not in new]
+        added = [e for n, e in new.items() if n not in self._index]
+        changed = [e for n, e in new.items() if n in self._index and self._index[n] != e]
+
+        touched = len(removed) + len(added) + len(changed)
+        if not self._rows or touched > RESET_RATIO * max(len(self._rows), 1):
+            self._reset(entries)
+            return
+
+        for name in removed:
+            self._remove(name)
+        for entry in changed:
+            self._remove(entry[3])
+            self._insert(entry)
+        for entry in added:
+            self._insert(entry)
+
+    def apply_event(self, kind, size, mtime, name):
+        """Apply one WATCH event (ADD / MOD / DEL) without a LIST."""
+        if kind == "DEL":
+            self._remove(name)
+        elif kind in ("ADD", "MOD"):
+            old = self._index.get(name)
+            entry = (old[0] if old else "FILE", size, mtime, name)
+            if old == entry:
+                return
+            if old:
+                self._remove(name)
+            self._insert(entry)
+
+    def clear(self):
+        self._reset([])
+
+    def _reset(self, entries):
+        self.beginResetModel()
+        self._rows = list(entries)
+        self._index = {e[3]: e for e in self._rows}
+        self._resort()
+        self._loaded = min(FETCH_BATCH, len(self._rows))
+        self.endResetModel()
+
+    def _find(self, entry):
+        key = self._key(entry)
+        row = bisect.bisect_left(self._keys, key)
+        while row < len(self._rows) and self._keys[row] == key:
+            if self._rows[row][3] == entry[3]:
+                return row
+            row += 1
+        return -1
+
+    def _remove(self, name):
+        entry = self._index.pop(name, None)
+        if entry is None:
+            return
+        row = self._find(entry)
+        if row < 0:
+            return
+        visible = row < self._loaded
+        if visible:
+            self.beginRemoveRows(QModelIndex(), row, row)
+        del self._rows[row]
+        del self._keys[row]
+        if visible:
+            self._loaded -= 1
+            self.endRemoveRows()
+
+    def _insert(self, entry):
+        key = self._key(entry)
+        row = bisect.bisect_right(self._keys, key)
+        self._index[entry[3]] = entry
+        # rows past the loaded window stay hidden until fetchMore()
+        visible = row < self._loaded or self._loaded == len(self._rows)
+        if visible:
+            self.beginInsertRows(QModelIndex(), row, row)
+        self._rows.insert(row, entry)
+        self._keys.insert(row, key)
+        if visible:
+            self._loaded += 1
+            self.endInsertRows()
+
+
+class _Reversed:
+    """Inverts comparison so one sort key works for descending order."""
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __eq__(self, other):
+        return self.value == other.value
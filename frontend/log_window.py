@@ -1,16 +1,25 @@
 # frontend/log_window.py
 from PyQt5.QtWidgets import (
-    QWidget, QVBoxLayout, QTextEdit, QPushButton, QHBoxLayout, QFileDialog, QMessageBox, QLabel
+    QWidget, QVBoxLayout, QPlainTextEdit, QPushButton, QHBoxLayout, QFileDialog, QMessageBox, QLabel,
+    QApplication
 )
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtGui import QFont
 from backend.logger import Logger
+from collections import deque
 import datetime
 
+MAX_BLOCKS = 10000        # lines kept in the document; older ones are trimmed
+FLUSH_INTERVAL_MS = 50    # batch incoming lines at most 20 times a second
+
 class LogWindow(QWidget):
     """
     Live-updating log window. Subscribe to a Logger's new_log signal.
     Open as non-blocking window from Dashboard.
+
+    Incoming lines are queued and flushed on a timer in one batch, the
+    document is capped at MAX_BLOCKS lines, and auto-scroll only happens
+    while the view is already at the bottom.
     """
 
     def __init__(self, logger: Logger = None, parent=None):
@@ -22,12 +31,17 @@ class LogWindow(QWidget):
         # Use provided logger or default singleton
         self.logger = logger or Logger.instance()
 
-        # connect signal
-        self.logger.new_log.connect(self.append_line)
+        self._pending = deque(maxlen=MAX_BLOCKS)
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setInterval(FLUSH_INTERVAL_MS)
+        self._flush_timer.timeout.connect(self._flush)
 
         # populate existing logs
-        for line in self.logger.get_all():
-            self._append_text(line)
+        self._pending.extend(self.logger.get_all())
+        self._flush()
+
+        # connect signal
+        self.logger.new_log.connect(self.append_line)
 
     def _build_ui(self):
         self.layout = QVBoxLayout(self)
@@ -39,8 +53,10 @@ class LogWindow(QWidget):
         header.setAlignment(Qt.AlignLeft)
         self.layout.addWidget(header)
 
-        self.text = QTextEdit()
+        self.text = QPlainTextEdit()
         self.text.setReadOnly(True)
+        self.text.setMaximumBlockCount(MAX_BLOCKS)
+        self.text.setLineWrapMode(QPlainTextEdit.NoWrap)
         self.text.setFont(QFont("Consolas", 11))
         self.layout.addWidget(self.text)
 
@@ -61,16 +77,33 @@ class LogWindow(QWidget):
 
     def append_line(self, line: str):
         """Slot connected to Logger.new_log signal. Called in Qt main thread."""
-        self._append_text(line)
+        self._pending.append(line)
+        if not self._flush_timer.isActive():
+            self._flush_timer.start()
 
-    def _append_text(self, line: str):
-        # append and auto-scroll
-        cursor = self.text.textCursor()
-        cursor.movePosition(cursor.End)
-        self.text.setTextCursor(cursor)
-        self.text.append(line)
-        # auto-scroll: ensure bottom visible
-        self.text.verticalScrollBar().setValue(self.text.verticalScrollBar().maximum())
+    def _flush(self):
+        if not self._pending:
+            self._flush_timer.stop()
+            return
+
+        bar = self.text.verticalScrollBar()
+        at_bottom = bar.value() >= bar.maximum() - 2
+
+        batch = "\n".join(self._pending)
+        self._pending.clear()
+        self.text.appendPlainText(batch)
+
+        # follow new output only if the user hasn't scrolled up to read
+        if at_bottom:
+            bar.setValue(bar.maximum())
+
+    def closeEvent(self, event):
+        self._flush_timer.stop()
+        try:
+            self.logger.new_log.disconnect(self.append_line)
+        except TypeError:
+            pass
+        super().closeEvent(event)
 
     def save_logs(self):
         path, _ = QFileDialog.getSaveFileName(
@@ -91,9 +124,10 @@ class LogWindow(QWidget):
         confirm = QMessageBox.question(self, "Confirm", "Clear all logs?")
         if confirm == QMessageBox.Yes:
             self.logger.clear()
+            self._pending.clear()
             self.text.clear()
 
     def copy_all(self):
-        clipboard = self.text.clipboard()
+        clipboard = QApplication.clipboard()
         clipboard.setText(self.text.toPlainText())
         QMessageBox.information(self, "Copied", "All logs copied to clipboard.")
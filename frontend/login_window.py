@@ -15,7 +15,8 @@ class LoginWindow(QWidget):
         win = LoginWindow(client_socket)
 
     Signals:
-        login_success (dict) -> emitted with {"username": str, "permissions": {"read":bool,"write":bool,"delete":bool}}
+        login_success (dict) -> emitted with {"username": str, "password": str, "permissions": {"read":bool,"write":bool,"delete":bool}}
+                                (the password lets the connection pool open more sessions)
         log_event (str)     -> emitted with human-readable log lines for the LogWindow
     """
     login_success = pyqtSignal(dict)
@@ -286,7 +287,7 @@ class LoginWindow(QWidget):
 
                 QMessageBox.information(self, "Success", "Login successful — welcome!")
                 self._emit_log(f"Login successful for '{user}'.")
-                self.login_success.emit({"username": user, "permissions": perms})
+                self.login_success.emit({"username": user, "password": pwd, "permissions": perms})
                 self.close()
                 return
 
@@ -0,0 +1,188 @@
+# frontend/transfer_manager.py
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from backend.client_socket import TransferCancelled
+
+PROGRESS_INTERVAL = 0.1   # seconds between progress signals per transfer
+
+
+class SharedConnection:
+    """
+    Lease provider for a single ClientSocket: operations take turns on it.
+    Cancelling an in-flight transfer closes this connection.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def lease(self):
+        with self._lock:
+            if not self.client.sock:
+                raise ConnectionError("Not connected to server.")
+            yield self.client
+
+
+class Transfer:
+    """State of one queued / running / finished operation."""
+
+    QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+
+    def __init__(self, tid, kind, name, args):
+        self.id = tid
+        self.kind = kind          # "list", "upload", "download", "delete"
+        self.name = name
+        self.args = args
+        self.state = Transfer.QUEUED
+        self.done = 0
+        self.total = 0
+        self.rate = 0.0           # bytes / second
+        self.result = None
+        self.error = ""
+        self.cancel_event = threading.Event()
+        self._started = 0.0
+        self._last_emit = 0.0
+
+    @property
+    def percent(self):
+        return self.done * 100 // self.total if self.total else 0
+
+
+class _TransferJob(QRunnable):
+    def __init__(self, manager, transfer):
+        super().__init__()
+        self.manager = manager
+        self.transfer = transfer
+
+    def run(self):
+        self.manager._run(self.transfer)
+
+
+class TransferManager(QObject):
+    """
+    Runs list / upload / download / delete operations on a thread pool so
+    the dashboard never blocks.  Every operation borrows a connection via
+    `lease()` (a context manager yielding a logged-in ClientSocket), so
+    the degree of concurrency is whatever the lease provider allows.
+
+    Signals (always delivered on the Qt main thread):
+        changed (int)          -> transfer id whose state / progress changed
+        finished (int, object) -> transfer id, operation result
+        failed (int, str)      -> transfer id, error text
+    """
+    changed = pyqtSignal(int)
+    finished = pyqtSignal(int, object)
+    failed = pyqtSignal(int, str)
+
+    def __init__(self, lease, max_workers=3, listing_cache=None, parent=None):
+        super().__init__(parent)
+        self.lease = lease
+        self.listing_cache = listing_cache
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(max_workers)
+        self.transfers = {}
+        self._ids = itertools.count(1)
+
+    # ----------------------------------------------------
+    # SUBMIT
+    # ----------------------------------------------------
+    def submit_list(self):
+        return self._submit("list", "LIST", ())
+
+    def submit_upload(self, local_path, remote_name):
+        return self._submit("upload", remote_name, (local_path, remote_name))
+
+    def submit_download(self, remote_name, save_path):
+        return self._submit("download", remote_name, (remote_name, save_path))
+
+    def submit_delete(self, remote_name):
+        return self._submit("delete", remote_name, (remote_name,))
+
+    def _submit(self, kind, name, args, tid=None):
+        t = Transfer(tid or next(self._ids), kind, name, args)
+        self.transfers[t.id] = t
+        self.changed.emit(t.id)
+        self.pool.start(_TransferJob(self, t))
+        return t.id
+
+    # ----------------------------------------------------
+    # CONTROL
+    # ----------------------------------------------------
+    def cancel(self, tid):
+        t = self.transfers.get(tid)
+        if t and t.state in (Transfer.QUEUED, Transfer.RUNNING):
+            t.cancel_event.set()
+
+    def retry(self, tid):
+        t = self.transfers.get(tid)
+        if not t or t.state not in (Transfer.FAILED, Transfer.CANCELLED):
+            return None
+        return self._submit(t.kind, t.name, t.args, tid=tid)
+
+    def active_count(self):
+        return sum(t.state in (Transfer.QUEUED, Transfer.RUNNING) for t in self.transfers.values())
+
+    # ----------------------------------------------------
+    # WORKER THREAD
+    # ----------------------------------------------------
+    def _run(self, t):
+        if t.cancel_event.is_set():
+            self._set_state(t, Transfer.CANCELLED)
+            return
+
+        try:
+            with self.lease() as client:
+                if t.cancel_event.is_set():
+                    raise TransferCancelled("Cancelled before start.")
+                t._started = time.monotonic()
+                self._set_state(t, Transfer.RUNNING)
+                t.result = self._execute(client, t)
+        except TransferCancelled:
+            self._set_state(t, Transfer.CANCELLED)
+            self.failed.emit(t.id, "Cancelled")
+            return
+        except Exception as e:
+            t.error = str(e)
+            self._set_state(t, Transfer.FAILED)
+            self.failed.emit(t.id, t.error)
+            return
+
+        self._set_state(t, Transfer.DONE)
+        self.finished.emit(t.id, t.result)
+
+    def _execute(self, client, t):
+        progress = lambda done, total: self._progress(t, done, total)
+
+        if t.kind == "list":
+            # result: (entries, changed)
+            if self.listing_cache is not None:
+                return self.listing_cache.fetch(client)
+            return client.list_dir(), True
+        if t.kind == "upload":
+            local_path, remote_name = t.args
+            return client.upload(local_path, remote_name, progress=progress, cancel=t.cancel_event)
+        if t.kind == "download":
+            remote_name, save_path = t.args
+            return client.download(remote_name, save_path, progress=progress, cancel=t.cancel_event)
+        if t.kind == "delete":
+            return client.delete(*t.args)
+        raise ValueError(f"Unknown transfer kind: {t.kind}")
+
+    def _progress(self, t, done, total):
+        t.done, t.total = done, total
+        now = time.monotonic()
+        elapsed = now - t._started
+        t.rate = done / elapsed if elapsed > 0 else 0.0
+        if now - t._last_emit >= PROGRESS_INTERVAL or done >= total:
+            t._last_emit = now
+            self.changed.emit(t.id)
+
+    def _set_state(self, t, state):
+        t.state = state
+        self.changed.emit(t.id)
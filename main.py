@@ -1,3 +1,4 @@
+import os
 import sys
 from PyQt5.QtWidgets import QApplication
 
@@ -8,18 +9,27 @@ from frontend.dashboard_window import DashboardWindow
 
 # Backend
 from backend.client_socket import ClientSocket
+from backend.connection_pool import ConnectionPool
 from backend.logger import Logger  # ✅ import logger
+from backend.tls import ClientTLS
+
+POOL_SIZE = 4   # concurrent control connections per session
 
 
 class MainApp:
     def __init__(self):
         self.app = QApplication(sys.argv)
 
-        # Shared client socket for entire session
-        self.client = ClientSocket()
-
         # Shared logger for entire session
         self.logger = Logger.instance()  # ✅ singleton logger
+        # per-component levels, e.g. LOCKBOX_LOG="INFO,client=DEBUG"
+        self.logger.configure(os.environ.get("LOCKBOX_LOG", ""))
+
+        # Shared client socket for entire session; LOCKBOX_TLS=1 (system CAs)
+        # or LOCKBOX_TLS=<ca.pem> connects over TLS, LOCKBOX_PASSIVE=1 moves
+        # transfers to PASV data connections (cancel without reconnecting)
+        self.client = ClientSocket(logger=self.logger, tls=ClientTLS.from_env(),
+                                   passive=os.environ.get("LOCKBOX_PASSIVE", "") == "1")
 
         # STEP 1 — Open configuration window
         self.config_window = ConfigWindow()
@@ -67,12 +77,22 @@ class MainApp:
 
         self.login_window.close()
 
+        # Pool of authenticated connections; starts with the login session
+        self.pool = ConnectionPool(
+            self.client.host, self.client.port,
+            username, login_data["password"],
+            max_size=POOL_SIZE,
+            logger=self.logger,
+            seed=self.client,
+        )
+
         # Dashboard expects client_socket, username, permissions, logger
         self.dashboard = DashboardWindow(
             client_socket=self.client,
             username=username,
             permissions=permissions,
-            logger=self.logger  # ✅ pass logger here
+            logger=self.logger,  # ✅ pass logger here
+            pool=self.pool,
         )
 
         self.dashboard.show()
@@ -81,7 +101,10 @@ class MainApp:
     # RUN APP
     # -----------------------------------------------------------------------
     def run(self):
-        sys.exit(self.app.exec_())
+        code = self.app.exec_()
+        if getattr(self, "pool", None):
+            self.pool.close()
+        sys.exit(code)
 
 
 if __name__ == "__main__":
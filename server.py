@@ -6,34 +6,89 @@ Supports multiple clients, read/write/delete permissions, and safe path handling
 Commands:
     USER <name>
     PASS <password>
-    LIST
+    LIST [-l] [IF-NONE-MATCH <tag>]  (-l adds an mtime column)
     PWD
     CWD <dir>
     RETR <filename>
     STOR <filename> <size>
     DELE <filename>
+    RNFR <path>      (then RNTO <path>: atomic rename/move of a file or directory)
+    PASV             (next RETR/STOR uses a separate data connection)
+    ABOR             (cancel the running PASV transfer)
+    STAT             (progress of the running PASV transfer)
+    SITE STATS       (gauges: sessions, timeouts by reason, file cache hit rate)
+    SITE FIND <pat>  (indexed search of the home: glob, or substring)
+    SITE COPY <src> <dst>  (server-side copy: reflink / copy_file_range)
+    NOOP
+    WATCH [dir]      (push EVENT lines until UNWATCH)
     QUIT
+
+Run with --workers N to fork N processes sharing the port (SO_REUSEPORT);
+a supervisor restarts workers that die.  --tls-cert/--tls-key wrap every
+connection in TLS (with session resumption across reconnects).
+--storage memory|pack[:DIR] keeps the files somewhere other than the home
+directories (server/storage.py).
 """
 
+import errno
 import os
 import socket
-import threading
 import sqlite3
 import hashlib
 import hmac
 import binascii
+import time
+import queue
+import signal
+import ssl
+import stat
+import sys
+import threading
 from socketserver import ThreadingMixIn, TCPServer, StreamRequestHandler
 from pathlib import Path
 
+from server.access_log import AccessLog
+from server.file_locks import FileLocks
+from server.file_cache import FileCache
+from server.durability import Durability, POLICIES, GROUP
+from server.tls import make_server_context, HANDSHAKE_TIMEOUT
+from server.notify import ChangeHub, ADD, MOD, DEL
+from server.data_channel import PassiveListener, DataTransfer, DataConnectionError
+from server.sessions import Session, SessionRegistry, STALL
+from server.storage import make_storage, BACKENDS, LOCAL, MEMORY
+from server.file_index import FileIndexes
+from utils.send_file import send_file, TransferAborted
+from utils.receive_file import receive_file, IncompleteTransfer
+
 # ==========================================================
 # DATABASE + PASSWORD HELPERS
 # ==========================================================
 
 DB_FILE = "ftp_users.db"
+ACCESS_LOG_FILE = "logs/ftp_access.log"
+
+# per-path flock files shared by all worker processes
+LOCK_DIR = "locks"
+
+# directory change fan-out for WATCH subscribers
+CHANGE_HUB = ChangeHub()
+WATCH_POLL_INTERVAL = 0.25
+
+# session timeouts in seconds (0 disables); see server/sessions.py
+DEFAULT_TIMEOUTS = {"idle": 600.0, "login": 30.0, "stall": 60.0}
 
-# file-lock table to prevent race conditions
-FILE_LOCKS = {}
-FILE_LOCKS_LOCK = threading.Lock()
+# hot-file RETR cache (server/file_cache.py)
+CACHE_SIZE = 64 * 1024 * 1024
+CACHE_MAX_FILE = 1024 * 1024
+
+# upload durability (server/durability.py): policy and group-commit window
+DURABILITY = GROUP
+DURABILITY_WINDOW = 0.002
+
+# SITE FIND filename indexes (server/file_index.py), one SQLite file per home,
+# and the seconds between mtime-driven reconcile passes (0 disables FIND)
+INDEX_DIR = "index"
+INDEX_RESCAN = 300.0
 
 
 def init_user_db(db_path=DB_FILE):
@@ -88,41 +143,56 @@ def get_user_record(username):
     return row
 
 
-def get_lock_for_path(path: str):
-    with FILE_LOCKS_LOCK:
-        if path not in FILE_LOCKS:
-            FILE_LOCKS[path] = threading.Lock()
-        return FILE_LOCKS[path]
-
-
-def secure_join(base: Path, *parts):
-    """Prevent directory traversal: ensure the result stays inside base."""
-    p = base.joinpath(*parts).resolve()
-    base_res = str(base.resolve())
-    p_str = str(p)
-    if not p_str.startswith(base_res):
-        raise ValueError("Forbidden path")
-    return p
-
 # ==========================================================
 # HANDLER FOR EACH CLIENT
 # ==========================================================
 
 
 class FTPHandler(StreamRequestHandler):
+    # replies are small writes that often follow another write (TLS tickets
+    # after the handshake, '150' before data); don't let Nagle hold them
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        # TLS handshake runs here, in the connection's thread, rather than
+        # in the accept loop where a slow client would stall everyone
+        self.tls_failed = False
+        if isinstance(self.request, ssl.SSLSocket):
+            try:
+                self.request.settimeout(HANDSHAKE_TIMEOUT)
+                self.request.do_handshake()
+                self.request.settimeout(None)
+            except (ssl.SSLError, OSError):
+                self.tls_failed = True
+        super().setup()
 
     def handle(self):
+        if self.tls_failed:
+            return
+
         self.user = None
         self.auth = False
         self.home = None
-        self.cwd = None
+        self.paths = None                     # storage session once logged in
+        self.peer = "%s:%s" % self.client_address[:2]
+        self.closing = False
+        self.reply_lock = threading.RLock()   # control replies also come from transfer threads
+        self.pasv = None                      # PassiveListener armed by PASV
+        self.transfer = None                  # DataTransfer running in the background
+        self.rename_from = None               # RNFR argument, valid for the next command
+        registry = self.server.sessions
+        self.session = registry.register(self) if registry else Session(self)
 
         self.send("220 PyFTP server ready.")
 
         while True:
-            line = self.rfile.readline()
+            try:
+                line = self.rfile.readline()
+            except OSError:
+                break   # peer reset the connection
             if not line:
                 break
+            self.session.touch()
 
             try:
                 cmdline = line.decode().strip()
@@ -137,25 +207,116 @@ class FTPHandler(StreamRequestHandler):
             cmd = parts[0].upper()
             args = parts[1:]
 
+            self.last_code = None
+            self.xfer_bytes = 0
+            self.deferred_log = False
+            started = time.perf_counter()
+
+            self.session.busy = True
             try:
                 if cmd == "USER": self.cmd_USER(args)
                 elif cmd == "PASS": self.cmd_PASS(args)
                 elif cmd == "PWD":  self.cmd_PWD()
                 elif cmd == "CWD":  self.cmd_CWD(args)
-                elif cmd == "LIST": self.cmd_LIST()
+                elif cmd == "LIST": self.cmd_LIST(args)
                 elif cmd == "RETR": self.cmd_RETR(args)
                 elif cmd == "STOR": self.cmd_STOR(args)
                 elif cmd == "DELE": self.cmd_DELE(args)
+                elif cmd == "RNFR": self.cmd_RNFR(args)
+                elif cmd == "RNTO": self.cmd_RNTO(args)
+                elif cmd == "PASV": self.cmd_PASV()
+                elif cmd == "ABOR": self.cmd_ABOR()
+                elif cmd == "STAT": self.cmd_STAT()
+                elif cmd == "SITE": self.cmd_SITE(args)
+                elif cmd == "NOOP": self.send("200 NOOP ok.")
+                elif cmd == "WATCH": self.cmd_WATCH(args)
                 elif cmd == "QUIT":
                     self.send("221 Goodbye.")
+                    self.log_access(cmd, args, started)
                     break
                 else:
                     self.send("502 Command not implemented.")
             except Exception as e:
+                if self.session.closed_by:
+                    break   # the reaper closed the socket under the command
                 self.send(f"550 {str(e)}")
+            finally:
+                self.session.busy = False
+                self.session.touch()
+                if cmd != "RNFR":
+                    self.rename_from = None
+
+            if not self.deferred_log:
+                self.log_access(cmd, args, started)
+            if self.closing:
+                break
+
+    def finish(self):
+        session = getattr(self, "session", None)
+        if session is not None and self.server.sessions:
+            self.server.sessions.unregister(session)
+
+        # a session that goes away takes its data connection with it
+        xfer = getattr(self, "transfer", None)
+        if xfer is not None:
+            xfer.abort()
+            xfer.finished.wait(5)
+        if getattr(self, "pasv", None) is not None:
+            self.pasv.close()
+        if getattr(self, "paths", None) is not None:
+            self.paths.close()
+        super().finish()
 
     def send(self, msg):
-        self.wfile.write((msg + "\r\n").encode())
+        with self.reply_lock:
+            if msg[:3].isdigit():
+                self.last_code = int(msg[:3])
+            with self.session.replying():
+                self.wfile.write((msg + "\r\n").encode())
+
+    def _count_bytes(self, done, total):
+        self.xfer_bytes = done
+        self.session.progress()
+
+    def kick(self, reason):
+        """Called by the session reaper: end this session (`reason` timed out)."""
+        xfer = self.transfer
+        if xfer is not None:
+            xfer.abort()
+        if reason != STALL:
+            self._notify_nowait(f"421 {reason.capitalize()} timeout, closing connection.")
+        try:
+            self.request.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def _notify_nowait(self, msg):
+        # best effort only: the reaper must never block on a peer that
+        # stopped reading (TLS sockets can't do a non-blocking send here)
+        if isinstance(self.request, ssl.SSLSocket) or not self.reply_lock.acquire(blocking=False):
+            return
+        try:
+            self.request.send((msg + "\r\n").encode(), socket.MSG_DONTWAIT)
+        except OSError:
+            pass
+        finally:
+            self.reply_lock.release()
+
+    def log_access(self, cmd, args, started, code=None, nbytes=None):
+        access_log = getattr(self.server, "access_log", None)
+        if access_log is None:
+            return
+        # never log the password argument
+        path = args[0] if args and cmd in ("CWD", "RETR", "STOR", "DELE") else None
+        access_log.record(
+            user=self.user,
+            peer=self.peer,
+            command=cmd,
+            path=path,
+            nbytes=self.xfer_bytes if nbytes is None else nbytes,
+            duration=time.perf_counter() - started,
+            code=self.last_code if code is None else code,
+        )
 
     def require_auth(self):
         if not self.auth:
@@ -201,8 +362,11 @@ class FTPHandler(StreamRequestHandler):
             "delete": bool(can_delete)
         }
         self.home = Path(home_dir).resolve()
-        self.cwd = self.home
-        Path(self.home).mkdir(parents=True, exist_ok=True)
+        if self.paths is not None:
+            self.paths.close()
+        self.paths = self.server.storage.session(self.home)
+        if self.server.file_index is not None:
+            self.server.file_index.get(self.home)     # first index pass starts now
 
         # Updated part: send permissions for GUI
         self.send("230 Logged in.")
@@ -210,11 +374,7 @@ class FTPHandler(StreamRequestHandler):
 
     def cmd_PWD(self):
         self.require_auth()
-        if self.cwd == self.home:
-            rel = "/"
-        else:
-            rel = "/" + str(self.cwd.relative_to(self.home)).replace("\\", "/")
-        self.send(f'257 "{rel}"')
+        self.send(f'257 "{self.paths.pwd()}"')
 
     def cmd_CWD(self, args):
         self.require_auth()
@@ -222,48 +382,74 @@ class FTPHandler(StreamRequestHandler):
             self.send("501 Syntax: CWD <dir>")
             return
 
-        target = args[0]
-        if target == "/" or target == "\\":
-            self.cwd = self.home
-            self.send("250 Directory changed.")
-            return
-
         try:
-            newpath = secure_join(self.home, target)
-        except:
+            self.paths.chdir(args[0])
+        except ValueError:
             self.send("550 Invalid path.")
             return
-
-        if not newpath.exists() or not newpath.is_dir():
+        except OSError:
             self.send("550 Directory not found.")
             return
 
-        self.cwd = newpath
         self.send("250 Directory changed.")
 
-    def cmd_LIST(self):
+    def cmd_LIST(self, args=()):
         self.require_auth()
         if not self.permissions.get("read", False):
             self.send("550 Permission denied.")
             return
 
+        # "-l" opts in to the mtime column; plain LIST keeps the original
+        # "<FILE|DIR> <size> <name>" lines older clients split on
+        long_format = bool(args) and args[0] == "-l"
+        if long_format:
+            args = args[1:]
+        if args and (len(args) != 2 or args[0].upper() != "IF-NONE-MATCH"):
+            self.send("501 Syntax: LIST [-l] [IF-NONE-MATCH <tag>]")
+            return
+
+        # computed before reading entries: a change racing the listing
+        # leaves a stale tag, which only costs the client one extra LIST
+        try:
+            tag = self.paths.dir_tag()
+        except OSError:
+            self.send("550 Failed to list directory.")
+            return
+
+        if args and args[1] == tag:
+            self.send(f"250 Not modified. TAG {tag}")
+            return
+
+        # hold the reply lock so a transfer's 226 can't land inside the listing
+        with self.reply_lock:
+            self._send_listing(tag, long_format)
+
+    def _send_listing(self, tag, long_format=False):
         self.send("150 Listing directory:")
 
         try:
-            items = sorted(self.cwd.iterdir(), key=lambda p: p.name)
+            items = self.paths.listdir()
         except Exception:
             self.send("550 Failed to list directory.")
             return
 
-        if not items:
-            self.send("(empty)")
-        else:
-            for item in items:
-                size = item.stat().st_size if item.is_file() else 0
-                t = "DIR" if item.is_dir() else "FILE"
-                self.send(f"{t} {size} {item.name}")
+        # one line per entry: "<FILE|DIR> <size> [<mtime>] <name>", written
+        # in a single batch instead of one socket write per line
+        out = []
+        for name, is_dir, st in items:
+            size = 0 if is_dir else st.st_size
+            t = "DIR" if is_dir else "FILE"
+            if long_format:
+                out.append(f"{t} {size} {int(st.st_mtime)} {name}\r\n")
+            else:
+                out.append(f"{t} {size} {name}\r\n")
+
+        if not out:
+            out.append("(empty)\r\n")
+        with self.session.replying():
+            self.wfile.write("".join(out).encode())
 
-        self.send("226 Done.")
+        self.send(f"226 Done. TAG {tag}")
 
     def cmd_RETR(self, args):
         self.require_auth()
@@ -275,26 +461,45 @@ class FTPHandler(StreamRequestHandler):
             self.send("501 Syntax: RETR <file>")
             return
 
-        try:
-            path = secure_join(self.cwd, args[0])
-        except:
-            self.send("550 Invalid path.")
+        target = self._resolve(args[0])
+        if target is None:
             return
 
-        if not path.exists() or not path.is_file():
+        if not target.is_file():
+            target.close()
             self.send("550 File not found.")
             return
 
-        lock = get_lock_for_path(str(path))
-        with lock:
-            size = path.stat().st_size
-            self.send(f"150 {size}")
-            with open(path, "rb") as f:
-                while True:
-                    chunk = f.read(8192)
-                    if not chunk:
-                        break
-                    self.wfile.write(chunk)
+        if self.pasv is not None:
+            self._start_transfer("RETR", args, target, self._retr_data)
+            return
+        if self._transfer_running(target):
+            return
+
+        with target, self.server.file_locks.lock(target.path, shared=True), \
+                self.session.transfer():
+            try:
+                f, st = target.open_read()
+            except OSError:
+                self.send("550 File not found.")
+                return
+            with f:
+                size = st.st_size
+                data = self._cached(target.path, st, f)
+                self.send(f"150 {size}")
+                if data is not None:
+                    self.request.sendall(data)
+                    self._count_bytes(size, size)
+                    sent = size
+                else:
+                    sent = send_file(self.request, f, count=size, progress=self._count_bytes)
+
+            if sent < size:
+                # the file shrank under us: the client still waits for the
+                # bytes "150 <size>" promised, so only a hangup ends the RETR
+                self.last_code = 426
+                self.closing = True
+                return
 
             self.send("")
             self.send("226 Transfer complete.")
@@ -313,39 +518,347 @@ class FTPHandler(StreamRequestHandler):
         try:
             size = int(size_s)
         except:
+            size = -1
+        if size < 0:
             self.send("501 Invalid size.")
             return
 
+        target = self._resolve(fname, create_dirs=True)
+        if target is None:
+            return
+
+        if self.pasv is not None:
+            self._start_transfer("STOR", args, target,
+                                 lambda xfer, target: self._stor_data(xfer, target, size))
+            return
+        if self._transfer_running(target):
+            return
+
+        path = target.path
+        with target, self.server.file_locks.lock(path), self.session.transfer():
+            try:
+                existed, f = target.open_write()
+            except OSError:
+                self.send("550 Invalid path.")
+                return
+            # read through rfile so bytes it already buffered are not lost;
+            # a failed upload is discarded, never closed - closing is what
+            # stores it with the non-local backends
+            error = None
+            try:
+                self.send("150 Ready to receive.")
+                receive_file(self.request, f, size, progress=self._count_bytes,
+                             reader=self.rfile.readinto1)
+                complete = True
+            except IncompleteTransfer:
+                complete = False
+            except OSError as e:
+                # ENOSPC from preallocation, EIO, a reset connection...
+                complete, error = False, e
+            except BaseException:
+                target.discard(f)
+                raise
+
+            if complete:
+                # synced through the upload's own fd, before it is closed
+                if not self._commit(target, f, dirs=() if existed else (target,)):
+                    target.discard(f)
+                    self.send("451 Upload could not be made durable.")
+                    return
+                try:
+                    f.close()
+                except OSError:
+                    target.discard(f)
+                    self.send("451 Upload could not be stored.")
+                    return
+            else:
+                target.discard(f)
+                if error is None:
+                    self.send("426 Transfer aborted.")
+                    return
+                # the rest of the payload is still on its way and would be
+                # read as commands: reply if we can, then drop the session
+                self.closing = True
+                code = 452 if error.errno == errno.ENOSPC else 451
+                try:
+                    self.send(f"{code} Upload failed: {error.strerror or error}.")
+                except OSError:
+                    self.last_code = code
+                return
+
+            self._stored(target, existed, size)
+            self.send("226 Transfer complete.")
+
+    def _resolve(self, arg, **kwargs):
+        """The session Target for `arg`, or None after replying 550."""
         try:
-            path = secure_join(self.cwd, fname)
-        except:
+            return self.paths.resolve(arg, **kwargs)
+        except ValueError:
             self.send("550 Invalid path.")
+        except OSError:
+            self.send("550 File not found.")
+        return None
+
+    def _stored(self, target, existed, size):
+        """Announce a finished upload/copy: dir tag, cache, WATCH, SITE FIND."""
+        path = target.path
+        st = target.lstat()
+        mtime = int(st.st_mtime) if st is not None else int(time.time())
+        self.server.storage.touch_dir(path.parent)
+        self._uncache(path)
+        CHANGE_HUB.publish(path.parent, MOD if existed else ADD, path.name, size, mtime)
+        self._reindex(target, size, mtime)
+
+    # ======================================================
+    # DATA CONNECTION (PASV) TRANSFERS
+    # ======================================================
+
+    def cmd_PASV(self):
+        self.require_auth()
+        if self.transfer is not None:
+            self.send("425 Transfer already in progress.")
             return
+        if self.pasv is not None:
+            self.pasv.close()
+        try:
+            self.pasv = PassiveListener(self.request.getsockname()[0], self.client_address[0],
+                                        self.server.tls_context)
+        except OSError as e:
+            self.pasv = None
+            self.send(f"425 Can't open data port: {e}")
+            return
+        self.send(self.pasv.reply())
 
-        path.parent.mkdir(parents=True, exist_ok=True)
-        lock = get_lock_for_path(str(path))
+    def cmd_ABOR(self):
+        with self.reply_lock:
+            xfer = self.transfer
+            if xfer is None:
+                self.send("225 No transfer in progress.")
+                return
+        xfer.abort()
+        # the transfer thread answers the aborted command (426) first
+        xfer.finished.wait()
+        self.send("226 Abort successful.")
 
-        with lock:
-            self.send("150 Ready to receive.")
-            remain = size
+    def cmd_STAT(self):
+        self.require_auth()
+        xfer = self.transfer
+        if xfer is None:
+            self.send("211 No transfer in progress.")
+        else:
+            self.send(f"211 {xfer.kind} {xfer.name} {xfer.done}/{xfer.total} bytes.")
 
-            with open(path, "wb") as f:
-                while remain > 0:
-                    chunk = self.request.recv(min(8192, remain))
-                    if not chunk:
-                        break
-                    f.write(chunk)
-                    remain -= len(chunk)
+    def cmd_SITE(self, args):
+        self.require_auth()
+        if not args:
+            self.send("501 Syntax: SITE <subcommand>")
+            return
+        sub = args[0].upper()
+        if sub == "STATS":
+            stats = self.server.sessions.stats() if self.server.sessions else {}
+            if self.server.file_cache:
+                stats.update(self.server.file_cache.stats())
+            if self.server.durability:
+                stats.update(self.server.durability.stats())
+            stats.update(self.server.storage.stats())
+            if self.server.file_index:
+                stats.update(self.server.file_index.stats())
+            self.send("211 " + " ".join(f"{k}={v}" for k, v in stats.items()))
+        elif sub == "FIND":
+            self._site_find(" ".join(args[1:]))
+        elif sub == "COPY":
+            self._site_copy(args[1:])
+        else:
+            self.send("504 Unknown SITE subcommand.")
 
-            if remain != 0:
-                try:
-                    path.unlink(missing_ok=True)
-                except Exception:
-                    pass
-                self.send("426 Transfer aborted.")
-                return
+    def _site_find(self, pattern):
+        """
+        SITE FIND <pattern>: matches anywhere in the home, one line per entry
+        in LIST's format but with the path from the home ('/docs/a.pdf').
+        """
+        if not self.permissions.get("read", False):
+            self.send("550 Permission denied.")
+            return
+        if not pattern:
+            self.send("501 Syntax: SITE FIND <glob|substring>")
+            return
+        if self.server.file_index is None:
+            self.send("502 SITE FIND is disabled.")
+            return
 
-            self.send("226 Transfer complete.")
+        try:
+            rows = self.server.file_index.get(self.home).search(pattern)
+        except sqlite3.Error as e:
+            self.send(f"451 Search failed: {e}")
+            return
+
+        out = [f"{'DIR' if is_dir else 'FILE'} {size} {mtime} /{path}\r\n"
+               for is_dir, size, mtime, path in rows]
+        with self.reply_lock:
+            self.send("150 Search results:")
+            if out:
+                with self.session.replying():
+                    self.wfile.write("".join(out).encode())
+            self.send(f"226 {len(out)} matches.")
+
+    def _transfer_running(self, target):
+        """
+        True (after closing `target` and replying 425) while a PASV
+        transfer is still running: its 226/426 would otherwise land in the
+        middle of another transfer's payload on the control connection.
+        """
+        if self.transfer is None:
+            return False
+        target.close()
+        self.send("425 Transfer already in progress.")
+        return True
+
+    def _transfer_locks(self, exclusive=(), shared=()):
+        """
+        True (after replying 450) when the running PASV transfer holds a
+        file lock this command needs: waiting for it on the control thread
+        would leave ABOR unread until the transfer ends by itself.
+        """
+        xfer = self.transfer
+        if xfer is None:
+            return False
+        locks = self.server.file_locks
+        wanted = list(exclusive) + (list(shared) if xfer.kind == "STOR" else [])
+        if not any(locks.shares_lock(xfer.path, p) for p in wanted):
+            return False
+        self.send("450 File busy.")
+        return True
+
+    def _start_transfer(self, cmd, args, target, work):
+        """
+        Run `work(xfer, target)` on the armed data connection in a thread,
+        which also closes `target`.
+        """
+        if self._transfer_running(target):
+            return
+
+        listener, self.pasv = self.pasv, None
+        xfer = DataTransfer(cmd, target.name, listener, on_progress=self.session.progress,
+                            path=target.path)
+        self.transfer = xfer
+        self.deferred_log = True      # logged by the thread once the transfer ends
+        started = time.perf_counter()
+
+        def run():
+            try:
+                with self.session.transfer():
+                    final = work(xfer, target)
+            except DataConnectionError:
+                final = "425 Can't open data connection."
+            except (TransferAborted, IncompleteTransfer, OSError):
+                final = "426 Transfer aborted."
+            except Exception as e:
+                final = f"550 {e}"
+            finally:
+                xfer.close()
+                target.close()
+
+            # clear and reply atomically: a concurrent ABOR either sees the
+            # transfer (and waits for this reply) or sees it already answered
+            with self.reply_lock:
+                self.transfer = None
+                self.send(final)
+            self.log_access(cmd, args, started, code=int(final[:3]), nbytes=xfer.done)
+            xfer.finished.set()
+
+        xfer.thread = threading.Thread(target=run, name=f"xfer-{self.peer}", daemon=True)
+        xfer.thread.start()
+
+    def _retr_data(self, xfer, target):
+        # the shared lock is held for the whole transfer, so a STOR can't
+        # truncate the file under the reader
+        with self.server.file_locks.lock(target.path, shared=True):
+            f, st = target.open_read()
+            with f:
+                size = xfer.total = st.st_size
+                data = self._cached(target.path, st, f)
+                self.send(f"150 {size}")
+                xfer.attach(xfer.listener.accept())
+                if data is not None:
+                    xfer.conn.sendall(data)
+                    xfer.progress(size, size)
+                    sent = size
+                else:
+                    sent = send_file(xfer.conn, f, count=size, progress=xfer.progress,
+                                     cancel=xfer.cancel)
+        xfer.close()    # EOF on the data connection before the control reply
+        return "226 Transfer complete." if sent == size else "426 Transfer aborted."
+
+    def _stor_data(self, xfer, target, size):
+        path = target.path
+        with self.server.file_locks.lock(path):
+            try:
+                existed, f = target.open_write()
+            except OSError:
+                return "550 Invalid path."
+            xfer.total = size
+            # closing stores the upload (non-local backends), so a failed
+            # one is discarded instead
+            try:
+                self.send("150 Ready to receive.")
+                xfer.attach(xfer.listener.accept())
+                receive_file(xfer.conn, f, size, progress=xfer.progress,
+                             cancel=xfer.cancel)
+            except BaseException:
+                target.discard(f)
+                raise
+            if not self._commit(target, f, dirs=() if existed else (target,)):
+                target.discard(f)
+                return "451 Upload could not be made durable."
+            try:
+                f.close()
+            except OSError:
+                target.discard(f)
+                return "451 Upload could not be stored."
+
+            self._stored(target, existed, size)
+        return "226 Transfer complete."
+
+    def _commit(self, target=None, f=None, dirs=()):
+        """Wait until the change is durable per the server's policy."""
+        try:
+            self.server.storage.commit(target, f, dirs)
+            return True
+        except OSError:
+            return False
+
+    def _cached(self, path, st, f):
+        """Small hot files come from memory; None means stream `f` from disk."""
+        cache = self.server.file_cache
+        if cache is None:
+            return None
+        return cache.get(path, st, f, snapshot=self.server.storage.snapshots)
+
+    def _uncache(self, path):
+        if self.server.file_cache is not None:
+            self.server.file_cache.invalidate(path)
+
+    def _reindex(self, target, size=None, mtime=None):
+        """Keep the SITE FIND index current; size None means the file is gone."""
+        if self.server.file_index is None:
+            return
+        index = self.server.file_index.get(self.home)
+        rel = "/".join(target.parts)
+        try:
+            if size is None:
+                index.remove(rel)
+            else:
+                index.update(rel, size, mtime)
+        except sqlite3.Error:
+            pass        # the next reconcile pass catches up
+
+    def _reindex_move(self, src, dst):
+        if self.server.file_index is None:
+            return
+        try:
+            self.server.file_index.get(self.home).move("/".join(src.parts), "/".join(dst.parts))
+        except sqlite3.Error:
+            pass
 
     def cmd_DELE(self, args):
         self.require_auth()
@@ -357,21 +870,249 @@ class FTPHandler(StreamRequestHandler):
             self.send("501 Syntax: DELE <file>")
             return
 
-        try:
-            path = secure_join(self.cwd, args[0])
-        except:
-            self.send("550 Invalid path.")
+        target = self._resolve(args[0])
+        if target is None:
             return
 
-        if not path.exists() or not path.is_file():
+        if not target.is_file():
+            target.close()
             self.send("550 File not found.")
             return
 
-        lock = get_lock_for_path(str(path))
-        with lock:
-            path.unlink()
+        path = target.path
+        if self._transfer_locks(exclusive=(path,)):
+            target.close()
+            return
+        with target, self.server.file_locks.lock(path):
+            try:
+                target.unlink()
+            except FileNotFoundError:
+                self.send("550 File not found.")
+                return
+            self.server.storage.touch_dir(path.parent)
+            self._uncache(path)
+            CHANGE_HUB.publish(path.parent, DEL, path.name)
+            self._reindex(target)
             self.send("250 File deleted.")
 
+    def cmd_RNFR(self, args):
+        self.require_auth()
+        # a rename drops the source name, so it needs delete as well as write
+        if not (self.permissions.get("write", False) and self.permissions.get("delete", False)):
+            self.send("550 Permission denied.")
+            return
+
+        if len(args) != 1:
+            self.send("501 Syntax: RNFR <path>")
+            return
+
+        target = self._resolve(args[0])
+        if target is None:
+            return
+        with target:
+            st = target.lstat()
+        if not target.parts or st is None or not (stat.S_ISREG(st.st_mode) or
+                                                  stat.S_ISDIR(st.st_mode)):
+            self.send("550 File not found.")
+            return
+
+        self.rename_from = args[0]
+        self.send("350 Ready for RNTO.")
+
+    def cmd_RNTO(self, args):
+        self.require_auth()
+        if self.rename_from is None:
+            self.send("503 Send RNFR first.")
+            return
+
+        if len(args) != 1:
+            self.send("501 Syntax: RNTO <path>")
+            return
+
+        src = self._resolve(self.rename_from)
+        if src is None:
+            return
+        try:
+            # checked before resolving, which may create the target's parents
+            inside = self.paths.parts(args[0])[:len(src.parts)] == src.parts
+        except ValueError:
+            inside = False            # _resolve() reports it
+        if inside or self.paths.cwd_parts[:len(src.parts)] == src.parts:
+            src.close()
+            self.send("550 Can't move a directory into itself or away from the cwd.")
+            return
+        dst = self._resolve(args[0], create_dirs=True)
+        if dst is None:
+            src.close()
+            return
+
+        if self._transfer_locks(exclusive=(src.path, dst.path)):
+            src.close()
+            dst.close()
+            return
+        with src, dst, self.server.file_locks.lock_all(exclusive=(src.path, dst.path)):
+            st = src.lstat()
+            if st is None:
+                self.send("550 File not found.")
+                return
+            is_dir = stat.S_ISDIR(st.st_mode)
+            if dst.lstat() is not None:
+                self.send("550 Target already exists.")
+                return
+
+            try:
+                src.rename_to(dst)    # also retires every session's cached dir fds
+            except OSError as e:
+                self.send(f"550 Rename failed: {e.strerror}.")
+                return
+
+            # both directories changed when the entry moved between them
+            if not self._commit(dirs=(src, dst)):
+                self.send("451 Rename could not be made durable.")
+                return
+
+            self.server.storage.touch_dir(src.path.parent)
+            self.server.storage.touch_dir(dst.path.parent)
+            self._uncache(src.path)
+            CHANGE_HUB.publish(src.path.parent, DEL, src.path.name)
+            CHANGE_HUB.publish(dst.path.parent, ADD, dst.path.name,
+                               0 if is_dir else st.st_size, int(st.st_mtime))
+            self._reindex_move(src, dst)
+            self.send("250 Rename successful.")
+
+    def _site_copy(self, args):
+        """SITE COPY <source> <target>: copy a file without it leaving the server."""
+        if not (self.permissions.get("read", False) and self.permissions.get("write", False)):
+            self.send("550 Permission denied.")
+            return
+
+        if len(args) != 2:
+            self.send("501 Syntax: SITE COPY <source> <target>")
+            return
+
+        src = self._resolve(args[0])
+        if src is None:
+            return
+        dst = self._resolve(args[1], create_dirs=True)
+        if dst is None:
+            src.close()
+            return
+
+        path = dst.path
+        if self._transfer_locks(exclusive=(path,), shared=(src.path,)):
+            src.close()
+            dst.close()
+            return
+        with src, dst, self.server.file_locks.lock_all(exclusive=(path,), shared=(src.path,)), \
+                self.session.transfer():
+            if not src.is_file():
+                self.send("550 File not found.")
+                return
+            if src.parts == dst.parts:
+                self.send("550 Source and target are the same file.")
+                return
+
+            try:
+                existed, size, method = src.copy_to(dst, progress=self._count_bytes)
+            except OSError as e:
+                self.send(f"451 Copy failed: {e.strerror or e}.")
+                return
+
+            if not self._commit(dst, dirs=() if existed else (dst,)):
+                self.send("451 Copy could not be made durable.")
+                return
+
+            self._stored(dst, existed, size)
+            self.send(f"250 Copied {size} bytes ({method}).")
+
+    def cmd_WATCH(self, args):
+        """
+        Turn this connection into a change feed for one directory.  Events
+        are pushed as 'EVENT ADD|MOD|DEL <size> <mtime> <name>' (or
+        'EVENT RESYNC' after an overflow) until the client sends UNWATCH.
+        """
+        self.require_auth()
+        if not self.permissions.get("read", False):
+            self.send("550 Permission denied.")
+            return
+
+        if len(args) > 1:
+            self.send("501 Syntax: WATCH [dir]")
+            return
+
+        resolved = self._resolve(args[0] if args else "", from_home=bool(args))
+        if resolved is None:
+            return
+        with resolved:
+            st = resolved.lstat()
+        if st is None or not stat.S_ISDIR(st.st_mode):
+            self.send("550 Directory not found.")
+            return
+        target = resolved.path
+
+        # CHANGE_HUB only sees this process; with several workers, changes
+        # made elsewhere are caught by the directory tag and sent as RESYNC
+        cross_worker = self.server.workers > 1
+        last_tag = self.server.storage.dir_tag(target) if cross_worker else None
+
+        # commands are read on their own thread: UNWATCH may already sit in
+        # rfile's (or the TLS layer's) buffer, where select() can't see it
+        lines = queue.Queue()
+        reader = threading.Thread(target=self._watch_reader, args=(lines,),
+                                  name=f"watch-{self.peer}", daemon=True)
+        ended = False     # the reader stopped at UNWATCH or EOF
+
+        sub = CHANGE_HUB.subscribe(target)
+        self.session.watching = True
+        try:
+            reader.start()
+            self.send("150 Watching directory.")
+            while True:
+                event = sub.get(timeout=WATCH_POLL_INTERVAL)
+                local = bool(event)
+                while event:
+                    self.send(event)
+                    event = sub.get(timeout=0)
+
+                if cross_worker:
+                    tag = self.server.storage.dir_tag(target)
+                    if tag != last_tag and not local:
+                        self.send("EVENT RESYNC")
+                    last_tag = tag
+
+                while True:
+                    try:
+                        line = lines.get_nowait()
+                    except queue.Empty:
+                        break
+                    if not line:
+                        ended = self.closing = True
+                        return
+                    if line.strip().upper() == b"UNWATCH":
+                        ended = True
+                        self.send("226 Watch ended.")
+                        return
+                    self.send("503 Only UNWATCH is accepted while watching.")
+        finally:
+            self.session.watching = False
+            CHANGE_HUB.unsubscribe(sub)
+            if ended:
+                reader.join()
+            else:
+                # the reader still owns rfile, so the session can't go on
+                self.closing = True
+
+    def _watch_reader(self, lines):
+        """Feed cmd_WATCH the control lines up to UNWATCH or EOF."""
+        while True:
+            try:
+                line = self.rfile.readline()
+            except OSError:
+                line = b""
+            lines.put(line)
+            if not line or line.strip().upper() == b"UNWATCH":
+                return
+
 # ==========================================================
 # SERVER BOOTSTRAP
 # ==========================================================
@@ -379,18 +1120,174 @@ class FTPHandler(StreamRequestHandler):
 
 class ThreadedFTPServer(ThreadingMixIn, TCPServer):
     allow_reuse_address = True
-
-
-def run_server(host="0.0.0.0", port=2121):
+    daemon_threads = True
+    access_log = None
+    file_locks = None
+    workers = 1
+    reuse_port = False
+    tls_context = None
+    sessions = None
+    file_cache = None
+    durability = None
+    file_index = None
+    storage = None
+
+    def server_bind(self):
+        if self.reuse_port:
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        super().server_bind()
+
+    def get_request(self):
+        sock, addr = super().get_request()
+        if self.tls_context is not None:
+            sock = self.tls_context.wrap_socket(sock, server_side=True,
+                                                do_handshake_on_connect=False)
+        return sock, addr
+
+
+def run_server(host="0.0.0.0", port=2121, access_log=ACCESS_LOG_FILE, workers=1,
+               tls_cert=None, tls_key=None, timeouts=None, cache=(CACHE_SIZE, CACHE_MAX_FILE),
+               durability=(DURABILITY, DURABILITY_WINDOW), index_rescan=INDEX_RESCAN,
+               storage=LOCAL):
+    if storage.partition(":")[0] not in BACKENDS:
+        raise SystemExit(f"--storage must be one of {', '.join(BACKENDS)} (pack:DIR for a directory).")
     init_user_db()
+    options = {
+        # created once, before any fork, so all workers share the ticket keys
+        "tls_context": make_server_context(tls_cert, tls_key) if tls_cert else None,
+        "timeouts": timeouts,
+        "cache": cache,
+        "durability": durability,
+        "index_rescan": index_rescan,
+        "storage": storage,
+    }
+    if workers > 1:
+        if not hasattr(os, "fork") or not hasattr(socket, "SO_REUSEPORT"):
+            raise SystemExit("--workers needs fork() and SO_REUSEPORT (Linux/BSD).")
+        if storage == MEMORY:
+            raise SystemExit("--storage memory can't be shared by several --workers.")
+        supervise(host, port, access_log, workers, options)
+        return
+    serve(host, port, access_log, **options)
+
+
+def serve(host, port, access_log, worker=None, workers=1, tls_context=None, timeouts=None,
+          cache=(CACHE_SIZE, CACHE_MAX_FILE), durability=(DURABILITY, DURABILITY_WINDOW),
+          index_rescan=INDEX_RESCAN, storage=LOCAL):
+    timeouts = {**DEFAULT_TIMEOUTS, **(timeouts or {})}
+    ThreadedFTPServer.reuse_port = workers > 1
     srv = ThreadedFTPServer((host, port), FTPHandler)
-    print(f"Server running on {host}:{port}")
+    srv.workers = workers
+    srv.file_locks = FileLocks(LOCK_DIR)
+    srv.tls_context = tls_context
+    srv.sessions = SessionRegistry(idle_timeout=timeouts["idle"],
+                                   login_timeout=timeouts["login"],
+                                   stall_timeout=timeouts["stall"])
+    srv.sessions.start()
+    if cache and cache[0] > 0:
+        srv.file_cache = FileCache(max_bytes=cache[0], max_file_size=cache[1])
+    srv.durability = Durability(durability[0], window=durability[1])
+    # opened per process: the pack index connection must not cross a fork
+    srv.storage = make_storage(storage, srv.durability)
+    if index_rescan > 0:
+        srv.file_index = FileIndexes(INDEX_DIR, rescan_interval=index_rescan,
+                                     source=None if srv.storage.walkable else srv.storage.walk)
+    if access_log:
+        if worker is not None:
+            # one file per worker: AccessLog rotation is not multi-process safe
+            root, ext = os.path.splitext(access_log)
+            access_log = f"{root}-w{worker}{ext}"
+        srv.access_log = AccessLog(access_log)
+
+    if worker is None:
+        print(f"Server running on {host}:{port}" + (" (TLS)" if tls_context else ""))
+    else:
+        print(f"Worker {worker} (pid {os.getpid()}) serving {host}:{port}")
     try:
         srv.serve_forever()
     except KeyboardInterrupt:
-        print("\nShutting down...")
+        if worker is None:
+            print("\nShutting down...")
         srv.shutdown()
         srv.server_close()
+    finally:
+        srv.durability.close()
+        if srv.file_index:
+            srv.file_index.close()
+        srv.storage.close()
+        srv.sessions.stop()
+        closed = srv.sessions.closed
+        if any(closed.values()):
+            print("Sessions closed by timeout: "
+                  + ", ".join(f"{reason}={n}" for reason, n in closed.items()))
+        if srv.access_log:
+            srv.access_log.close()
+            if srv.access_log.dropped:
+                print(f"Access log dropped {srv.access_log.dropped} entries.")
+
+
+def _spawn_worker(host, port, access_log, worker, workers, options):
+    pid = os.fork()
+    if pid:
+        return pid
+
+    # child: SIGTERM from the supervisor shuts down like Ctrl+C (and drop
+    # the supervisor's handlers inherited through fork)
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    code = 0
+    try:
+        serve(host, port, access_log, worker, workers, **options)
+    except BaseException:
+        code = 1
+        import traceback
+        traceback.print_exc()
+    finally:
+        sys.stdout.flush()
+        os._exit(code)
+
+
+def supervise(host, port, access_log, workers, options, restart_delay=1.0):
+    """Fork `workers` server processes (serve(**options)) and restart any that die."""
+    print(f"Server running on {host}:{port} with {workers} workers"
+          + (" (TLS)" if options.get("tls_context") else ""))
+    children = {}                       # pid -> (worker number, start time)
+    for n in range(workers):
+        pid = _spawn_worker(host, port, access_log, n, workers, options)
+        children[pid] = (n, time.monotonic())
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        n, started = children.pop(pid, (None, 0))
+        if n is None or stopping:
+            continue
+
+        print(f"Worker {n} (pid {pid}) exited with status {os.waitstatus_to_exitcode(status)}; restarting.")
+        # a worker that dies straight after start would otherwise fork-loop
+        if time.monotonic() - started < restart_delay:
+            time.sleep(restart_delay)
+        if not stopping:
+            pid = _spawn_worker(host, port, access_log, n, workers, options)
+            children[pid] = (n, time.monotonic())
+
+    print("\nShutting down...")
 
 
 def create_sample_users():
@@ -403,9 +1300,49 @@ def create_sample_users():
 
 
 if __name__ == "__main__":
-    import sys
-    if len(sys.argv) == 2 and sys.argv[1] == "--init":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="PyFTP server")
+    ap.add_argument("--init", action="store_true", help="create the user DB and sample users")
+    ap.add_argument("--host", default="0.0.0.0")
+    ap.add_argument("--port", type=int, default=2121)
+    ap.add_argument("--access-log", default=ACCESS_LOG_FILE,
+                    help="JSON-lines access log path ('' to disable)")
+    ap.add_argument("--workers", type=int, default=1,
+                    help="number of server processes sharing the port (SO_REUSEPORT)")
+    ap.add_argument("--tls-cert", help="PEM certificate (chain); enables TLS")
+    ap.add_argument("--tls-key", help="PEM private key, if not inside --tls-cert")
+    ap.add_argument("--idle-timeout", type=float, default=DEFAULT_TIMEOUTS["idle"],
+                    help="close logged-in sessions idle this many seconds (0 = never)")
+    ap.add_argument("--login-timeout", type=float, default=DEFAULT_TIMEOUTS["login"],
+                    help="seconds allowed between connect and successful login (0 = no limit)")
+    ap.add_argument("--stall-timeout", type=float, default=DEFAULT_TIMEOUTS["stall"],
+                    help="abort transfers without progress for this many seconds (0 = never)")
+    ap.add_argument("--cache-size", type=int, default=CACHE_SIZE // (1024 * 1024),
+                    help="hot-file RETR cache size in MiB (0 disables)")
+    ap.add_argument("--cache-max-file", type=int, default=CACHE_MAX_FILE // 1024,
+                    help="largest file the cache holds, in KiB")
+    ap.add_argument("--durability", choices=POLICIES, default=DURABILITY,
+                    help="when STOR replies 226: none (page cache), file (fsync each upload), "
+                         "group (batched fsync)")
+    ap.add_argument("--durability-window", type=float, default=DURABILITY_WINDOW * 1000,
+                    help="group-commit batching window in milliseconds")
+    ap.add_argument("--index-rescan", type=float, default=INDEX_RESCAN,
+                    help="seconds between SITE FIND index reconcile passes (0 disables FIND)")
+    ap.add_argument("--storage", default=LOCAL, metavar="|".join(BACKENDS),
+                    help="where files live: local (the home directories), memory "
+                         "(in-process, lost on exit) or pack[:DIR] (small files packed "
+                         "into segment files under DIR, default 'packs')")
+    opts = ap.parse_args()
+
+    if opts.init:
         init_user_db()
         create_sample_users()
     else:
-        run_server()
+        run_server(opts.host, opts.port, access_log=opts.access_log, workers=opts.workers,
+                   tls_cert=opts.tls_cert, tls_key=opts.tls_key,
+                   timeouts={"idle": opts.idle_timeout, "login": opts.login_timeout,
+                             "stall": opts.stall_timeout},
+                   cache=(opts.cache_size * 1024 * 1024, opts.cache_max_file * 1024),
+                   durability=(opts.durability, opts.durability_window / 1000),
+                   index_rescan=opts.index_rescan, storage=opts.storage)
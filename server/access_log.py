@@ -0,0 +1,132 @@
+"""
+Asynchronous structured access log for the FTP server.
+
+Handler threads only build a small dict and push it onto a bounded queue;
+a single background writer thread serialises entries as JSON lines, writes
+them in batches and fsyncs on a configurable interval.  When the queue is
+full the entry is dropped (and counted) rather than blocking the session.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+
+
+class AccessLog:
+    def __init__(self, path, max_queue=10000, flush_interval=1.0,
+                 fsync_interval=5.0, max_bytes=10 * 1024 * 1024, backups=5):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+
+        self.dropped = 0
+        self.written = 0
+        self._dropped_lock = threading.Lock()
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._file = None
+        self._last_fsync = time.monotonic()
+
+        self._thread = threading.Thread(target=self._run, name="access-log", daemon=True)
+        self._thread.start()
+
+    # ----------------------------------------------------
+    # PRODUCER SIDE (handler threads)
+    # ----------------------------------------------------
+    def record(self, user, peer, command, path=None, nbytes=0, duration=0.0, code=None):
+        entry = {
+            "ts": time.time(),
+            "user": user,
+            "peer": peer,
+            "cmd": command,
+            "path": path,
+            "bytes": nbytes,
+            "ms": round(duration * 1000, 3),
+            "code": code,
+        }
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+    def close(self, timeout=5.0):
+        self._stop.set()
+        self._thread.join(timeout)
+
+    # ----------------------------------------------------
+    # WRITER THREAD
+    # ----------------------------------------------------
+    def _open(self):
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def _rotate(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        for i in range(self.backups - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.unlink(self.path)
+        self._open()
+
+    def _drain(self, first):
+        """Collect everything currently queued into one batch."""
+        batch = [first]
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                return batch
+
+    def _write_batch(self, batch):
+        data = "".join(json.dumps(e, separators=(",", ":")) + "\n" for e in batch)
+        self._file.write(data)
+        self._file.flush()
+        self.written += len(batch)
+
+        if self.max_bytes and self._file.tell() >= self.max_bytes:
+            self._rotate()
+
+    def _maybe_fsync(self, force=False):
+        now = time.monotonic()
+        if force or now - self._last_fsync >= self.fsync_interval:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._last_fsync = now
+
+    def _run(self):
+        self._open()
+        try:
+            while not self._stop.is_set():
+                try:
+                    first = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    self._maybe_fsync()
+                    continue
+
+                # let a burst accumulate so it lands in a single write
+                time.sleep(min(self.flush_interval, 0.05))
+                self._write_batch(self._drain(first))
+                self._maybe_fsync()
+
+            # flush whatever is left on shutdown
+            try:
+                self._write_batch(self._drain(self._queue.get_nowait()))
+            except queue.Empty:
+                pass
+            self._maybe_fsync(force=True)
+        finally:
+            self._file.close()
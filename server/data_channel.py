@@ -0,0 +1,114 @@
+"""
+Separate data connections (PASV) for RETR/STOR.
+
+After PASV the next RETR or STOR moves its payload to a second TCP
+connection and runs in a background thread, so the control connection
+keeps accepting commands while bytes flow - in particular ABOR, which
+cancels the transfer mid-stream, and STAT, which reports its progress.
+"""
+
+import socket
+import threading
+
+from utils.send_file import TransferAborted
+
+DATA_ACCEPT_TIMEOUT = 30.0     # seconds to wait for the client's data connection
+
+
+class DataConnectionError(Exception):
+    """The client never opened the data connection (or it failed TLS)."""
+
+
+class PassiveListener:
+    """A one-shot listening socket for a single data connection."""
+
+    def __init__(self, bind_host, peer_host, tls_context=None, timeout=DATA_ACCEPT_TIMEOUT):
+        self.peer_host = peer_host
+        self.tls_context = tls_context
+        self.sock = socket.create_server((bind_host, 0))
+        self.sock.settimeout(timeout)
+
+    @property
+    def address(self):
+        return self.sock.getsockname()[:2]
+
+    def reply(self):
+        """The 227 reply advertising this listener."""
+        host, port = self.address
+        return "227 Entering Passive Mode (%s,%d,%d)." % (host.replace(".", ","), port >> 8, port & 0xFF)
+
+    def accept(self):
+        """Wait for the data connection from the control connection's host."""
+        while True:
+            try:
+                conn, addr = self.sock.accept()
+            except OSError as e:
+                raise DataConnectionError(str(e) or "accept timed out") from None
+            # anyone can connect to an open port; only the session's own
+            # host may hijack its data connection
+            if addr[0] == self.peer_host:
+                break
+            conn.close()
+
+        conn.settimeout(self.sock.gettimeout())
+        if self.tls_context is not None:
+            try:
+                conn = self.tls_context.wrap_socket(conn, server_side=True)
+            except OSError as e:
+                conn.close()
+                raise DataConnectionError(f"TLS handshake failed: {e}") from None
+        conn.settimeout(None)
+        return conn
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class DataTransfer:
+    """State of the one background transfer a session may have running."""
+
+    def __init__(self, kind, name, listener, on_progress=None, path=None):
+        self.kind = kind               # "RETR" | "STOR"
+        self.name = name
+        self.path = path               # logical path whose file lock the transfer holds
+        self.listener = listener
+        self.done = 0
+        self.total = 0
+        self.cancel = threading.Event()
+        self.finished = threading.Event()
+        self.conn = None
+        self.thread = None
+        self.on_progress = on_progress
+
+    def progress(self, done, total):
+        self.done = done
+        self.total = total
+        if self.on_progress:
+            self.on_progress()
+
+    def attach(self, conn):
+        self.conn = conn
+        if self.cancel.is_set():
+            raise TransferAborted("Aborted before the data connection opened.")
+
+    def abort(self):
+        """Cancel and unblock whatever the transfer thread is waiting on."""
+        self.cancel.set()
+        self.listener.close()
+        conn = self.conn
+        if conn is not None:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def close(self):
+        self.listener.close()
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except OSError:
+                pass
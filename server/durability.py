@@ -0,0 +1,155 @@
+"""
+Durability policy for completed uploads.
+
+    none    reply as soon as the bytes are written (page cache only);
+            a crash can lose an upload that was already acknowledged
+    file    fsync the file (and its directory for new files) before the
+            226 reply - safe, but one synchronous flush per upload
+    group   uploads completing within `window` seconds are flushed
+            together by a background committer: their fsyncs are issued
+            concurrently so the filesystem can fold them into one journal
+            commit, each directory is fsynced once per batch, and every
+            waiting STOR is released when its batch is durable
+
+commit() blocks the calling session according to the policy and raises
+OSError when the data could not be made durable.  It takes descriptors
+the caller already holds - the upload's own file and the parent directory
+fds resolved by server/paths.py - so nothing is reopened by path; they
+must stay open until commit() returns.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+NONE, FILE, GROUP = "none", "file", "group"
+POLICIES = (NONE, FILE, GROUP)
+
+
+def _by_inode(dir_fds):
+    """{(st_dev, st_ino): fd} - one fd per directory, however often it's named."""
+    dirs = {}
+    for fd in dir_fds:
+        st = os.fstat(fd)
+        dirs.setdefault((st.st_dev, st.st_ino), fd)
+    return dirs
+
+
+class _Pending:
+    __slots__ = ("fd", "dirs", "done", "error")
+
+    def __init__(self, fd, dirs):
+        self.fd = fd
+        self.dirs = dirs
+        self.done = threading.Event()
+        self.error = None
+
+
+class Durability:
+    def __init__(self, policy=NONE, window=0.002, max_batch=256, flushers=8):
+        if policy not in POLICIES:
+            raise ValueError(f"unknown durability policy {policy!r}")
+        self.policy = policy
+        self.window = window
+        self.max_batch = max_batch
+        self.commits = 0
+        self.batches = 0
+        self._queue = []
+        self._cond = threading.Condition()
+        self._closed = False
+        if policy == GROUP:
+            self._pool = ThreadPoolExecutor(max_workers=flushers, thread_name_prefix="fsync")
+            self._thread = threading.Thread(target=self._commit_loop, name="group-commit",
+                                            daemon=True)
+            self._thread.start()
+
+    def commit(self, fd=None, dir_fds=()):
+        """
+        Make the data written through `fd` durable (None: nothing but
+        directory entries changed), then the entries of the directories
+        open as `dir_fds` (new file, rename).
+        """
+        if self.policy == NONE:
+            return
+        dirs = _by_inode(dir_fds)
+        if self.policy == FILE:
+            if fd is not None:
+                os.fsync(fd)
+            for dir_fd in dirs.values():
+                os.fsync(dir_fd)
+            with self._cond:
+                self.commits += 1
+                self.batches += 1
+            return
+
+        item = _Pending(fd, dirs)
+        with self._cond:
+            if self._closed:
+                raise OSError("durability committer is shut down")
+            self._queue.append(item)
+            self._cond.notify()
+        item.done.wait()
+        if item.error is not None:
+            raise item.error
+
+    def close(self):
+        if self.policy != GROUP:
+            return
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        self._pool.shutdown()
+
+    def stats(self):
+        return {"durability": self.policy, "fsync_commits": self.commits,
+                "fsync_batches": self.batches}
+
+    # ----------------------------------------------------
+    def _commit_loop(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                # let the batch fill for `window` after its first upload
+                deadline = time.monotonic() + self.window
+                while len(self._queue) < self.max_batch and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._queue[:self.max_batch]
+                del self._queue[:self.max_batch]
+            self._flush(batch)
+
+    def _flush(self, batch):
+        errors = {}
+        futures = {item: self._pool.submit(os.fsync, item.fd)
+                   for item in batch if item.fd is not None}
+        for item, future in futures.items():
+            error = future.exception()
+            if error is not None:
+                errors[item] = error
+
+        # directory entries after file data, each directory once
+        dirs = {}
+        for item in batch:
+            for key, dir_fd in item.dirs.items():
+                dirs.setdefault(key, dir_fd)
+        dir_errors = {}
+        for key, future in [(key, self._pool.submit(os.fsync, fd)) for key, fd in dirs.items()]:
+            error = future.exception()
+            if error is not None:
+                dir_errors[key] = error
+
+        self.commits += len(batch)
+        self.batches += 1
+        for item in batch:
+            item.error = errors.get(item)
+            for key in item.dirs:
+                if item.error is None:
+                    item.error = dir_errors.get(key)
+            item.done.set()
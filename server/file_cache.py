@@ -0,0 +1,89 @@
+"""
+In-memory LRU cache for small, frequently downloaded files.
+
+Entries are keyed by (path, inode, mtime_ns, size) as seen by a fresh
+stat() on every RETR, so a file replaced or rewritten by anyone - another
+session, another worker process, a shell - is never served stale: the key
+simply stops matching.  STOR/DELE additionally invalidate the path right
+away so the memory is released early.  The cache is bounded in bytes;
+files above `max_file_size` are never cached.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+
+class FileCache:
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_file_size=1024 * 1024):
+        self.max_bytes = max_bytes
+        self.max_file_size = min(max_file_size, max_bytes)
+        self._entries = OrderedDict()    # path -> (key, data); most recent last
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, path, st, f=None, snapshot=False):
+        """
+        Contents of `path` (whose current stat result is `st`) from memory,
+        reading and caching them on a miss - from `f`, the caller's open
+        file, when given; None if the file is not cacheable (too large, or
+        changed while being read).  `snapshot` means `f` can't change under
+        the reader (non-local storage), so it isn't re-checked.
+        """
+        if st.st_size > self.max_file_size:
+            return None
+        name = str(path)
+        key = (st.st_ino, st.st_mtime_ns, st.st_size)
+
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry[0] == key:
+                self._entries.move_to_end(name)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        # read outside the lock; only keep the data if the file was stable
+        if f is not None:
+            f.seek(0)
+            data = f.read(st.st_size + 1)
+            after = st if snapshot else os.fstat(f.fileno())
+        else:
+            with open(path, "rb") as f:
+                data = f.read(st.st_size + 1)
+                after = os.fstat(f.fileno())
+        if len(data) != st.st_size or (after.st_ino, after.st_mtime_ns, after.st_size) != key:
+            return None
+
+        with self._lock:
+            old = self._entries.pop(name, None)
+            if old is not None:
+                self._bytes -= len(old[1])
+            self._entries[name] = (key, data)
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+        return data
+
+    def invalidate(self, path):
+        with self._lock:
+            entry = self._entries.pop(str(path), None)
+            if entry is not None:
+                self._bytes -= len(entry[1])
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "cache_hits": self.hits,
+                "cache_misses": self.misses,
+                "cache_hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "cache_entries": len(self._entries),
+                "cache_bytes": self._bytes,
+                "cache_evictions": self.evictions,
+            }
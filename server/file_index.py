@@ -0,0 +1,355 @@
+"""
+Persistent per-home filename index behind SITE FIND.
+
+Each home gets an SQLite database in the index directory (outside the
+homes, so clients can't see or overwrite it).  `entries` holds one row
+per file or directory (path relative to the home); `names` is an
+external-content FTS5 table over it with the trigram tokenizer, so
+substring (LIKE) and glob (GLOB) queries with three or more literal
+characters are answered from the index instead of a scan.
+
+The index is kept current in two ways:
+
+    incremental   STOR/DELE/RNTO/SITE COPY through the server call
+                  update()/remove()/move()
+    reconcile     a background pass stats every known directory and
+                  re-reads only those whose mtime changed since the last
+                  pass, which picks up changes made behind the server's
+                  back (other tools, other workers before they wrote)
+
+The first reconcile of a home is a full walk; search() waits for it.
+Symlinks are not indexed, matching the O_NOFOLLOW path rules.  With a
+storage backend that has no directories on disk (--storage memory/pack)
+there is nothing to walk: the first pass rebuilds the index from the
+backend's own listing (so rows left over from an earlier run or another
+backend are dropped) and the incremental updates keep it current after
+that.
+"""
+
+import hashlib
+import os
+import sqlite3
+import stat
+import threading
+import time
+from pathlib import Path
+
+MAX_RESULTS = 1000
+READY_TIMEOUT = 30.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries(
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    parent TEXT NOT NULL,
+    name TEXT NOT NULL,
+    is_dir INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_parent ON entries(parent);
+CREATE TABLE IF NOT EXISTS dirs(
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS names USING fts5(
+    name, path, content='entries', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS entries_ai AFTER INSERT ON entries BEGIN
+    INSERT INTO names(rowid, name, path) VALUES (new.id, new.name, new.path);
+END;
+CREATE TRIGGER IF NOT EXISTS entries_ad AFTER DELETE ON entries BEGIN
+    INSERT INTO names(names, rowid, name, path) VALUES ('delete', old.id, old.name, old.path);
+END;
+CREATE TRIGGER IF NOT EXISTS entries_au AFTER UPDATE OF path, name ON entries BEGIN
+    INSERT INTO names(names, rowid, name, path) VALUES ('delete', old.id, old.name, old.path);
+    INSERT INTO names(rowid, name, path) VALUES (new.id, new.name, new.path);
+END;
+"""
+
+
+def _split(rel):
+    parent, _, name = rel.rpartition("/")
+    return parent, name
+
+
+def _subtree(rel):
+    """WHERE clause + args matching `rel` and everything below it."""
+    # '0' sorts right after '/', so the range is exactly the "rel/" prefix
+    return "(path = ? OR (path >= ? AND path < ?))", (rel, rel + "/", rel + "0")
+
+
+class FileIndex:
+    def __init__(self, home, db_path):
+        self.home = Path(home)
+        self.db_path = str(db_path)
+        self._db = self._connect()
+        self._db.executescript(SCHEMA)
+        self._reader = self._connect()
+        self._wlock = threading.Lock()
+        self._rlock = threading.Lock()
+        self.ready = threading.Event()
+        self.next_scan = 0.0
+
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, check_same_thread=False, timeout=10)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")     # the index can always be rebuilt
+        return db
+
+    def close(self):
+        with self._wlock, self._rlock:
+            self._db.close()
+            self._reader.close()
+
+    # ----------------------------------------------------
+    # QUERIES
+    # ----------------------------------------------------
+    def search(self, pattern, limit=MAX_RESULTS):
+        """
+        Up to `limit` [(is_dir, size, mtime, path), ...], sorted by path, for
+        entries whose name matches `pattern` - a glob if it contains * ? or
+        [, else a case-insensitive substring.  A pattern containing '/' is
+        matched against the whole path instead of the name.
+        """
+        self.ready.wait(READY_TIMEOUT)
+        column = "name"
+        if "/" in pattern:
+            column, pattern = "path", pattern.lstrip("/")
+        if any(c in pattern for c in "*?["):
+            where, args = f"names.{column} GLOB ?", (pattern,)
+        else:
+            # LIKE ... ESCAPE can't use the trigram index, so let '_' and '%'
+            # match loosely there and check the exact substring with instr()
+            where = f"names.{column} LIKE ? AND instr(lower(e.{column}), ?) > 0"
+            args = ("%" + pattern.replace("%", "_") + "%", pattern.lower())
+        sql = ("SELECT e.is_dir, e.size, e.mtime, e.path FROM names "
+               "JOIN entries e ON e.id = names.rowid "
+               f"WHERE {where} ORDER BY e.path LIMIT ?")
+        with self._rlock:
+            return self._reader.execute(sql, args + (limit,)).fetchall()
+
+    # ----------------------------------------------------
+    # INCREMENTAL UPDATES
+    # ----------------------------------------------------
+    def update(self, rel, size, mtime):
+        """A file was written through the server."""
+        with self._wlock, self._db:
+            self._add_parents(rel)
+            self._upsert(rel, False, size, mtime)
+
+    def remove(self, rel):
+        """A file was deleted through the server."""
+        with self._wlock, self._db:
+            where, args = _subtree(rel)
+            self._db.execute(f"DELETE FROM entries WHERE {where}", args)
+            self._db.execute(f"DELETE FROM dirs WHERE {where}", args)
+
+    def move(self, old, new):
+        """`old` (a file or a whole directory) was renamed to `new`."""
+        new_parent, new_name = _split(new)
+        n = len(old)
+        where, args = _subtree(old)
+        with self._wlock, self._db:
+            target_where, target_args = _subtree(new)
+            self._db.execute(f"DELETE FROM entries WHERE {target_where}", target_args)
+            self._db.execute(f"DELETE FROM dirs WHERE {target_where}", target_args)
+            self._add_parents(new)
+            self._db.execute(
+                "UPDATE entries SET "
+                "parent = CASE WHEN path = ? THEN ? ELSE ? || substr(parent, ?) END, "
+                "name = CASE WHEN path = ? THEN ? ELSE name END, "
+                f"path = ? || substr(path, ?) WHERE {where}",
+                (old, new_parent, new, n + 1, old, new_name, new, n + 1) + args)
+            self._db.execute(f"UPDATE dirs SET path = ? || substr(path, ?) WHERE {where}",
+                             (new, n + 1) + args)
+
+    def rebuild(self, entries):
+        """Replace the whole index with `entries`: (rel, is_dir, size, mtime)."""
+        with self._wlock, self._db:
+            self._db.execute("DELETE FROM entries")
+            self._db.execute("DELETE FROM dirs")
+            for rel, is_dir, size, mtime in entries:
+                self._upsert(rel, is_dir, size, mtime)
+        self.ready.set()
+
+    def _add_parents(self, rel):
+        parent = _split(rel)[0]
+        while parent:
+            # a directory the reconciler hasn't seen: index it, scan it later
+            if self._db.execute("SELECT 1 FROM entries WHERE path = ?", (parent,)).fetchone():
+                break
+            self._upsert(parent, True, 0, int(time.time()))
+            self._db.execute("INSERT OR IGNORE INTO dirs(path, mtime_ns) VALUES (?, NULL)",
+                             (parent,))
+            parent = _split(parent)[0]
+
+    def _upsert(self, rel, is_dir, size, mtime):
+        parent, name = _split(rel)
+        self._db.execute(
+            "INSERT INTO entries(path, parent, name, is_dir, size, mtime) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(path) DO UPDATE SET is_dir = excluded.is_dir, "
+            "size = excluded.size, mtime = excluded.mtime",
+            (rel, parent, name, int(is_dir), size, mtime))
+
+    # ----------------------------------------------------
+    # RECONCILE
+    # ----------------------------------------------------
+    def reconcile(self, stop=None):
+        """
+        Bring the index in line with the disk, re-reading only directories
+        whose mtime changed.  Returns the number of directories re-read.
+        """
+        rescanned = 0
+        stack = [""]
+        while stack:
+            if stop is not None and stop.is_set():
+                return rescanned
+            rel = stack.pop()
+            full = os.path.join(self.home, rel) if rel else str(self.home)
+            try:
+                st = os.stat(full, follow_symlinks=False)
+            except OSError:
+                st = None
+            if st is None or not stat.S_ISDIR(st.st_mode):
+                if rel:
+                    self.remove(rel)
+                continue
+
+            with self._rlock:
+                row = self._reader.execute("SELECT mtime_ns FROM dirs WHERE path = ?",
+                                           (rel,)).fetchone()
+            if row is None or row[0] != st.st_mtime_ns:
+                self._rescan_dir(rel, full, st.st_mtime_ns)
+                rescanned += 1
+
+            with self._rlock:
+                stack.extend(r[0] for r in self._reader.execute(
+                    "SELECT path FROM entries WHERE parent = ? AND is_dir = 1", (rel,)))
+        self.ready.set()
+        return rescanned
+
+    def _rescan_dir(self, rel, full, mtime_ns):
+        on_disk = {}
+        try:
+            with os.scandir(full) as it:
+                for entry in it:
+                    if entry.is_symlink():
+                        continue
+                    try:
+                        est = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    is_dir = stat.S_ISDIR(est.st_mode)
+                    if not is_dir and not stat.S_ISREG(est.st_mode):
+                        continue
+                    on_disk[entry.name] = (is_dir, 0 if is_dir else est.st_size,
+                                           int(est.st_mtime))
+        except OSError:
+            return
+
+        prefix = rel + "/" if rel else ""
+        with self._wlock, self._db:
+            known = {name: (bool(is_dir), size, mtime) for name, is_dir, size, mtime in
+                     self._db.execute("SELECT name, is_dir, size, mtime FROM entries "
+                                      "WHERE parent = ?", (rel,))}
+            for name, old in known.items():
+                new = on_disk.get(name)
+                if new is None or new[0] != old[0]:
+                    where, args = _subtree(prefix + name)
+                    self._db.execute(f"DELETE FROM entries WHERE {where}", args)
+                    self._db.execute(f"DELETE FROM dirs WHERE {where}", args)
+            for name, new in on_disk.items():
+                if known.get(name) != new:
+                    self._upsert(prefix + name, *new)
+            self._db.execute("INSERT OR REPLACE INTO dirs(path, mtime_ns) VALUES (?, ?)",
+                             (rel, mtime_ns))
+
+    def stats(self):
+        with self._rlock:
+            files, dirs = self._reader.execute(
+                "SELECT COUNT(*) - COALESCE(SUM(is_dir), 0), COALESCE(SUM(is_dir), 0) "
+                "FROM entries").fetchone()
+        return files, dirs
+
+
+class FileIndexes:
+    """
+    The open FileIndex of every home seen so far, plus their reconciler.
+    `source(home)`, when given, lists a home that isn't a directory tree
+    on disk as (rel, is_dir, size, mtime) tuples; each index is then
+    rebuilt from it once instead of being walked and rescanned.
+    """
+
+    def __init__(self, index_dir, rescan_interval=300.0, source=None):
+        self.index_dir = Path(index_dir)
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        self.rescan_interval = rescan_interval
+        self.source = source
+        self._indexes = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._reconcile_loop, name="file-index",
+                                        daemon=True)
+        self._thread.start()
+
+    def get(self, home):
+        key = str(home)
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is None:
+                name = hashlib.sha1(key.encode()).hexdigest()[:16] + ".db"
+                index = self._indexes[key] = FileIndex(home, self.index_dir / name)
+                self._wake.set()        # first reconcile right away
+        return index
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+        with self._lock:
+            for index in self._indexes.values():
+                index.close()
+            self._indexes.clear()
+
+    def stats(self):
+        with self._lock:
+            indexes = list(self._indexes.values())
+        files = dirs = 0
+        for index in indexes:
+            f, d = index.stats()
+            files += f
+            dirs += d
+        return {"index_homes": len(indexes), "index_files": files, "index_dirs": dirs}
+
+    def _reconcile_loop(self):
+        while not self._stop.is_set():
+            self._wake.clear()
+            with self._lock:
+                indexes = list(self._indexes.values())
+            now = time.monotonic()
+            for index in indexes:
+                if self._stop.is_set():
+                    return
+                if index.next_scan <= now:
+                    index.next_scan = self._scan(index)
+
+            upcoming = [i.next_scan for i in indexes]
+            delay = min(upcoming) - time.monotonic() if upcoming else self.rescan_interval
+            self._wake.wait(None if delay == float("inf") else max(0.0, delay))
+
+    def _scan(self, index):
+        """One reconcile (or rebuild) pass; returns when the next one is due."""
+        try:
+            if self.source is None:
+                index.reconcile(self._stop)
+            else:
+                index.rebuild(self.source(index.home))
+                return float("inf")     # kept current by the server from here on
+        except (sqlite3.Error, OSError):
+            pass        # e.g. another worker holding the write lock; next pass
+        finally:
+            index.ready.set()
+        return time.monotonic() + self.rescan_interval
@@ -0,0 +1,80 @@
+"""
+Per-path file locks that work across threads *and* worker processes.
+
+Each path hashes onto one of `stripes` lock files in `lock_dir`; a lock is
+taken with flock() on a freshly opened descriptor, and because flock
+locks belong to the open file description, two threads of one process
+exclude each other exactly like two processes do.  Readers (RETR) take a
+shared lock, writers (STOR / DELE) an exclusive one.  Striping keeps the
+number of lock files fixed; an unlucky collision only serialises two
+unrelated paths.
+
+Where fcntl is unavailable (Windows) the same interface falls back to
+in-process striped threading locks, which is enough for the single
+process server (--workers needs fork anyway).
+"""
+
+import contextlib
+import hashlib
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:   # pragma: no cover - non-POSIX
+    fcntl = None
+
+DEFAULT_STRIPES = 1024
+
+
+class FileLocks:
+    def __init__(self, lock_dir="locks", stripes=DEFAULT_STRIPES):
+        self.lock_dir = lock_dir
+        self.stripes = stripes
+        if fcntl is not None:
+            os.makedirs(lock_dir, exist_ok=True)
+        else:
+            self._thread_locks = [threading.Lock() for _ in range(stripes)]
+
+    def _stripe(self, path):
+        digest = hashlib.blake2b(str(path).encode("utf-8", "surrogateescape"), digest_size=8).digest()
+        return int.from_bytes(digest, "big") % self.stripes
+
+    def lock(self, path, shared=False):
+        """Hold the lock for `path` for the duration of the with-block."""
+        return self._lock_stripe(self._stripe(path), shared)
+
+    def shares_lock(self, a, b):
+        """True if paths `a` and `b` map onto the same lock."""
+        return self._stripe(a) == self._stripe(b)
+
+    @contextlib.contextmanager
+    def lock_all(self, exclusive=(), shared=()):
+        """
+        Hold the locks of several paths at once (RNTO, SITE COPY).  Stripes
+        are taken in ascending order so two such callers can't deadlock,
+        and each only once - a second flock on a stripe this thread already
+        holds would wait for itself; a stripe wanted both ways is exclusive.
+        """
+        modes = {self._stripe(p): True for p in shared}
+        modes.update((self._stripe(p), False) for p in exclusive)
+        with contextlib.ExitStack() as stack:
+            for stripe in sorted(modes):
+                stack.enter_context(self._lock_stripe(stripe, modes[stripe]))
+            yield
+
+    @contextlib.contextmanager
+    def _lock_stripe(self, stripe, shared):
+        if fcntl is None:
+            # no shared mode here: readers serialise like writers
+            with self._thread_locks[stripe]:
+                yield
+            return
+
+        fd = os.open(os.path.join(self.lock_dir, f"{stripe:04x}.lock"),
+                     os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)   # closing the descriptor releases the flock
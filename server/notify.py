@@ -0,0 +1,74 @@
+"""
+Directory change fan-out for WATCH subscribers.
+
+STOR/DELE (from any session) publish compact events for the directory they
+touched; every session watching that directory gets a copy on its own
+bounded queue.  Publishing never blocks: when a subscriber falls behind
+its queue is flushed and it receives a single RESYNC event instead, which
+tells the client to fall back to a full LIST.
+"""
+
+import queue
+import threading
+
+ADD, MOD, DEL, RESYNC = "ADD", "MOD", "DEL", "RESYNC"
+
+
+class Subscription:
+    def __init__(self, directory, maxsize):
+        self.directory = directory
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def get(self, timeout):
+        """Next event line, or None on timeout."""
+        if self.overflowed:
+            self.overflowed = False
+            while True:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            return f"EVENT {RESYNC}"
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class ChangeHub:
+    def __init__(self, queue_size=256):
+        self.queue_size = queue_size
+        self._subs = {}          # directory (str) -> set of Subscription
+        self._lock = threading.Lock()
+
+    def subscribe(self, directory):
+        sub = Subscription(str(directory), self.queue_size)
+        with self._lock:
+            self._subs.setdefault(sub.directory, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            subs = self._subs.get(sub.directory)
+            if subs:
+                subs.discard(sub)
+                if not subs:
+                    del self._subs[sub.directory]
+
+    def publish(self, directory, kind, name, size=0, mtime=0):
+        with self._lock:
+            subs = list(self._subs.get(str(directory), ()))
+        if not subs:
+            return
+
+        event = f"EVENT {kind} {size} {mtime} {name}"
+        for sub in subs:
+            try:
+                sub.queue.put_nowait(event)
+            except queue.Full:
+                sub.overflowed = True
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(s) for s in self._subs.values())
@@ -0,0 +1,356 @@
+"""
+Packed small-file storage backend.
+
+Millions of tiny files on a regular filesystem cost an inode, a directory
+entry and at least one block each, and every STOR pays for creating them.
+PackStorage keeps the whole tree in one SQLite index (`index.db`) and the
+file contents in a few large append-only segment files:
+
+    index.db            nodes(path, parent, is_dir, size, mtime_ns,
+                        segment, offset, blob) - one row per file/dir
+    seg-000001.pack     small files (up to PACK_MAX bytes) back to back;
+                        a new segment starts at SEGMENT_SIZE
+    blobs/<id>          larger files, one plain file each, so RETR can
+                        still sendfile() them
+
+A write always appends (small) or creates a new blob (large) and then
+swaps the index row in one transaction, so readers never see a torn
+file and an overwrite gets a new row id - used as st_ino, which keeps the
+RETR cache honest.  SITE COPY shares the segment extent (or hard-links
+the blob) instead of copying bytes.  Space of deleted small files is not
+reclaimed; `pack_live_bytes` vs `pack_bytes` in SITE STATS shows how much
+a compaction would win.
+
+Appends happen inside a BEGIN IMMEDIATE transaction, which serialises
+writers across threads and worker processes.  With `sync` the segment or
+blob is fsynced before the index row is committed (synchronous=FULL).
+"""
+
+import io
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+from server.storage import KeyedStorage, PACK, make_stat
+
+PACK_MAX = 256 * 1024
+SEGMENT_SIZE = 256 * 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS nodes(
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT UNIQUE NOT NULL,
+    parent TEXT NOT NULL,
+    is_dir INTEGER NOT NULL,
+    size INTEGER NOT NULL DEFAULT 0,
+    mtime_ns INTEGER NOT NULL,
+    segment INTEGER,
+    offset INTEGER,
+    blob TEXT
+);
+CREATE INDEX IF NOT EXISTS nodes_parent ON nodes(parent);
+CREATE TABLE IF NOT EXISTS segments(
+    id INTEGER PRIMARY KEY,
+    size INTEGER NOT NULL
+);
+"""
+
+_COLUMNS = "id, path, is_dir, size, mtime_ns, segment, offset, blob"
+
+
+def _subtree(key):
+    # '0' sorts right after '/', so the range is exactly the "key/" prefix
+    return "(path = ? OR (path >= ? AND path < ?))", (key, key + "/", key + "0")
+
+
+class _PackWriter(io.RawIOBase):
+    """
+    Upload sink: buffers up to PACK_MAX bytes in memory, spills larger
+    uploads to a temporary blob, and commits to the store on close().
+    abort() drops the upload and leaves the stored version untouched.
+    """
+
+    def __init__(self, store, key):
+        super().__init__()
+        self._store = store
+        self._key = key
+        self._buf = bytearray()
+        self._spill = None
+        self._tmp = None
+        self._size = 0
+
+    def writable(self):
+        return True
+
+    def tell(self):
+        return self._size
+
+    def write(self, b):
+        n = len(b)
+        if self._spill is None and self._size + n > PACK_MAX:
+            self._tmp = self._store.blob_dir / f".tmp-{uuid.uuid4().hex}"
+            self._spill = open(self._tmp, "wb")
+            self._spill.write(self._buf)
+            self._buf = None
+        if self._spill is not None:
+            self._spill.write(b)
+        else:
+            self._buf += b
+        self._size += n
+        return n
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if self._spill is not None:
+                try:
+                    self._spill.flush()
+                    if self._store.sync:
+                        os.fsync(self._spill.fileno())
+                    self._spill.close()
+                    self._store._commit_blob(self._key, self._tmp, self._size)
+                except BaseException:
+                    self._tmp.unlink(missing_ok=True)
+                    raise
+            else:
+                self._store._commit_small(self._key, bytes(self._buf))
+        finally:
+            super().close()
+
+    def abort(self):
+        if self.closed:
+            return
+        try:
+            if self._spill is not None:
+                self._spill.close()
+                self._tmp.unlink(missing_ok=True)
+        finally:
+            super().close()
+
+
+class PackStorage(KeyedStorage):
+    name = PACK
+
+    def __init__(self, root, sync=True):
+        self.root = Path(root)
+        self.blob_dir = self.root / "blobs"
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self.sync = sync
+        self._db = sqlite3.connect(str(self.root / "index.db"), check_same_thread=False,
+                                   timeout=30, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(f"PRAGMA synchronous={'FULL' if sync else 'OFF'}")
+        self._db.executescript(SCHEMA)
+        self._lock = threading.RLock()
+        self._segment_fds = {}
+        self._doomed = []             # blobs to unlink once the transaction commits
+
+    @contextmanager
+    def _txn(self):
+        """A write transaction, exclusive across threads and processes."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                self._doomed.clear()
+                raise
+            self._db.execute("COMMIT")
+            doomed, self._doomed = self._doomed, []
+        for blob in doomed:
+            try:
+                os.unlink(self.blob_dir / blob)
+            except FileNotFoundError:
+                pass
+
+    def _row(self, key):
+        with self._lock:
+            return self._db.execute(f"SELECT {_COLUMNS} FROM nodes WHERE path = ?",
+                                    (key,)).fetchone()
+
+    def _segment_fd(self, segment):
+        fd = self._segment_fds.get(segment)
+        if fd is None:
+            fd = os.open(self.root / f"seg-{segment:06d}.pack", os.O_RDWR | os.O_CREAT, 0o644)
+            self._segment_fds[segment] = fd
+        return fd
+
+    @staticmethod
+    def _stat(row):
+        return make_stat(row[2], row[0], row[3], row[4])
+
+    # ----------------------------------------------------
+    # NODE OPERATIONS (see KeyedStorage)
+    # ----------------------------------------------------
+    def stat(self, key):
+        row = self._row(key)
+        return self._stat(row) if row is not None else None
+
+    def listdir(self, key):
+        with self._lock:
+            rows = self._db.execute(f"SELECT {_COLUMNS} FROM nodes WHERE parent = ?",
+                                    (key,)).fetchall()
+        return [(row[1].rpartition("/")[2], self._stat(row)) for row in rows]
+
+    def subtree(self, key):
+        with self._lock:
+            rows = self._db.execute(f"SELECT {_COLUMNS} FROM nodes WHERE path >= ? AND path < ?",
+                                    (key + "/", key + "0")).fetchall()
+        return [(row[1], self._stat(row)) for row in rows]
+
+    def mkdir(self, key):
+        with self._txn() as db:
+            if db.execute("SELECT 1 FROM nodes WHERE path = ?", (key,)).fetchone():
+                raise FileExistsError(key)
+            self._insert(db, key, True)
+
+    def open_read(self, key):
+        row = self._row(key)
+        if row is None:
+            raise FileNotFoundError(key)
+        if row[2]:
+            raise IsADirectoryError(key)
+        ino, _, _, size, _, segment, offset, blob = row
+        if blob is not None:
+            f = open(self.blob_dir / blob, "rb")
+        elif size:
+            with self._lock:
+                fd = self._segment_fd(segment)
+            f = io.BytesIO(os.pread(fd, size, offset))
+        else:
+            f = io.BytesIO()
+        return f, self._stat(row)
+
+    def open_write(self, key):
+        return _PackWriter(self, key)
+
+    def unlink(self, key):
+        with self._txn() as db:
+            row = db.execute(f"SELECT {_COLUMNS} FROM nodes WHERE path = ?", (key,)).fetchone()
+            if row is None:
+                raise FileNotFoundError(key)
+            if row[2]:
+                raise IsADirectoryError(key)
+            self._delete(db, row)
+            self._touch(db, key.rpartition("/")[0])
+
+    def rename(self, src, dst):
+        n = len(src)
+        src_parent, dst_parent = src.rpartition("/")[0], dst.rpartition("/")[0]
+        where, args = _subtree(src)
+        with self._txn() as db:
+            if db.execute("SELECT 1 FROM nodes WHERE path = ?", (dst,)).fetchone():
+                raise FileExistsError(dst)
+            if not db.execute("SELECT 1 FROM nodes WHERE path = ?", (src,)).fetchone():
+                raise FileNotFoundError(src)
+            db.execute(
+                "UPDATE nodes SET "
+                "parent = CASE WHEN path = ? THEN ? ELSE ? || substr(parent, ?) END, "
+                f"path = ? || substr(path, ?) WHERE {where}",
+                (src, dst_parent, dst, n + 1, dst, n + 1) + args)
+            self._touch(db, src_parent)
+            self._touch(db, dst_parent)
+
+    def copy(self, src, dst):
+        with self._txn() as db:
+            row = db.execute(f"SELECT {_COLUMNS} FROM nodes WHERE path = ?", (src,)).fetchone()
+            if row is None:
+                raise FileNotFoundError(src)
+            _, _, _, size, _, segment, offset, blob = row
+            if blob is not None:
+                # blobs are never modified in place, so a hard link is a copy
+                new_blob = uuid.uuid4().hex
+                os.link(self.blob_dir / blob, self.blob_dir / new_blob)
+                blob = new_blob
+            self._replace(db, dst, size, segment, offset, blob)
+        return size, "shared extent" if blob is None else "hard link"
+
+    def dir_tag(self, path):
+        key = str(path)
+        row = self._row(key)
+        if row is None:
+            raise FileNotFoundError(key)
+        with self._lock:
+            count = self._db.execute("SELECT COUNT(*) FROM nodes WHERE parent = ?",
+                                     (key,)).fetchone()[0]
+        return f"{row[4]:x}-{count}"
+
+    def stats(self):
+        with self._lock:
+            files, blobs, live = self._db.execute(
+                "SELECT COUNT(*), COUNT(blob), COALESCE(SUM(CASE WHEN blob IS NULL "
+                "THEN size END), 0) FROM nodes WHERE is_dir = 0").fetchone()
+            segments, packed = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM segments").fetchone()
+        return {"storage": self.name, "storage_files": files, "pack_blobs": blobs,
+                "pack_segments": segments, "pack_bytes": packed, "pack_live_bytes": live}
+
+    def close(self):
+        with self._lock:
+            for fd in self._segment_fds.values():
+                os.close(fd)
+            self._segment_fds.clear()
+            self._db.close()
+
+    # ----------------------------------------------------
+    # WRITES
+    # ----------------------------------------------------
+    def _commit_small(self, key, data):
+        with self._txn() as db:
+            segment = offset = None
+            if data:
+                row = db.execute("SELECT id, size FROM segments ORDER BY id DESC LIMIT 1").fetchone()
+                if row is None or row[1] + len(data) > SEGMENT_SIZE:
+                    segment = (row[0] + 1) if row else 1
+                    offset = 0
+                    db.execute("INSERT INTO segments(id, size) VALUES (?, 0)", (segment,))
+                else:
+                    segment, offset = row
+                fd = self._segment_fd(segment)
+                os.pwrite(fd, data, offset)
+                if self.sync:
+                    os.fsync(fd)
+                db.execute("UPDATE segments SET size = ? WHERE id = ?",
+                           (offset + len(data), segment))
+            self._replace(db, key, len(data), segment, offset, None)
+
+    def _commit_blob(self, key, tmp, size):
+        blob = uuid.uuid4().hex
+        os.replace(tmp, self.blob_dir / blob)
+        try:
+            with self._txn() as db:
+                self._replace(db, key, size, None, None, blob)
+        except BaseException:
+            os.unlink(self.blob_dir / blob)
+            raise
+
+    def _replace(self, db, key, size, segment, offset, blob):
+        old = db.execute(f"SELECT {_COLUMNS} FROM nodes WHERE path = ?", (key,)).fetchone()
+        if old is not None:
+            if old[2]:
+                raise IsADirectoryError(key)
+            self._delete(db, old)
+        self._insert(db, key, False, size, segment, offset, blob)
+
+    def _insert(self, db, key, is_dir, size=0, segment=None, offset=None, blob=None):
+        parent = key.rpartition("/")[0]
+        db.execute("INSERT INTO nodes(path, parent, is_dir, size, mtime_ns, segment, offset, "
+                   "blob) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                   (key, parent, int(is_dir), size, time.time_ns(), segment, offset, blob))
+        self._touch(db, parent)
+
+    def _delete(self, db, row):
+        db.execute("DELETE FROM nodes WHERE id = ?", (row[0],))
+        if row[7] is not None:
+            self._doomed.append(row[7])
+
+    @staticmethod
+    def _touch(db, key):
+        db.execute("UPDATE nodes SET mtime_ns = max(?, mtime_ns + 1) WHERE path = ?",
+                   (time.time_ns(), key))
@@ -0,0 +1,410 @@
+"""
+Per-session path resolution anchored on open directory descriptors.
+
+A session keeps an O_DIRECTORY fd for its home and its current directory.
+Client paths are normalised lexically (".." can never climb above the
+home), then walked component by component with openat()-style calls
+(os.open/os.stat/os.unlink with dir_fd) and O_NOFOLLOW, so:
+
+  * containment is structural - no string prefix check, so a sibling such
+    as /homes/alice2 is unreachable from /homes/alice - and symlinks
+    inside a home cannot point a session outside of it;
+  * the common case, a bare file name in the cwd, costs one fstatat and
+    one openat instead of a realpath() of every component of base and
+    target on each command;
+  * descriptors of recently used subdirectories are kept in a small LRU,
+    so deeper paths don't re-walk from the home each time.
+
+A directory fd keeps pointing at the directory after it is renamed, so a
+cached fd (or the cwd fd) can end up under a different logical path than
+the one locks, WATCH, SITE FIND and the RETR cache key on.  Every rename
+through this process bumps a generation number that makes all sessions
+drop their cached fds and re-walk their cwd before the next use; renames
+made elsewhere (another worker, other tools) are picked up when an entry
+or the cwd fd is older than DIR_CACHE_TTL seconds.
+
+Callers get a Target (parent dir fd + final name + the logical absolute
+path).  The path is still what file locks, the RETR cache and WATCH key
+on; the fd is what actually gets opened, and what the durability
+committer fsyncs for directory entries.
+
+Where the platform has no dir_fd support (Windows) the same interface
+falls back to path operations guarded by a resolve()-based check.
+"""
+
+import errno
+import os
+import stat
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from utils.copy_file import copy_file
+
+DIR_FD = {os.open, os.stat, os.unlink, os.mkdir, os.rename} <= os.supports_dir_fd
+O_NOFOLLOW = getattr(os, "O_NOFOLLOW", 0)
+O_CLOEXEC = getattr(os, "O_CLOEXEC", 0)
+O_DIR = os.O_RDONLY | getattr(os, "O_DIRECTORY", 0) | O_NOFOLLOW | O_CLOEXEC
+
+DIR_CACHE_SIZE = 16
+DIR_CACHE_TTL = 2.0
+
+# bumped by every rename in this process; see the module docstring
+_generation = 0
+_generation_lock = threading.Lock()
+
+
+def _bump_generation():
+    global _generation
+    with _generation_lock:
+        _generation += 1
+
+
+def split_client_path(base_parts, arg):
+    """
+    Components (relative to the home) of client path `arg` interpreted
+    from `base_parts`; a leading '/' starts at the home.  Raises
+    ValueError for paths that would leave the home.
+    """
+    arg = arg.replace("\\", "/")
+    if "\0" in arg:
+        raise ValueError("Forbidden path")
+    parts = [] if arg.startswith("/") else list(base_parts)
+    for comp in arg.split("/"):
+        if comp in ("", "."):
+            continue
+        if comp == "..":
+            if not parts:
+                raise ValueError("Forbidden path")
+            parts.pop()
+        else:
+            parts.append(comp)
+    return tuple(parts)
+
+
+def dir_tag(path):
+    """
+    Cheap directory version: mtime_ns plus entry count (no per-entry stat).
+    `path` may also be an open directory fd.
+    """
+    st = os.stat(path)
+    with os.scandir(path) as it:
+        count = sum(1 for _ in it)
+    return f"{st.st_mtime_ns:x}-{count}"
+
+
+def touch_dir(path):
+    """
+    Bump a directory's mtime so its tag changes even when an existing file
+    is overwritten in place or two changes land in the same timestamp tick.
+    """
+    try:
+        st = os.stat(path)
+        ns = max(time.time_ns(), st.st_mtime_ns + 1)
+        os.utime(path, ns=(st.st_atime_ns, ns))
+    except OSError:
+        pass
+
+
+class BaseTarget:
+    """
+    What every storage backend's resolved path offers the command handlers:
+    lstat/is_file, open_read/open_write, unlink, rename_to, copy_to, close.
+    """
+
+    def __init__(self, paths, parts):
+        self.parts = parts
+        self.name = parts[-1] if parts else "."
+        self.path = paths.home.joinpath(*parts)
+
+    def is_file(self):
+        st = self.lstat()
+        return st is not None and stat.S_ISREG(st.st_mode)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class BasePaths:
+    """Lexical cwd bookkeeping shared by the storage backends' sessions."""
+
+    def __init__(self, home):
+        self.home = Path(home)
+        self.cwd_parts = ()
+
+    @property
+    def cwd(self):
+        return self.home.joinpath(*self.cwd_parts)
+
+    def pwd(self):
+        return "/" + "/".join(self.cwd_parts)
+
+    def parts(self, arg):
+        """Components of `arg` (relative to the cwd); ValueError if it escapes."""
+        return split_client_path(self.cwd_parts, arg)
+
+    def invalidate(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class Target(BaseTarget):
+    """A resolved client path: `name` inside the directory `dir_fd`."""
+
+    def __init__(self, paths, parts, dir_fd):
+        super().__init__(paths, parts)
+        self.dir_fd = dir_fd          # owned by this Target (None without dir_fd support)
+
+    def _where(self):
+        if self.dir_fd is None:
+            return {"path": self.path}
+        return {"path": self.name, "dir_fd": self.dir_fd}
+
+    def lstat(self):
+        """stat without following a final symlink; None if missing."""
+        w = self._where()
+        try:
+            return os.stat(w.pop("path"), follow_symlinks=False, **w)
+        except FileNotFoundError:
+            return None
+
+    def open(self, flags, mode=0o644):
+        """os.open relative to the parent dir; a symlink fails with ELOOP."""
+        w = self._where()
+        return os.open(w.pop("path"), flags | O_NOFOLLOW | O_CLOEXEC, mode, **w)
+
+    def unlink(self):
+        w = self._where()
+        os.unlink(w.pop("path"), **w)
+
+    def rename_to(self, other):
+        """rename(2) this entry to Target `other` (atomic, same filesystem)."""
+        if self.dir_fd is None:
+            os.rename(self.path, other.path)
+        else:
+            os.rename(self.name, other.name, src_dir_fd=self.dir_fd, dst_dir_fd=other.dir_fd)
+            _bump_generation()
+
+    def open_read(self):
+        """(binary file, its fstat) - the handle RETR streams from."""
+        f = os.fdopen(self.open(os.O_RDONLY), "rb")
+        return f, os.fstat(f.fileno())
+
+    def open_write(self):
+        """(existed, binary file) for writing an upload; never follows a symlink."""
+        existed = self.lstat() is not None
+        fd = self.open(os.O_WRONLY | os.O_CREAT | os.O_TRUNC)
+        return existed, os.fdopen(fd, "wb")
+
+    def discard(self, f):
+        """Drop a failed upload written through `f` (from open_write)."""
+        try:
+            f.close()
+        except OSError:
+            pass
+        try:
+            self.unlink()         # O_TRUNC already lost the old version
+        except OSError:
+            pass
+
+    def copy_to(self, other, progress=None):
+        """
+        Copy this file over Target `other` in the kernel (utils/copy_file.py).
+        Returns (other existed, size, method).  Raises OSError - with `other`
+        removed again if it was already truncated - when the copy fails or
+        comes up short.
+        """
+        f, st = self.open_read()
+        with f:
+            existed, out = other.open_write()
+            try:
+                with out:
+                    copied, method = copy_file(f.fileno(), out.fileno(), st.st_size, progress)
+                if copied != st.st_size:
+                    raise OSError(errno.EIO, "source changed during copy")
+            except BaseException:
+                try:
+                    other.unlink()
+                except OSError:
+                    pass
+                raise
+        return existed, st.st_size, method
+
+    def close(self):
+        if self.dir_fd is not None:
+            os.close(self.dir_fd)
+            self.dir_fd = None
+
+
+class SessionPaths(BasePaths):
+    def __init__(self, home):
+        super().__init__(home)
+        self._dirs = OrderedDict()      # parts -> (fd, expiry), LRU of subdirectories
+        self._generation = _generation
+        self._cwd_expiry = float("inf")  # the home fd itself never goes stale
+        if DIR_FD:
+            self.home_fd = os.open(self.home, O_DIR & ~O_NOFOLLOW)  # configured home may be a link
+            self.cwd_fd = os.dup(self.home_fd)
+        else:
+            self.home_fd = self.cwd_fd = None
+
+    @property
+    def cwd_ref(self):
+        """What os.stat/os.scandir take for the cwd: its fd, or its path."""
+        return self._cwd_fd() if DIR_FD else self.cwd
+
+    def dir_tag(self):
+        return dir_tag(self.cwd_ref)
+
+    def listdir(self):
+        """[(name, is_dir, stat), ...] of the cwd, sorted by name."""
+        out = []
+        with os.scandir(self.cwd_ref) as it:
+            for entry in sorted(it, key=lambda e: e.name):
+                try:
+                    out.append((entry.name, entry.is_dir(), entry.stat()))
+                except OSError:
+                    continue
+        return out
+
+    # ----------------------------------------------------
+    def resolve(self, arg, from_home=False, create_dirs=False):
+        """
+        Target for client path `arg` (relative to the cwd, or to the home
+        with from_home=True).  Raises ValueError when it escapes the home
+        and OSError when a parent is missing, not a directory or a symlink.
+        The caller closes the Target.
+        """
+        parts = split_client_path(() if from_home else self.cwd_parts, arg)
+        if not parts:
+            return Target(self, parts, self._dup(()) if DIR_FD else None)
+        if not DIR_FD:
+            return self._resolve_by_path(parts, create_dirs)
+        return Target(self, parts, self._dup(parts[:-1], create_dirs))
+
+    def chdir(self, arg):
+        """CWD (relative to the home, like the protocol's CWD)."""
+        parts = split_client_path((), arg)
+        if DIR_FD:
+            fd = self._dup(parts)
+            self._set_cwd_fd(fd, parts)
+        else:
+            target = self._resolve_by_path(parts, False)
+            if not target.path.is_dir():
+                raise NotADirectoryError(str(target.path))
+        self.cwd_parts = parts
+
+    def invalidate(self):
+        """Forget cached subdirectory fds (after a rename or removal)."""
+        while self._dirs:
+            os.close(self._dirs.popitem()[1][0])
+
+    def close(self):
+        self.invalidate()
+        for fd in (self.cwd_fd, self.home_fd):
+            if fd is not None:
+                os.close(fd)
+        self.cwd_fd = self.home_fd = None
+
+    # ----------------------------------------------------
+    def _dup(self, parts, create=False):
+        return os.dup(self._dir_fd(parts, create))
+
+    def _set_cwd_fd(self, fd, parts):
+        if self.cwd_fd is not None:
+            os.close(self.cwd_fd)
+        self.cwd_fd = fd
+        self._cwd_expiry = time.monotonic() + DIR_CACHE_TTL if parts else float("inf")
+
+    def _cwd_fd(self):
+        """
+        The cwd fd, re-walked from the home after a rename or once it is
+        DIR_CACHE_TTL old.  Raises FileNotFoundError while the cwd's path
+        no longer leads to a directory (it was moved or removed).
+        """
+        self._check_generation()
+        if self.cwd_fd is None or self._cwd_expiry <= time.monotonic():
+            try:
+                fd = self._walk(self.cwd_parts)
+            except OSError:
+                self._set_cwd_fd(None, self.cwd_parts)
+                raise FileNotFoundError(errno.ENOENT, "Current directory no longer exists",
+                                        "/" + "/".join(self.cwd_parts)) from None
+            self._set_cwd_fd(fd, self.cwd_parts)
+        return self.cwd_fd
+
+    def _check_generation(self):
+        """After a rename anywhere in this process, no cached fd is trusted."""
+        if self._generation != _generation:
+            self._generation = _generation
+            self.invalidate()
+            self._cwd_expiry = 0.0
+
+    def _walk(self, parts):
+        """A new fd for directory `parts`, opened from the home without the cache."""
+        fd = os.dup(self.home_fd)
+        try:
+            for name in parts:
+                child = os.open(name, O_DIR, dir_fd=fd)
+                os.close(fd)
+                fd = child
+        except BaseException:
+            os.close(fd)
+            raise
+        return fd
+
+    def _dir_fd(self, parts, create=False):
+        """Borrowed fd for directory `parts` (cached; never closed by callers)."""
+        if not parts:
+            return self.home_fd
+        if parts == self.cwd_parts:
+            try:
+                return self._cwd_fd()
+            except FileNotFoundError:
+                if not create:
+                    raise
+                # STOR re-creates missing parents, the vanished cwd included
+        self._check_generation()
+        now = time.monotonic()
+        entry = self._dirs.get(parts)
+        if entry is not None:
+            if entry[1] > now:
+                self._dirs.move_to_end(parts)
+                return entry[0]
+            os.close(self._dirs.pop(parts)[0])
+
+        parent = self._dir_fd(parts[:-1], create)
+        name = parts[-1]
+        try:
+            fd = os.open(name, O_DIR, dir_fd=parent)
+        except FileNotFoundError:
+            if not create:
+                raise
+            try:
+                os.mkdir(name, 0o755, dir_fd=parent)
+            except FileExistsError:
+                pass
+            fd = os.open(name, O_DIR, dir_fd=parent)
+
+        self._dirs[parts] = (fd, now + DIR_CACHE_TTL)
+        if len(self._dirs) > DIR_CACHE_SIZE:
+            os.close(self._dirs.popitem(last=False)[1][0])
+        return fd
+
+    def _resolve_by_path(self, parts, create_dirs):
+        target = Target(self, parts, None)
+        real = target.path.resolve()
+        if real != self.home and not real.is_relative_to(self.home):
+            raise ValueError("Forbidden path")
+        if create_dirs and len(parts) > 1:
+            target.path.parent.mkdir(parents=True, exist_ok=True)
+        return target
@@ -1,7 +1,7 @@
 import os
 from pathlib import Path
 from utils.send_file import send_file
-from utils.receive_file import receive_file
+from utils.receive_file import receive_file, IncompleteTransfer
 
 
 class FTPCommands:
@@ -141,23 +141,34 @@ class FTPCommands:
             self.send("550 File not found")
             return
 
-        self.send(f"150 Opening data connection for {filename}")
+        self.send(f"150 {file_path.stat().st_size}")
         send_file(self.conn, file_path)
         self.send("226 Transfer complete")
 
     # -----------------------------
     # STOR (upload)
     # -----------------------------
-    def cmd_STOR(self, filename):
+    def cmd_STOR(self, filename, size):
         if not self.require_auth():
             return
         if not self.has_perm("write"):
             self.send("550 Permission denied")
             return
 
+        try:
+            size = int(size)
+        except ValueError:
+            self.send("501 Invalid size")
+            return
+
         file_path = (self.cwd / filename).resolve()
         self.send("150 Ready to receive file")
-        receive_file(self.conn, file_path)
+        try:
+            receive_file(self.conn, file_path, size)
+        except IncompleteTransfer:
+            file_path.unlink(missing_ok=True)
+            self.send("426 Transfer aborted")
+            return
         self.send("226 Upload complete")
 
     # -----------------------------
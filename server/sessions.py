@@ -0,0 +1,149 @@
+"""
+Session registry and timeout reaper.
+
+Every connection registers a Session; a background thread periodically
+closes the ones that overstay one of three limits:
+
+    login   connected but not authenticated after `login_timeout`
+    idle    authenticated, no command for `idle_timeout` (WATCH sessions
+            are exempt - they are idle by design)
+    stall   a transfer (inline or PASV) made no progress for `stall_timeout`,
+            or a reply (a LIST or SITE FIND listing, WATCH events...) has
+            been stuck in a socket write that long - a peer that stopped
+            reading would otherwise pin its handler thread for good
+
+A limit of 0 disables it.  Counters of sessions closed per reason are
+kept as gauges for SITE STATS.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+LOGIN, IDLE, STALL = "login", "idle", "stall"
+
+
+class Session:
+    def __init__(self, handler):
+        now = time.monotonic()
+        self.handler = handler
+        self.connected_at = now
+        self.last_activity = now
+        self.last_progress = now
+        self.busy = False            # a command is executing
+        self.watching = False        # inside WATCH
+        self.transfers = 0           # inline or PASV transfers in flight
+        self.writing_since = None    # start of the reply write in progress
+        self.closed_by = None        # reason, once the reaper closed it
+
+    def touch(self):
+        self.last_activity = time.monotonic()
+
+    def progress(self, *_):
+        self.last_progress = time.monotonic()
+
+    @contextmanager
+    def replying(self):
+        """Wrap a control-connection write, so a blocked one can time out."""
+        self.writing_since = time.monotonic()
+        try:
+            yield
+        finally:
+            self.writing_since = None
+            self.progress()
+
+    @contextmanager
+    def transfer(self):
+        self.transfers += 1
+        self.progress()
+        try:
+            yield
+        finally:
+            self.transfers -= 1
+            self.touch()
+
+
+class SessionRegistry:
+    def __init__(self, idle_timeout=600.0, login_timeout=30.0, stall_timeout=60.0,
+                 interval=None):
+        self.idle_timeout = idle_timeout
+        self.login_timeout = login_timeout
+        self.stall_timeout = stall_timeout
+        if interval is None:
+            # check often enough that no limit overshoots by more than ~25%
+            limits = [t for t in (idle_timeout, login_timeout, stall_timeout) if t]
+            interval = min([5.0] + [max(0.25, t / 4) for t in limits])
+        self.interval = interval
+        self.closed = {LOGIN: 0, IDLE: 0, STALL: 0}
+        self._sessions = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def register(self, handler):
+        session = Session(handler)
+        with self._lock:
+            self._sessions.add(session)
+        return session
+
+    def unregister(self, session):
+        with self._lock:
+            self._sessions.discard(session)
+
+    def start(self):
+        if any((self.idle_timeout, self.login_timeout, self.stall_timeout)):
+            self._thread = threading.Thread(target=self._reap_loop, name="session-reaper",
+                                            daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        with self._lock:
+            active = len(self._sessions)
+        stats = {"sessions": active}
+        stats.update((f"closed_{reason}", n) for reason, n in self.closed.items())
+        return stats
+
+    # ----------------------------------------------------
+    def expired(self, session, now):
+        """The timeout `session` has exceeded, or None."""
+        # busy and WATCH sessions too: waiting for a lock or for events is
+        # fine, being stuck writing to a peer that doesn't read is not
+        writing_since = session.writing_since
+        if writing_since is not None and self.stall_timeout and \
+                now - writing_since > self.stall_timeout:
+            return STALL
+        if session.transfers:
+            if self.stall_timeout and now - session.last_progress > self.stall_timeout:
+                return STALL
+            return None
+        if session.busy or session.watching:
+            return None
+        if not session.handler.auth:
+            if self.login_timeout and now - session.connected_at > self.login_timeout:
+                return LOGIN
+            return None
+        if self.idle_timeout and now - session.last_activity > self.idle_timeout:
+            return IDLE
+        return None
+
+    def _reap_loop(self):
+        while not self._stop.wait(self.interval):
+            now = time.monotonic()
+            with self._lock:
+                sessions = list(self._sessions)
+            for session in sessions:
+                if session.closed_by:
+                    continue
+                reason = self.expired(session, now)
+                if reason is None:
+                    continue
+                session.closed_by = reason
+                with self._lock:
+                    self.closed[reason] += 1
+                try:
+                    session.handler.kick(reason)
+                except Exception:
+                    pass
@@ -0,0 +1,384 @@
+"""
+Storage backends behind FTPHandler.
+
+Commands never touch the filesystem directly; they go through a per-
+session object from `storage.session(home)` (resolve/chdir/pwd/listdir/
+dir_tag) and the Targets it resolves (lstat/open_read/open_write/unlink/
+rename_to/copy_to).  Three backends:
+
+    local    the homes are directories on disk (server/paths.py:
+             dir_fd-relative opens, O_NOFOLLOW, sendfile/reflink)
+    memory   everything lives in a dict - hermetic tests and benchmarks,
+             no disk I/O; contents are lost when the process exits
+    pack     small files packed into large segment files with an SQLite
+             index (server/pack_store.py) - no inode or directory-block
+             overhead per file for millions of tiny files
+
+Paths everywhere stay the logical absolute path under the home, so file
+locks, the RETR cache, WATCH, SITE FIND and the access log don't care
+which backend is active.  The non-local backends store those same
+logical paths as keys.
+"""
+
+import io
+import os
+import stat
+import threading
+import time
+from collections import namedtuple
+
+from server.durability import NONE
+from server.paths import BasePaths, BaseTarget, SessionPaths, dir_tag, split_client_path, touch_dir
+
+LOCAL, MEMORY, PACK = "local", "memory", "pack"
+BACKENDS = (LOCAL, MEMORY, PACK)
+
+# the subset of os.stat_result the handlers use
+FileStat = namedtuple("FileStat", "st_mode st_ino st_size st_mtime st_mtime_ns")
+
+DIR_MODE = stat.S_IFDIR | 0o755
+FILE_MODE = stat.S_IFREG | 0o644
+
+
+def make_stat(is_dir, ino, size, mtime_ns):
+    return FileStat(DIR_MODE if is_dir else FILE_MODE, ino, size, mtime_ns // 10**9, mtime_ns)
+
+
+class Storage:
+    name = None
+    walkable = False     # homes are real directories the SITE FIND reconciler can walk
+    snapshots = True     # an opened file never changes under its reader
+
+    def session(self, home):
+        raise NotImplementedError
+
+    def dir_tag(self, path):
+        """Version string of directory `path` (LIST IF-NONE-MATCH, WATCH)."""
+        raise NotImplementedError
+
+    def touch_dir(self, path):
+        """Make the tag of `path` change after an in-place overwrite."""
+
+    def commit(self, target=None, f=None, dirs=()):
+        """
+        Make a finished change durable (raises OSError if it can't be): the
+        data of Target `target` - written through the still open file `f`,
+        or reopened when there is none (SITE COPY) - and the entries of the
+        directories holding the Targets in `dirs`.
+        """
+
+    def stats(self):
+        return {"storage": self.name}
+
+    def close(self):
+        pass
+
+
+class LocalStorage(Storage):
+    name = LOCAL
+    walkable = True
+    snapshots = False
+
+    def __init__(self, durability=None):
+        self.durability = durability
+
+    def session(self, home):
+        home.mkdir(parents=True, exist_ok=True)
+        return SessionPaths(home)
+
+    def dir_tag(self, path):
+        return dir_tag(path)
+
+    def touch_dir(self, path):
+        touch_dir(path)
+
+    def commit(self, target=None, f=None, dirs=()):
+        if self.durability is None or self.durability.policy == NONE:
+            return
+        # without dir_fd support there is no directory fd to sync
+        dir_fds = [t.dir_fd for t in dirs if t.dir_fd is not None]
+        if target is None:
+            self.durability.commit(None, dir_fds)
+            return
+        if f is not None:
+            f.flush()
+            self.durability.commit(f.fileno(), dir_fds)
+            return
+        fd = target.open(os.O_RDONLY)
+        try:
+            self.durability.commit(fd, dir_fds)
+        finally:
+            os.close(fd)
+
+
+# ==========================================================
+# KEY-VALUE BACKENDS
+# ==========================================================
+
+
+class KeyedStorage(Storage):
+    """
+    Base for backends that map the logical path (as a string key) to a
+    node.  Subclasses implement stat/listdir/subtree/mkdir/open_read/
+    open_write/unlink/rename/copy/dir_tag on keys; a new write always gets
+    a new st_ino, so the RETR cache never confuses two versions of a file.
+    """
+
+    def session(self, home):
+        return KeyedSession(self, home)
+
+    def walk(self, home):
+        """Everything below `home` as (rel, is_dir, size, mtime) - the SITE FIND source."""
+        n = len(str(home)) + 1
+        return [(key[n:], stat.S_ISDIR(st.st_mode), st.st_size, int(st.st_mtime))
+                for key, st in self.subtree(str(home))]
+
+    def mkdirs(self, key):
+        parent = key.rpartition("/")[0]
+        st = self.stat(key)
+        if st is None:
+            if parent and self.stat(parent) is None:
+                self.mkdirs(parent)
+            self.mkdir(key)
+        elif not stat.S_ISDIR(st.st_mode):
+            raise NotADirectoryError(key)
+
+
+class KeyedSession(BasePaths):
+    def __init__(self, storage, home):
+        super().__init__(home)
+        self.storage = storage
+        storage.mkdirs(str(self.home))
+
+    def resolve(self, arg, from_home=False, create_dirs=False):
+        parts = split_client_path(() if from_home else self.cwd_parts, arg)
+        for i in range(1, len(parts)):
+            key = str(self.home.joinpath(*parts[:i]))
+            st = self.storage.stat(key)
+            if st is None and create_dirs:
+                self.storage.mkdir(key)
+            elif st is None:
+                raise FileNotFoundError(key)
+            elif not stat.S_ISDIR(st.st_mode):
+                raise NotADirectoryError(key)
+        return KeyedTarget(self, parts)
+
+    def chdir(self, arg):
+        parts = split_client_path((), arg)
+        st = self.storage.stat(str(self.home.joinpath(*parts)))
+        if st is None:
+            raise FileNotFoundError(arg)
+        if not stat.S_ISDIR(st.st_mode):
+            raise NotADirectoryError(arg)
+        self.cwd_parts = parts
+
+    def dir_tag(self):
+        return self.storage.dir_tag(self.cwd)
+
+    def listdir(self):
+        return [(name, stat.S_ISDIR(st.st_mode), st)
+                for name, st in sorted(self.storage.listdir(str(self.cwd)))]
+
+
+class KeyedTarget(BaseTarget):
+    def __init__(self, paths, parts):
+        super().__init__(paths, parts)
+        self.storage = paths.storage
+        self.key = str(self.path)
+
+    def lstat(self):
+        return self.storage.stat(self.key)
+
+    def open_read(self):
+        return self.storage.open_read(self.key)
+
+    def open_write(self):
+        st = self.lstat()
+        if st is not None and stat.S_ISDIR(st.st_mode):
+            raise IsADirectoryError(self.key)
+        return st is not None, self.storage.open_write(self.key)
+
+    def discard(self, f):
+        """Drop a failed upload: nothing is stored, the old version stays."""
+        f.abort()
+
+    def unlink(self):
+        self.storage.unlink(self.key)
+
+    def rename_to(self, other):
+        self.storage.rename(self.key, other.key)
+
+    def copy_to(self, other, progress=None):
+        st = other.lstat()
+        if st is not None and stat.S_ISDIR(st.st_mode):
+            raise IsADirectoryError(other.key)
+        size, method = self.storage.copy(self.key, other.key)
+        if progress:
+            progress(size, size)
+        return st is not None, size, method
+
+
+class _Writer(io.BytesIO):
+    """
+    An upload buffer that hands its contents to `on_close` when closed;
+    abort() throws them away instead.
+    """
+
+    def __init__(self, on_close):
+        super().__init__()
+        self._on_close = on_close
+
+    def close(self):
+        if not self.closed:
+            try:
+                if self._on_close is not None:
+                    self._on_close(self.getvalue())
+            finally:
+                super().close()
+
+    def abort(self):
+        self._on_close = None
+        self.close()
+
+
+class MemoryStorage(KeyedStorage):
+    """Everything in a dict: key -> [is_dir, data, ino, mtime_ns]."""
+
+    name = MEMORY
+
+    def __init__(self):
+        self._nodes = {}
+        self._children = {}           # dir key -> set of child names
+        self._lock = threading.RLock()
+        self._next_ino = 1
+
+    def _new_node(self, key, is_dir, data=b""):
+        ino, self._next_ino = self._next_ino, self._next_ino + 1
+        self._nodes[key] = [is_dir, data, ino, time.time_ns()]
+        parent, _, name = key.rpartition("/")
+        self._children.setdefault(parent, set()).add(name)
+        self._touch(parent)
+        if is_dir:
+            self._children.setdefault(key, set())
+
+    def _touch(self, key):
+        node = self._nodes.get(key)
+        if node is not None:
+            node[3] = max(time.time_ns(), node[3] + 1)
+
+    def _drop(self, key):
+        parent, _, name = key.rpartition("/")
+        self._children.get(parent, set()).discard(name)
+        self._touch(parent)
+        prefix = key + "/"
+        for k in [k for k in self._nodes if k == key or k.startswith(prefix)]:
+            del self._nodes[k]
+            self._children.pop(k, None)
+
+    def _stat(self, node):
+        is_dir, data, ino, mtime_ns = node
+        return make_stat(is_dir, ino, 0 if is_dir else len(data), mtime_ns)
+
+    # ----------------------------------------------------
+    def stat(self, key):
+        with self._lock:
+            node = self._nodes.get(key)
+            return self._stat(node) if node is not None else None
+
+    def listdir(self, key):
+        with self._lock:
+            return [(name, self._stat(self._nodes[f"{key}/{name}"]))
+                    for name in self._children.get(key, ())]
+
+    def subtree(self, key):
+        prefix = key + "/"
+        with self._lock:
+            return [(k, self._stat(node)) for k, node in self._nodes.items()
+                    if k.startswith(prefix)]
+
+    def mkdir(self, key):
+        with self._lock:
+            if key in self._nodes:
+                raise FileExistsError(key)
+            self._new_node(key, True)
+
+    def open_read(self, key):
+        with self._lock:
+            node = self._nodes.get(key)
+            if node is None:
+                raise FileNotFoundError(key)
+            if node[0]:
+                raise IsADirectoryError(key)
+            # bytes are immutable: the reader shares them until it's done
+            return io.BytesIO(node[1]), self._stat(node)
+
+    def open_write(self, key):
+        def store(data):
+            with self._lock:
+                self._nodes.pop(key, None)
+                self._new_node(key, False, data)
+        return _Writer(store)
+
+    def unlink(self, key):
+        with self._lock:
+            node = self._nodes.get(key)
+            if node is None:
+                raise FileNotFoundError(key)
+            if node[0]:
+                raise IsADirectoryError(key)
+            self._drop(key)
+
+    def rename(self, src, dst):
+        with self._lock:
+            if src not in self._nodes:
+                raise FileNotFoundError(src)
+            if dst in self._nodes:
+                raise FileExistsError(dst)
+            prefix = src + "/"
+            moved = {k: v for k, v in self._nodes.items() if k == src or k.startswith(prefix)}
+            children = {k: v for k, v in self._children.items() if k == src or k.startswith(prefix)}
+            self._drop(src)
+            for k, node in moved.items():
+                self._nodes[dst + k[len(src):]] = node
+            for k, names in children.items():
+                self._children[dst + k[len(src):]] = names
+            parent, _, name = dst.rpartition("/")
+            self._children.setdefault(parent, set()).add(name)
+            self._touch(parent)
+
+    def copy(self, src, dst):
+        with self._lock:
+            node = self._nodes.get(src)
+            if node is None:
+                raise FileNotFoundError(src)
+            self._nodes.pop(dst, None)
+            self._new_node(dst, False, node[1])       # shares the bytes object
+            return len(node[1]), "shared"
+
+    def dir_tag(self, path):
+        key = str(path)
+        with self._lock:
+            node = self._nodes.get(key)
+            if node is None:
+                raise FileNotFoundError(key)
+            return f"{node[3]:x}-{len(self._children.get(key, ()))}"
+
+    def stats(self):
+        with self._lock:
+            files = [n for n in self._nodes.values() if not n[0]]
+            return {"storage": self.name, "storage_files": len(files),
+                    "storage_bytes": sum(len(n[1]) for n in files)}
+
+
+def make_storage(spec, durability=None):
+    """'local', 'memory' or 'pack:<directory>' -> a Storage."""
+    kind, _, arg = spec.partition(":")
+    if kind == LOCAL:
+        return LocalStorage(durability)
+    if kind == MEMORY:
+        return MemoryStorage()
+    if kind == PACK:
+        from server.pack_store import PackStorage
+        return PackStorage(arg or "packs", sync=durability is not None and
+                           durability.policy != NONE)
+    raise ValueError(f"unknown storage backend {spec!r} (expected one of {', '.join(BACKENDS)})")
@@ -0,0 +1,25 @@
+"""
+TLS for the control/data stream (implicit TLS: the whole connection is
+wrapped from the first byte, there is no AUTH TLS upgrade).
+
+One SSLContext is shared by every connection of the server - and, because
+it is created before --workers forks, by every worker - so session
+tickets issued by one worker are accepted by all of them and a client
+reconnecting resumes instead of doing a full handshake.
+"""
+
+import ssl
+
+HANDSHAKE_TIMEOUT = 10.0     # seconds a client gets to finish the handshake
+TICKETS_PER_HANDSHAKE = 2    # TLS 1.3 tickets sent after a full handshake
+
+
+def make_server_context(certfile, keyfile=None):
+    ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    ctx.minimum_version = ssl.TLSVersion.TLSv1_2
+    ctx.load_cert_chain(certfile, keyfile)
+    # resumption: stateless tickets (1.3 and 1.2) plus the server-side
+    # session cache for 1.2 clients without ticket support
+    ctx.options &= ~ssl.OP_NO_TICKET
+    ctx.num_tickets = TICKETS_PER_HANDSHAKE
+    return ctx
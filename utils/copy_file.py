@@ -0,0 +1,120 @@
+"""
+File-to-file copy for server-side SITE COPY, without the data ever
+passing through user space where the kernel can avoid it.
+
+copy_file() tries, in order:
+
+    reflink          ioctl(FICLONE): share the extents (btrfs, XFS, ...),
+                     constant time regardless of size
+    copy_file_range  in-kernel copy; may itself reflink or offload to the
+                     storage (NFS server-side copy)
+    sendfile         in-kernel copy on older kernels
+    buffered         read/write loop, for everything else
+
+and falls through to the next method when one isn't supported for the
+given pair of files.
+"""
+
+import errno
+import os
+import sys
+
+try:
+    import fcntl
+except ImportError:   # pragma: no cover - non-POSIX
+    fcntl = None
+
+from utils.send_file import TransferAborted
+
+FICLONE = 0x40049409                # _IOW(0x94, 9, int)
+REFLINK = fcntl is not None and sys.platform.startswith("linux")
+KERNEL_CHUNK = 64 * 1024 * 1024     # progress / cancel granularity
+BUFFER_CHUNK = 1024 * 1024
+
+# errors meaning "this method can't do this pair", not "the copy failed"
+UNSUPPORTED = {errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP,
+               errno.ENOTSUP, errno.EBADF, errno.ENOTTY, errno.EPERM}
+
+
+def copy_file(src_fd, dst_fd, count, progress=None, cancel=None):
+    """
+    Copy `count` bytes from the start of `src_fd` to `dst_fd` (an empty
+    file).  progress(copied, count) and `cancel` (threading.Event) behave
+    as in send_file().  Returns (bytes copied, method name).
+    """
+    if count and REFLINK:
+        try:
+            fcntl.ioctl(dst_fd, FICLONE, src_fd)
+            if progress:
+                progress(count, count)
+            return count, "reflink"
+        except OSError as e:
+            if e.errno not in UNSUPPORTED:
+                raise
+
+    for method, step in (("copy_file_range", _copy_range_step), ("sendfile", _sendfile_step)):
+        if not hasattr(os, method):
+            continue
+        try:
+            return _kernel_copy(step, src_fd, dst_fd, count, progress, cancel), method
+        except _Unsupported:
+            continue
+    return _copy_buffered(src_fd, dst_fd, count, progress, cancel), "buffered"
+
+
+class _Unsupported(Exception):
+    """The kernel method can't copy between these two files."""
+
+
+def _copy_range_step(src_fd, dst_fd, offset, n):
+    return os.copy_file_range(src_fd, dst_fd, n, offset, offset)
+
+
+def _sendfile_step(src_fd, dst_fd, offset, n):
+    os.lseek(dst_fd, offset, os.SEEK_SET)
+    return os.sendfile(dst_fd, src_fd, offset, n)
+
+
+def _kernel_copy(step, src_fd, dst_fd, count, progress, cancel):
+    copied = 0
+    while copied < count:
+        if cancel is not None and cancel.is_set():
+            raise TransferAborted(f"Cancelled after {copied} / {count} bytes.")
+        try:
+            n = step(src_fd, dst_fd, copied, min(KERNEL_CHUNK, count - copied))
+        except OSError as e:
+            # only the first call decides whether the method works at all
+            if copied == 0 and e.errno in UNSUPPORTED:
+                raise _Unsupported() from e
+            raise
+        if not n:
+            break                       # source shrank
+        copied += n
+        if progress:
+            progress(copied, count)
+    return copied
+
+
+def _copy_buffered(src_fd, dst_fd, count, progress, cancel):
+    buf = bytearray(min(BUFFER_CHUNK, max(count, 1)))
+    view = memoryview(buf)
+    copied = 0
+    try:
+        os.lseek(src_fd, 0, os.SEEK_SET)
+        os.lseek(dst_fd, 0, os.SEEK_SET)
+        with open(src_fd, "rb", buffering=0, closefd=False) as src:
+            while copied < count:
+                if cancel is not None and cancel.is_set():
+                    raise TransferAborted(f"Cancelled after {copied} / {count} bytes.")
+                n = src.readinto(view[:min(len(buf), count - copied)])
+                if not n:
+                    break
+                done = 0
+                while done < n:
+                    done += os.write(dst_fd, view[done:n])
+                copied += n
+                if progress:
+                    progress(copied, count)
+    finally:
+        view.release()
+    return copied
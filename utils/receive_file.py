@@ -0,0 +1,93 @@
+"""
+Receiving side of the shared transfer layer.
+
+receive_file() reads an exact-length payload (the size announced on the
+control line) into a file with recv_into and a reusable buffer, after
+preallocating the destination where the OS supports it.  It never reads
+past `size`, so whatever follows on the connection stays intact.
+"""
+
+import errno
+import os
+
+from utils.send_file import TransferAborted
+
+RECV_CHUNK = 256 * 1024
+
+
+class IncompleteTransfer(Exception):
+    """The peer closed the connection before `size` bytes arrived."""
+
+    def __init__(self, received, size):
+        super().__init__(f"Connection closed after {received} / {size} bytes.")
+        self.received = received
+        self.size = size
+
+
+def receive_file(sock, dest, size, progress=None, timeout=None, cancel=None,
+                 prefix=b"", reader=None, buf=None, preallocate=True):
+    """
+    Receive exactly `size` bytes into `dest` (a path or a binary file).
+
+    prefix  : bytes of the payload that were already read (e.g. sitting in
+              a line buffer) and are written first.
+    reader  : callable(memoryview) -> int used instead of sock.recv_into,
+              e.g. a buffered reader's readinto1.
+    buf     : reusable bytearray to receive into.
+    progress(received, size), cancel (threading.Event) and timeout behave
+    as in send_file().  Raises IncompleteTransfer on a short read.
+    """
+    own = not hasattr(dest, "write")
+    f = open(dest, "wb") if own else dest
+    old_timeout = sock.gettimeout() if sock is not None else None
+    if timeout is not None and sock is not None:
+        sock.settimeout(timeout)
+
+    if buf is None:
+        buf = bytearray(min(RECV_CHUNK, max(size, 1)))
+    view = memoryview(buf)
+    read = reader or sock.recv_into
+
+    try:
+        if preallocate and size > 0:
+            _preallocate(f, size)
+
+        got = 0
+        if prefix:
+            head = prefix[:size]
+            f.write(head)
+            got = len(head)
+            if progress:
+                progress(got, size)
+
+        while got < size:
+            if cancel is not None and cancel.is_set():
+                raise TransferAborted(f"Cancelled after {got} / {size} bytes.")
+            n = read(view[:min(len(buf), size - got)])
+            if not n:
+                raise IncompleteTransfer(got, size)
+            f.write(view[:n])
+            got += n
+            if progress:
+                progress(got, size)
+        f.flush()
+        return got
+    finally:
+        view.release()
+        if timeout is not None and sock is not None:
+            sock.settimeout(old_timeout)
+        if own:
+            f.close()
+
+
+def _preallocate(f, size):
+    """Reserve disk space up front (less fragmentation, early ENOSPC)."""
+    if not hasattr(os, "posix_fallocate"):
+        return
+    try:
+        os.posix_fallocate(f.fileno(), f.tell(), size)
+    except OSError as e:
+        # filesystems without fallocate support just skip it; a full disk
+        # is reported now rather than halfway through the transfer
+        if e.errno == errno.ENOSPC:
+            raise
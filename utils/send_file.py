@@ -0,0 +1,88 @@
+"""
+Sending side of the shared transfer layer (used by FTPHandler, FTPCommands
+and ClientSocket).
+
+send_file() pushes a file (or a byte range of it) to a socket using the
+kernel's sendfile where possible and chunked memoryview sends otherwise
+(TLS sockets, platforms without os.sendfile).
+"""
+
+import os
+import ssl
+
+SENDFILE_CHUNK = 4 * 1024 * 1024   # progress / cancel granularity for sendfile
+TLS_RECORD = 16 * 1024             # largest TLS record payload
+COPY_CHUNK = 16 * TLS_RECORD       # fallback buffer: whole records per TLS write
+
+
+class TransferAborted(Exception):
+    """The transfer was cancelled through its cancel event."""
+
+
+def send_file(sock, src, offset=0, count=None, progress=None, timeout=None, cancel=None):
+    """
+    Send `count` bytes (default: to end of file) of `src` starting at
+    `offset`.  `src` is a path or a binary file object.
+
+    progress(sent, total) is called after every chunk; `cancel` is a
+    threading.Event checked between chunks (raises TransferAborted);
+    `timeout` (seconds) applies to each blocking send.  Returns the number
+    of bytes sent, which is less than requested only if the file shrank.
+    """
+    own = not hasattr(src, "read")
+    f = open(src, "rb") if own else src
+    old_timeout = sock.gettimeout()
+    if timeout is not None:
+        sock.settimeout(timeout)
+    try:
+        if count is None:
+            count = os.fstat(f.fileno()).st_size - offset
+
+        if use_sendfile(sock):
+            return _send_zero_copy(sock, f, offset, count, progress, cancel)
+        return _send_buffered(sock, f, offset, count, progress, cancel)
+    finally:
+        if timeout is not None:
+            sock.settimeout(old_timeout)
+        if own:
+            f.close()
+
+
+def use_sendfile(sock):
+    return hasattr(os, "sendfile") and not isinstance(sock, ssl.SSLSocket)
+
+
+def _send_zero_copy(sock, f, offset, count, progress, cancel):
+    sent = 0
+    while sent < count:
+        if cancel is not None and cancel.is_set():
+            raise TransferAborted(f"Cancelled after {sent} / {count} bytes.")
+        n = sock.sendfile(f, offset + sent, min(SENDFILE_CHUNK, count - sent))
+        if not n:
+            break
+        sent += n
+        if progress:
+            progress(sent, count)
+    return sent
+
+
+def _send_buffered(sock, f, offset, count, progress, cancel, chunk=COPY_CHUNK):
+    buf = bytearray(min(chunk, max(count, 1)))
+    view = memoryview(buf)
+    sent = 0
+    try:
+        f.seek(offset)
+        while sent < count:
+            if cancel is not None and cancel.is_set():
+                raise TransferAborted(f"Cancelled after {sent} / {count} bytes.")
+            n = f.readinto(view[:min(len(buf), count - sent)])
+            if not n:
+                break
+            sock.sendall(view[:n])
+            sent += n
+            if progress:
+                progress(sent, count)
+    finally:
+        view.release()
+    return sent
+